@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Compares resolving arguments through the ExpressionCompiler with
+interpreting them through the Resolver, on while and foreach bodies.
+
+Usage: python -m benchmarks.Expressions
+"""
+
+from storyruntime.Story import Story
+from storyruntime.utils.Resolver import Resolver
+
+from .Stories import best_of, foreach_story, make_app, run, while_story
+
+ITERATIONS = 20000
+
+
+class InterpretedStory(Story):
+    """
+    A story which resolves arguments by walking the AST on every
+    evaluation, as the runtime used to.
+    """
+
+    def resolve(self, arg, encode=False):
+        result = Resolver(self).resolve(arg)
+        if encode:
+            return self.encode(result)
+        return result
+
+
+def main():
+    cases = [
+        ("while", while_story(ITERATIONS), {}),
+        (
+            "foreach",
+            foreach_story(ITERATIONS),
+            {"items": list(range(ITERATIONS))},
+        ),
+    ]
+
+    for name, story, context in cases:
+        app = make_app(name, story)
+        interpreted = best_of(
+            lambda: run(app, name, context, story_cls=InterpretedStory)
+        )
+        compiled = best_of(lambda: run(app, name, context))
+        print(
+            f"{name:>8}: interpreted={interpreted:.3f}s "
+            f"compiled={compiled:.3f}s "
+            f"speedup={interpreted / compiled:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
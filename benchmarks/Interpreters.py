@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Compares executing stories with Lexicon, which recurses into every block,
+with the Interpreter, which keeps an explicit stack of blocks.
+
+Usage: python -m benchmarks.Interpreters
+"""
+
+from .Stories import (
+    best_of,
+    expression,
+    foreach_story,
+    integer,
+    make_app,
+    path,
+    run,
+    while_story,
+)
+
+ITERATIONS = 20000
+
+DEPTH = 100
+
+CALLS = 200
+
+
+def recursive_story(depth, calls):
+    """
+    function depth n:int returns int
+        if n == 0
+            return 0
+        return depth(n: n - 1) + 1
+    total = 0  # Set in the initial context.
+    i = 0
+    while i < calls
+        i = i + 1
+        total = depth(n: depth)
+    """
+
+    def call(name, n):
+        return {
+            "function": "depth",
+            "name": [name],
+            "args": [{"$OBJECT": "argument", "name": "n", "argument": n}],
+        }
+
+    return {
+        "entrypoint": "6",
+        "functions": {"depth": "1"},
+        "tree": {
+            "1": {
+                "ln": "1",
+                "method": "function",
+                "function": "depth",
+                "next": "6",
+                "enter": "2",
+                "args": [{"$OBJECT": "arg", "name": "n"}],
+            },
+            "2": {
+                "ln": "2",
+                "method": "if",
+                "parent": "1",
+                "next": "4",
+                "enter": "3",
+                "args": [expression("equals", path("n"), integer(0))],
+            },
+            "3": {
+                "ln": "3",
+                "method": "return",
+                "parent": "2",
+                "next": "4",
+                "args": [integer(0)],
+            },
+            "4": {
+                "ln": "4",
+                "method": "call",
+                "parent": "1",
+                "next": "5",
+                **call("r", expression("subtraction", path("n"), integer(1))),
+            },
+            "5": {
+                "ln": "5",
+                "method": "return",
+                "parent": "1",
+                "next": "6",
+                "args": [expression("sum", path("r"), integer(1))],
+            },
+            "6": {
+                "ln": "6",
+                "method": "expression",
+                "next": "7",
+                "name": ["i"],
+                "args": [integer(0)],
+            },
+            "7": {
+                "ln": "7",
+                "method": "while",
+                "next": "8",
+                "enter": "8",
+                "args": [expression("less", path("i"), integer(calls))],
+            },
+            "8": {
+                "ln": "8",
+                "method": "expression",
+                "parent": "7",
+                "next": "9",
+                "name": ["i"],
+                "args": [expression("sum", path("i"), integer(1))],
+            },
+            "9": {
+                "ln": "9",
+                "method": "call",
+                "parent": "7",
+                "next": None,
+                **call("total", integer(depth)),
+            },
+        },
+    }
+
+
+def main():
+    cases = [
+        ("while", while_story(ITERATIONS), {}),
+        (
+            "foreach",
+            foreach_story(ITERATIONS),
+            {"items": list(range(ITERATIONS))},
+        ),
+        ("recursive", recursive_story(DEPTH, CALLS), {"total": 0}),
+    ]
+
+    for name, story, context in cases:
+        lexicon = make_app(name, story)
+        stack = make_app(name, story, interpreter="stack")
+        recursive = best_of(lambda: run(lexicon, name, context))
+        iterative = best_of(lambda: run(stack, name, context))
+        print(
+            f"{name:>10}: lexicon={recursive:.3f}s "
+            f"stack={iterative:.3f}s "
+            f"speedup={recursive / iterative:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Compares encoding service payloads through JsonCodec with the encoder the
+runtime used before, which converted values with TypeUtils#safe_type and
+then fell back to JSONEncoder#default for the types json doesn't know.
+
+Usage: python -m benchmarks.JsonCodec
+"""
+
+import base64
+import copy
+import json
+import re
+
+from requests.structures import CaseInsensitiveDict
+
+from storyruntime.Types import StreamingService
+from storyruntime.entities.Multipart import FormField
+from storyruntime.utils.JsonCodec import JsonCodec
+from storyruntime.utils.TypeUtils import TypeUtils
+
+from .Stories import best_of
+
+ITERATIONS = 2000
+
+
+class LegacyEncoder(json.JSONEncoder):
+    """
+    The encoder the runtime used before JsonCodec.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, bytes):
+            return base64.b64encode(obj).decode("utf-8")
+        elif isinstance(obj, CaseInsensitiveDict):
+            return dict(obj.items())
+        elif isinstance(obj, re.Pattern):
+            return obj.pattern
+
+        return json.JSONEncoder.default(self, obj)
+
+    def encode(self, o):
+        return json.JSONEncoder.encode(self, self._convert_types(o))
+
+    def _convert_types(self, o):
+        if isinstance(o, dict):
+            for k, v in o.items():
+                s = TypeUtils.safe_type(v)
+                if TypeUtils.isnamedtuple(s):
+                    o[k] = s._asdict()
+                else:
+                    o[k] = self._convert_types(s)
+        return o
+
+
+def payload():
+    return {
+        "user": {
+            "id": 1234,
+            "name": "Jane Doe",
+            "tags": ["a", "b", "c"] * 10,
+            "scores": [i / 7 for i in range(50)],
+        },
+        "items": [
+            {"id": i, "title": f"item {i}", "price": i * 1.5, "ok": True}
+            for i in range(100)
+        ],
+        "headers": CaseInsensitiveDict(
+            data={"Content-Type": "application/json", "X-Id": "1"}
+        ),
+        "avatar": b"\x89PNG" * 256,
+        "field": FormField(name="name", body="body"),
+        "service": StreamingService(
+            name="hello", command="world", container_name="c", hostname="h"
+        ),
+    }
+
+
+def main():
+    data = payload()
+    # The legacy encoder modifies what it encodes, so each run gets a copy,
+    # which is what the runtime had to do to keep the values of a story.
+    copies = [copy.deepcopy(data) for _ in range(ITERATIONS * 5)]
+
+    def legacy():
+        encoder = LegacyEncoder()
+        for _ in range(ITERATIONS):
+            encoder.encode(copies.pop())
+
+    def codec():
+        for _ in range(ITERATIONS):
+            JsonCodec.dumps(data, safe=True)
+
+    assert json.loads(LegacyEncoder().encode(copy.deepcopy(data))) == (
+        JsonCodec.loads(JsonCodec.dumps(data, safe=True))
+    )
+
+    legacy_time = best_of(legacy)
+    codec_time = best_of(codec)
+    print(
+        f"payload: legacy={legacy_time:.3f}s "
+        f"codec={codec_time:.3f}s "
+        f"speedup={legacy_time / codec_time:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
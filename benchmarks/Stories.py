@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Story trees and helpers shared by the benchmarks.
+"""
+
+import asyncio
+import timeit
+from unittest.mock import MagicMock
+
+from storyruntime.Story import Story
+from storyruntime.processing import Stories
+
+
+class NullLogger:
+    def is_debug_enabled(self):
+        return False
+
+    def log(self, *args):
+        pass
+
+    def debug(self, message, *args):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warn(self, message):
+        pass
+
+    def error(self, message, exc=None):
+        pass
+
+
+def path(*paths):
+    return {"$OBJECT": "path", "paths": list(paths)}
+
+
+def integer(value):
+    return {"$OBJECT": "int", "int": value}
+
+
+def expression(operator, *values):
+    return {
+        "$OBJECT": "expression",
+        "expression": operator,
+        "values": list(values),
+    }
+
+
+def while_story(iterations):
+    """
+    i = 0
+    total = 0
+    while i < iterations
+        i = i + 1
+        total = total + i * 2
+    """
+    return {
+        "entrypoint": "1",
+        "tree": {
+            "1": {
+                "ln": "1",
+                "method": "expression",
+                "next": "2",
+                "name": ["i"],
+                "args": [integer(0)],
+            },
+            "2": {
+                "ln": "2",
+                "method": "expression",
+                "next": "3",
+                "name": ["total"],
+                "args": [integer(0)],
+            },
+            "3": {
+                "ln": "3",
+                "method": "while",
+                "next": "4",
+                "enter": "4",
+                "args": [expression("less", path("i"), integer(iterations))],
+            },
+            "4": {
+                "ln": "4",
+                "method": "expression",
+                "next": "5",
+                "parent": "3",
+                "name": ["i"],
+                "args": [expression("sum", path("i"), integer(1))],
+            },
+            "5": {
+                "ln": "5",
+                "method": "expression",
+                "next": None,
+                "parent": "3",
+                "name": ["total"],
+                "args": [
+                    expression(
+                        "sum",
+                        path("total"),
+                        expression("multiplication", path("i"), integer(2)),
+                    )
+                ],
+            },
+        },
+    }
+
+
+def foreach_story(iterations):
+    """
+    items = range(iterations)  # Set in the initial context.
+    total = 0
+    foreach items as item
+        if item % 2 == 0
+            total = total + item
+    """
+    return {
+        "entrypoint": "1",
+        "tree": {
+            "1": {
+                "ln": "1",
+                "method": "expression",
+                "next": "2",
+                "name": ["total"],
+                "args": [integer(0)],
+            },
+            "2": {
+                "ln": "2",
+                "method": "for",
+                "next": "3",
+                "enter": "3",
+                "output": ["item"],
+                "args": [path("items")],
+            },
+            "3": {
+                "ln": "3",
+                "method": "if",
+                "next": "4",
+                "enter": "4",
+                "parent": "2",
+                "args": [
+                    expression(
+                        "equals",
+                        expression("modulus", path("item"), integer(2)),
+                        integer(0),
+                    )
+                ],
+            },
+            "4": {
+                "ln": "4",
+                "method": "expression",
+                "next": None,
+                "parent": "3",
+                "name": ["total"],
+                "args": [expression("sum", path("total"), path("item"))],
+            },
+        },
+    }
+
+
+def make_app(story_name, story, interpreter="lexicon"):
+    app = MagicMock()
+    app.stories = {story_name: story}
+    app.story_global_contexts = {story_name: {}}
+    app.environment = {}
+    app.app_config.interpreter = interpreter
+    return app
+
+
+def run(app, story_name, context=None, story_cls=Story):
+    logger = NullLogger()
+    story = story_cls(app, story_name, logger)
+    story.prepare(dict(context or {}))
+    asyncio.run(Stories.execute(logger, story))
+    return story
+
+
+def best_of(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
@@ -39,6 +39,7 @@ setup(
     ],
     extras_require={
         "stylecheck": ["black==19.3b0"],
+        "curl": ["pycurl>=7.43.0"],
         "pytest": [
             "pytest==3.6.3",
             "pytest-cov==2.5.1",
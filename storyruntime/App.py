@@ -8,8 +8,6 @@ from collections import namedtuple
 
 from requests.structures import CaseInsensitiveDict
 
-from tornado.httpclient import AsyncHTTPClient
-
 from .AppConfig import AppConfig, Forward
 from .Config import Config
 from .Containers import Containers
@@ -19,10 +17,11 @@ from .Story import Story
 from .Types import StreamingService
 from .constants.ServiceConstants import ServiceConstants
 from .entities.Release import Release
-from .processing import Stories
-from .processing.Services import Command, Service, Services
+from .processing import Lexicon, Stories
+from .processing.Services import Command, Services
 from .utils import Dict
 from .utils.ConstDict import ConstDict
+from .utils.HttpClients import HttpClients
 from .utils.HttpUtils import HttpUtils
 
 Subscription = namedtuple(
@@ -76,6 +75,12 @@ class App:
         self.environment = CaseInsensitiveDict(data=self.environment)
         self.stories = release.stories["stories"]
         self.entrypoint = release.stories["entrypoint"]
+        self.execution_plans = {
+            story_name: Lexicon.compile(story["tree"])
+            for story_name, story in self.stories.items()
+        }
+        for story_name, plan in self.execution_plans.items():
+            plan.validate(story_name)
         self.services = app_data.services
         self.always_pull_images = release.always_pull_images
         secrets = CaseInsensitiveDict()
@@ -91,6 +96,32 @@ class App:
             story_name: {"app": self.app_context}
             for story_name in self.stories
         }
+        self.service_routes = {}
+        """
+        The route of every execute line, keyed by the story name and the
+        line number (see Services#route). Filled by start_services.
+        """
+        self.bulkheads = {}
+        """
+        The bulkhead limiting the calls to every service, by service name
+        (see Services#bulkhead).
+        """
+        self.response_caches = {}
+        """
+        The response cache of every command, by service and command name
+        (see Services#response_cache).
+        """
+        self.request_hedges = {}
+        """
+        The hedge of the calls of every command, by service and command
+        name (see Services#request_hedge).
+        """
+        self.output_validators = {}
+        """
+        The compiled validator of the output of every command, by the
+        names in its chain (see Services#output_validator). Filled by
+        start_services.
+        """
         self._tmp_dir_created = False
 
     def image_pull_policy(self):
@@ -130,6 +161,7 @@ class App:
 
         self.logger.debug(f"Cleaning up tmp dir: {tmpdir}")
         try:
+            shutil.rmtree(self.get_spool_dir(), ignore_errors=True)
             shutil.rmtree(tmpdir, ignore_errors=True)
         except BaseException as e:
             self.logger.error(f"Failed to cleanup tmp dir {tmpdir}", e)
@@ -138,6 +170,13 @@ class App:
     def get_tmp_dir(self):
         return f"/tmp/story.{self.app_id}"
 
+    def get_spool_dir(self):
+        """
+        The dir large responses are spooled to (see ResponseSpool). It is
+        kept apart from the tmp dir, whose files the stories can list.
+        """
+        return f"{self.get_tmp_dir()}.spool"
+
     async def expose_services(self):
         for expose in self.app_config.get_expose_config():
             await self._expose_service(expose)
@@ -182,9 +221,10 @@ class App:
                 if method != "execute":
                     continue
 
-                chain = Services.resolve_chain(story, line)
-                assert isinstance(chain[0], Service)
+                route = Services.route(story, line)
+                chain = route.chain
                 assert isinstance(chain[1], Command)
+                Services.prepare(story, route)
 
                 # Simple cache to not unnecessarily make more calls to
                 # Kubernetes. It's okay if we don't have this check
@@ -244,7 +284,7 @@ class App:
             "body": json.dumps({"app_id": self.app_id}),
             "headers": {"Content-Type": "application/json; charset=utf-8"},
         }
-        client = AsyncHTTPClient()
+        client = HttpClients.get(HttpClients.SYNAPSE)
         response = await HttpUtils.fetch_with_retry(
             3, self.logger, url, client, kwargs
         )
@@ -278,7 +318,7 @@ class App:
                 f'{http_conf["path"]}'
             )
 
-            client = AsyncHTTPClient()
+            client = HttpClients.get(HttpClients.SERVICES)
             self.logger.debug(f"Unsubscribing {sub}...")
 
             method = http_conf.get("method", "post")
@@ -3,6 +3,7 @@ import typing
 from collections import namedtuple
 
 from .utils.Dict import Dict
+from .utils.TypeUtils import TypeUtils
 
 Forward = namedtuple(
     "Forward", ["service", "service_forward_name", "http_path"]
@@ -13,11 +14,153 @@ KEY_EXPOSE = "expose"
 
 KEY_FORWARDS = "forwards"
 
+KEY_RUNTIME = "runtime"
+"""Options which tune how the runtime executes the stories of the app."""
+
+INTERPRETERS = ("lexicon", "stack")
+
 
 class AppConfig:
     _expose: typing.List[Forward] = None
 
+    concurrent_services: bool = False
+    """
+    Whether consecutive, independent service calls may be executed
+    concurrently (runtime.concurrent_services).
+    """
+
+    foreach_concurrency: int = 1
+    """
+    The number of iterations of a foreach loop which may be executed
+    concurrently (runtime.foreach_concurrency). Only loops whose body
+    cannot assign to a variable outside of the loop are affected.
+    """
+
+    time_slice: float = 0.01
+    """
+    The time in seconds a story may keep the event loop busy before it
+    yields to other stories (runtime.time_slice).
+    """
+
+    max_steps: typing.Optional[int] = None
+    """
+    The number of lines a single story run may execute
+    (runtime.max_steps). Unlimited by default.
+    """
+
+    max_run_time: typing.Optional[float] = None
+    """
+    The time in seconds a single story run may take (runtime.max_run_time).
+    Time spent waiting on services counts too. Unlimited by default.
+    """
+
+    max_loop_iterations: int = 100000
+    """
+    The number of iterations a single while loop may run
+    (runtime.max_loop_iterations), so that a runaway loop fails rather
+    than running forever.
+    """
+
+    interpreter: str = "lexicon"
+    """
+    How stories are executed (runtime.interpreter): "lexicon", which
+    recurses into every block, or "stack", which does not
+    (see processing.Interpreter).
+    """
+
+    response_memory_limit: typing.Optional[int] = None
+    """
+    The size in bytes up to which the responses of services are kept in
+    memory (runtime.response_memory_limit). Larger responses are streamed
+    to disk (see ResponseSpool). Unset by default, which keeps every
+    response in memory.
+    """
+
+    upload_memory_limit: typing.Optional[int] = None
+    """
+    The size in bytes up to which the files uploaded with an event are
+    kept in memory (runtime.upload_memory_limit). Larger files are
+    spooled to disk as they are received (see MultipartSpool). Unset by
+    default, which keeps every file in memory.
+    """
+
+    service_limits: typing.Dict[str, dict] = {}
+    """
+    The limits on the concurrent calls to a service (max_concurrency,
+    max_queue and queue_timeout), by service name (runtime.service_limits).
+    They take precedence over the limits in the OMG of the service
+    (see Services#bulkhead).
+    """
+
+    service_cache: typing.Dict[str, typing.Dict[str, dict]] = {}
+    """
+    Cache hints (ttl and max_entries) for the responses of idempotent
+    commands, by service and command name (runtime.service_cache). They
+    take precedence over the "cache" of a command in the OMG of its
+    service (see Services#response_cache).
+    """
+
+    service_hedging: typing.Dict[str, typing.Dict[str, dict]] = {}
+    """
+    Hedge hints (percentile, initial_delay and window) for the calls of
+    read-only commands, by service and command name
+    (runtime.service_hedging). They take precedence over the "hedge" of
+    a command in the OMG of its service (see Services#request_hedge).
+    """
+
+    output_sampling: typing.Dict[str, float] = {}
+    """
+    The fraction of the responses of a service which are validated
+    against the output in its OMG, by service name
+    (runtime.output_sampling). Meant for trusted services, which are
+    otherwise validated on every response (see Services#output_validator).
+    """
+
     def __init__(self, raw: dict):
+        runtime = raw.get(KEY_RUNTIME) or {}
+        self.concurrent_services = runtime.get("concurrent_services") is True
+        self.foreach_concurrency = runtime.get("foreach_concurrency", 1)
+        assert isinstance(self.foreach_concurrency, int)
+        assert self.foreach_concurrency >= 1
+        self.time_slice = runtime.get("time_slice", 0.01)
+        assert TypeUtils.is_number(self.time_slice) and self.time_slice > 0
+        self.max_steps = runtime.get("max_steps")
+        assert self.max_steps is None or (
+            isinstance(self.max_steps, int) and self.max_steps > 0
+        )
+        self.interpreter = runtime.get("interpreter", "lexicon")
+        assert self.interpreter in INTERPRETERS
+        self.max_loop_iterations = runtime.get("max_loop_iterations", 100000)
+        assert isinstance(self.max_loop_iterations, int)
+        assert self.max_loop_iterations > 0
+        self.max_run_time = runtime.get("max_run_time")
+        assert self.max_run_time is None or (
+            TypeUtils.is_number(self.max_run_time) and self.max_run_time > 0
+        )
+        self.response_memory_limit = runtime.get("response_memory_limit")
+        assert _is_size(self.response_memory_limit)
+        self.upload_memory_limit = runtime.get("upload_memory_limit")
+        assert _is_size(self.upload_memory_limit)
+        self.service_limits = runtime.get("service_limits") or {}
+        assert isinstance(self.service_limits, dict)
+        assert all(isinstance(v, dict) for v in self.service_limits.values())
+        self.service_cache = runtime.get("service_cache") or {}
+        assert isinstance(self.service_cache, dict)
+        for commands in self.service_cache.values():
+            assert isinstance(commands, dict)
+            assert all(isinstance(v, dict) for v in commands.values())
+        self.service_hedging = runtime.get("service_hedging") or {}
+        assert isinstance(self.service_hedging, dict)
+        for commands in self.service_hedging.values():
+            assert isinstance(commands, dict)
+            assert all(isinstance(v, dict) for v in commands.values())
+        self.output_sampling = runtime.get("output_sampling") or {}
+        assert isinstance(self.output_sampling, dict)
+        assert all(
+            TypeUtils.is_number(v) and 0 <= v <= 1
+            for v in self.output_sampling.values()
+        )
+
         self._expose = []
         for expose in raw.get(KEY_FORWARDS, raw.get(KEY_EXPOSE, [])):
             e = Forward(
@@ -33,3 +176,9 @@ class AppConfig:
 
     def get_expose_config(self):
         return self._expose
+
+
+def _is_size(value) -> bool:
+    return value is None or (
+        isinstance(value, int) and not isinstance(value, bool) and value >= 0
+    )
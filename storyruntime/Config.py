@@ -25,6 +25,12 @@ class Config:
         "REPORTING_SENTRY_DSN": None,
         "REPORTING_CLEVERTAP_ACCOUNT": None,
         "REPORTING_CLEVERTAP_PASS": None,
+        "HTTP_MAX_CLIENTS_SERVICES": 100,
+        "HTTP_MAX_CLIENTS_KUBERNETES": 20,
+        "HTTP_MAX_CLIENTS_SYNAPSE": 20,
+        "HTTP_MAX_CLIENTS_INTERNET": 50,
+        "HTTP_CIRCUIT_BREAKER_FAILURES": 5,
+        "HTTP_CIRCUIT_BREAKER_RESET_SECONDS": 10,
     }
 
     APP_ENVIRONMENT = AppEnvironment[
@@ -71,12 +71,14 @@ class TypeValueRuntimeError(StoryscriptRuntimeError):
 
 
 class InvalidKeywordUsage(StoryscriptError):
-    def __init__(self, story, line, keyword):
-        super().__init__(
-            message=f'Invalid usage of keyword "{keyword}".',
-            story=story,
-            line=line,
-        )
+    def __init__(self, story, line, keyword, story_name=None):
+        message = f'Invalid usage of keyword "{keyword}".'
+        if story_name is not None:
+            # Raised when a story is deployed, without a story to trace.
+            src = (line.get("src") or f"method={line['method']}").strip()
+            message += f'\n    at line {line["ln"]}: {src} (in {story_name})'
+
+        super().__init__(message=message, story=story, line=line)
 
 
 class ContainerSpecNotRegisteredError(StoryscriptError):
@@ -188,3 +190,24 @@ class EnvironmentVariableNotFound(StoryscriptError):
             story,
             line,
         )
+
+
+class CircuitOpenError(StoryscriptError):
+    def __init__(self, endpoint, retry_in, story=None, line=None):
+        super().__init__(
+            message=f"Calls to {endpoint} are failing, so it is not being "
+            f"called for another {retry_in:.1f}s",
+            story=story,
+            line=line,
+        )
+
+
+class ServiceBusyError(StoryscriptError):
+    def __init__(self, service, reason, story=None, line=None):
+        super().__init__(
+            message=f'The service "{service}" is busy, since {reason}. '
+            f"Hint: Its limits can be raised in runtime.service_limits "
+            f"of asyncy.yaml",
+            story=story,
+            line=line,
+        )
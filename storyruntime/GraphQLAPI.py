@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import asyncio
-import json
 
 import certifi
 
@@ -8,6 +7,7 @@ from tornado.httpclient import AsyncHTTPClient, HTTPError
 
 from .Exceptions import ServiceNotFound
 from .utils.HttpUtils import HttpUtils
+from .utils.JsonCodec import JsonCodec
 
 
 class GraphQLAPI:
@@ -31,7 +31,7 @@ class GraphQLAPI:
         kwargs = {
             "headers": {"Content-Type": "application/json"},
             "method": "POST",
-            "body": json.dumps(
+            "body": JsonCodec.dumps(
                 {"query": query, "variables": {"alias": alias, "tag": tag}}
             ),
             "ca_certs": certifi.where(),
@@ -41,7 +41,7 @@ class GraphQLAPI:
             config, logger, client, kwargs
         )
 
-        graph_result = json.loads(res.body)
+        graph_result = JsonCodec.loads(res.body)
 
         res = graph_result["data"]["serviceByAlias"]
         if not res:
@@ -81,7 +81,7 @@ class GraphQLAPI:
         kwargs = {
             "headers": {"Content-Type": "application/json"},
             "method": "POST",
-            "body": json.dumps(
+            "body": JsonCodec.dumps(
                 {
                     "query": query,
                     "variables": {
@@ -98,7 +98,7 @@ class GraphQLAPI:
             config, logger, client, kwargs
         )
 
-        graph_result = json.loads(res.body)
+        graph_result = JsonCodec.loads(res.body)
         if (
             len(graph_result["data"]["allOwners"]["nodes"]) == 0
             or len(
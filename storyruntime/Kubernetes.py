@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import base64
-import json
 import socket
 import ssl
 import time
@@ -9,7 +8,7 @@ import typing
 import urllib.parse
 from asyncio import TimeoutError
 
-from tornado.httpclient import AsyncHTTPClient, HTTPResponse
+from tornado.httpclient import HTTPResponse
 
 from . import AppConfig
 from .AppConfig import Forward
@@ -19,7 +18,9 @@ from .db.Database import Database
 from .entities.ContainerConfig import ContainerConfig, ContainerConfigs
 from .entities.Volume import Volumes
 from .utils.Dict import Dict
+from .utils.HttpClients import HttpClients
 from .utils.HttpUtils import HttpUtils
+from .utils.JsonCodec import JsonCodec
 
 
 class Kubernetes:
@@ -172,12 +173,12 @@ class Kubernetes:
             ] = "application/merge-patch+json; charset=utf-8"
 
         if payload is not None:
-            kwargs["body"] = json.dumps(payload)
+            kwargs["body"] = JsonCodec.dumps(payload)
 
             if method == "get":  # Default value.
                 kwargs["method"] = "POST"
 
-        client = AsyncHTTPClient()
+        client = HttpClients.get(HttpClients.KUBERNETES)
         return await HttpUtils.fetch_with_retry(
             3, logger, f"https://{config.CLUSTER_HOST}{path}", client, kwargs
         )
@@ -276,7 +277,7 @@ class Kubernetes:
             f"{prefix}/{app.app_id}/{resource}" f"?includeUninitialized=true",
         )
 
-        body = json.loads(res.body, encoding="utf-8")
+        body = JsonCodec.loads(res.body)
         out = []
 
         for i in body["items"]:
@@ -426,7 +427,7 @@ class Kubernetes:
     async def create_imagepullsecret(cls, app, config: ContainerConfig):
 
         b64_container_config = base64.b64encode(
-            json.dumps(config.data).encode()
+            JsonCodec.dumps(config.data).encode()
         ).decode()
 
         payload = {
@@ -478,7 +479,7 @@ class Kubernetes:
             app.config, app.logger, f"{prefix}/{app.app_id}/pods?{qs}"
         )
         cls.raise_if_not_2xx(res)
-        body = json.loads(res.body, encoding="utf-8")
+        body = JsonCodec.loads(res.body)
         for pod in body["items"]:
             for container_status in pod["status"].get("containerStatuses", []):
                 is_waiting = Dict.find(
@@ -666,7 +667,7 @@ class Kubernetes:
         while True:
             res = await cls.make_k8s_call(app.config, app.logger, path)
             cls.raise_if_not_2xx(res)
-            body = json.loads(res.body, encoding="utf-8")
+            body = JsonCodec.loads(res.body)
             if body["status"].get("readyReplicas", 0) > 0:
                 break
 
@@ -3,7 +3,13 @@ import json
 import os
 import traceback
 from distutils.util import strtobool
-from logging import Formatter, LoggerAdapter, StreamHandler, getLevelName
+from logging import (
+    DEBUG,
+    Formatter,
+    LoggerAdapter,
+    StreamHandler,
+    getLevelName,
+)
 
 from frustum import Frustum
 
@@ -89,6 +95,8 @@ class Logger:
         ),
     ]
 
+    debug_events = frozenset(e[0] for e in events if e[1] == "debug")
+
     def __init__(self, config):
         self.frustum = Frustum(config.LOGGER_NAME, config.LOGGER_LEVEL)
 
@@ -114,13 +122,30 @@ class Logger:
     def adapt(self, app_id, version):
         self.frustum.logger = self.adapter(app_id, version)
 
+    def is_debug_enabled(self):
+        """
+        Cheap check for guarding debug messages which are expensive to
+        build, such as those that dump the context.
+        """
+        return self.frustum.logger.isEnabledFor(DEBUG)
+
     def log(self, event, *args):
+        if event in self.debug_events and not self.is_debug_enabled():
+            return
         self.frustum.log(event, *args)
 
     def info(self, message):
         getattr(self.frustum.logger, "info")(message)
 
-    def debug(self, message):
+    def debug(self, message, *args):
+        """
+        Logs a debug message. When args are given, the message is only
+        formatted with them (see str.format) if debug logging is enabled.
+        """
+        if args:
+            if not self.is_debug_enabled():
+                return
+            message = message.format(*args)
         getattr(self.frustum.logger, "debug")(message)
 
     def error(self, message, exc=None):
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from prometheus_client import Summary
+from prometheus_client import Counter, Gauge, Summary
 
 
 story_request = Summary(
@@ -37,3 +37,88 @@ container_start_seconds_total = Summary(
     "Time spent executing commands in containers",
     ["app_id", "story_name", "service"],
 )
+
+http_pool_queue_seconds = Summary(
+    "asyncy_engine_http_pool_queue_seconds",
+    "Time spent by HTTP requests waiting for their pool",
+    ["pool"],
+)
+
+http_pool_waiting_requests = Gauge(
+    "asyncy_engine_http_pool_waiting_requests",
+    "HTTP requests waiting for their pool",
+    ["pool"],
+)
+
+http_pool_active_requests = Gauge(
+    "asyncy_engine_http_pool_active_requests",
+    "HTTP requests in flight",
+    ["pool"],
+)
+
+http_circuit_breaker_state = Gauge(
+    "asyncy_engine_http_circuit_breaker_state",
+    "State of the circuit breaker of an endpoint "
+    "(0 = closed, 1 = half-open, 2 = open)",
+    ["endpoint"],
+)
+
+http_circuit_breaker_rejected_total = Counter(
+    "asyncy_engine_http_circuit_breaker_rejected_total",
+    "HTTP requests failed fast by an open circuit breaker",
+    ["endpoint"],
+)
+
+http_retry_budget_exhausted_total = Counter(
+    "asyncy_engine_http_retry_budget_exhausted_total",
+    "HTTP requests not retried since the retry budget was used up",
+    ["endpoint"],
+)
+
+service_queue_depth = Gauge(
+    "asyncy_engine_service_queue_depth",
+    "Calls waiting for a service which is at its concurrency limit",
+    ["app_id", "service"],
+)
+
+service_queue_seconds = Summary(
+    "asyncy_engine_service_queue_seconds",
+    "Time spent by calls waiting for a service",
+    ["app_id", "service"],
+)
+
+service_cache_hits_total = Counter(
+    "asyncy_engine_service_cache_hits_total",
+    "Service calls answered by the response cache",
+    ["app_id", "service"],
+)
+
+service_cache_misses_total = Counter(
+    "asyncy_engine_service_cache_misses_total",
+    "Service calls not answered by the response cache",
+    ["app_id", "service"],
+)
+
+service_cache_evictions_total = Counter(
+    "asyncy_engine_service_cache_evictions_total",
+    "Responses evicted from the response cache, or expired",
+    ["app_id", "service"],
+)
+
+service_hedge_calls_total = Counter(
+    "asyncy_engine_service_hedge_calls_total",
+    "Service calls of commands which are hedged",
+    ["app_id", "service"],
+)
+
+service_hedges_total = Counter(
+    "asyncy_engine_service_hedges_total",
+    "Service calls which were slow enough to send a hedged request",
+    ["app_id", "service"],
+)
+
+service_hedge_wins_total = Counter(
+    "asyncy_engine_service_hedge_wins_total",
+    "Hedged requests which responded before the original request",
+    ["app_id", "service"],
+)
@@ -20,6 +20,8 @@ from .http_handlers.StoryEventHandler import StoryEventHandler
 from .processing.Services import Services
 from .processing.internal import File, Http, Json, Log
 from .reporting.Reporter import Reporter
+from .utils.CircuitBreaker import CircuitBreaker
+from .utils.HttpClients import HttpClients
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
 
@@ -71,6 +73,8 @@ class Service:
             config.REPORTING_SENTRY_DSN = sentry_dsn
 
         Services.set_logger(logger)
+        HttpClients.init(config)
+        CircuitBreaker.init(config)
         Reporter.init(config=config, glogger=logger, release=release)
 
         # Init internal services.
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import urllib.parse
 from typing import Dict, List, Tuple, Union
 
@@ -11,6 +10,7 @@ from .Kubernetes import Kubernetes
 from .Logger import Logger
 from .constants.ServiceConstants import ServiceConstants
 from .db.Database import Database
+from .utils.JsonCodec import JsonCodec
 
 
 class ServiceUsage:
@@ -75,7 +75,7 @@ class ServiceUsage:
             config, logger, f"{prefix}/pods?{qs}"
         )
         Kubernetes.raise_if_not_2xx(res)
-        body = json.loads(res.body, encoding="utf-8")
+        body = JsonCodec.loads(res.body)
         if len(body["items"]) == 0:
             # Metrics not available yet
             return None
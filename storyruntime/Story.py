@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import copy
+import sys
 import time
 import uuid
 from contextlib import contextmanager
@@ -7,9 +8,13 @@ from itertools import chain
 from json import dumps
 
 from .Exceptions import StackOverflowException
+from .Types import StreamingService
 from .utils import Dict
-from .utils.Resolver import Resolver
+from .utils.ArgumentIndex import ArgumentIndex
+from .utils.BlockIndex import BlockIndex
+from .utils.ExpressionCompiler import ExpressionCompiler
 from .utils.StringUtils import StringUtils
+from .utils.TypeUtils import TypeUtils
 
 MAX_BYTES_LOGGING = 160
 
@@ -26,9 +31,16 @@ class Story:
         self.logger = logger
         self.tree = app.stories[story_name]["tree"]
         self.entrypoint = app.stories[story_name]["entrypoint"]
+        self.execution_plan = app.execution_plans.get(story_name)
+        self.scheduler = None
+        self._block_index = None
+        self._expressions = None
+        self._arguments = None
+        self._safe_values = {}
         self.results = {}
         self.environment = None
-        self._contexts = []
+        self._frames = []
+        self._slots = {}
         self.containers = None
         self.repository = None
         self.version = None
@@ -39,24 +51,49 @@ class Story:
     def new_frame(self, line_number: str):
         # No need for a try/finally block, since we don't want to unwind
         # the stack when an exception occurs.
+        self.push_frame(line_number)
+        yield
+        self.pop_frame()
+
+    def push_frame(self, line_number: str):
         if len(self._stack) >= Story.MAX_FRAMES_IN_STACK:
             raise StackOverflowException(Story.MAX_FRAMES_IN_STACK)
 
         self._stack.append(line_number)
-        yield
+
+    def pop_frame(self):
         self._stack.pop()
 
     def get_stack(self) -> []:
         return self._stack
 
+    @property
+    def _contexts(self):
+        """
+        The stack of local contexts, innermost last.
+        """
+        return self._frames
+
+    @_contexts.setter
+    def _contexts(self, contexts):
+        self._frames = contexts
+        self._slots.clear()
+
     @contextmanager
     def new_context(self):
         """
         Creates a new context in the stack
         """
-        self._contexts.append({})
+        self.push_context()
         yield
-        self._contexts.pop()
+        self.pop_context()
+
+    def push_context(self):
+        self._frames.append({})
+
+    def pop_context(self):
+        self._frames.pop()
+        self._slots.clear()
 
     def global_context(self):
         """
@@ -67,14 +104,27 @@ class Story:
     def resolve_context(self, variable):
         """
         Used by set_variable to determine the context for a given variable
+
+        The local context which holds a variable is remembered (in slots),
+        so that variables used in loops are not searched for over and over.
+        Slots are forgotten whenever a context is removed from the stack.
         """
-        global_context = self.global_context()
-        for ctx in chain(reversed(self._contexts), (global_context,)):
+        context = self._slots.get(variable)
+        if context is not None and variable in context:
+            return context
+
+        for ctx in reversed(self._frames):
             if variable in ctx:
+                self._slots[variable] = ctx
                 return ctx
+
+        global_context = self.global_context()
+        if variable in global_context:
+            return global_context
+
         # variable not found in existing context
-        if len(self._contexts) > 0:
-            context = self._contexts[-1]
+        if len(self._frames) > 0:
+            context = self._frames[-1]
         else:
             context = global_context
         return context
@@ -100,6 +150,52 @@ class Story:
     def first_line(self):
         return self.entrypoint
 
+    def _from_plan(self, name: str, cls):
+        """
+        Returns the artifact compiled with the execution plan of the app
+        for the tree of this story. It is shared by all stories, unless
+        the tree of this story has been swapped out, in which case it is
+        compiled again.
+        """
+        artifact = getattr(self.execution_plan, name, None)
+        if not isinstance(artifact, cls) or artifact.tree is not self.tree:
+            artifact = cls(self.tree)
+
+        return artifact
+
+    def block_index(self) -> BlockIndex:
+        """
+        Returns the block structure index for the tree of this story.
+        """
+        index = self._block_index
+        if index is None or index.tree is not self.tree:
+            index = self._from_plan("index", BlockIndex)
+            self._block_index = index
+
+        return index
+
+    def expressions(self) -> ExpressionCompiler:
+        """
+        Returns the expression compiler for the tree of this story.
+        """
+        compiler = self._expressions
+        if compiler is None or compiler.tree is not self.tree:
+            compiler = self._from_plan("expressions", ExpressionCompiler)
+            self._expressions = compiler
+
+        return compiler
+
+    def arguments(self) -> ArgumentIndex:
+        """
+        Returns the argument index for the tree of this story.
+        """
+        index = self._arguments
+        if index is None or index.tree is not self.tree:
+            index = self._from_plan("arguments", ArgumentIndex)
+            self._arguments = index
+
+        return index
+
     def line_has_parent(self, parent_line_number, line):
         """
         Looks up the hierarchy of this line to see if it
@@ -115,56 +211,14 @@ class Story:
         if parent_line_number == line.get("parent", None):
             return True
 
-        while line is not None:
-            my_parent_number = line.get("parent", None)
-
-            if my_parent_number is None:
-                return False
-
-            if my_parent_number == parent_line_number:
-                return True
-
-            line = self.line(my_parent_number)
+        return self.block_index().is_ancestor(parent_line_number, line["ln"])
 
     def next_block(self, parent_line: dict):
         """
         Given a parent_line, it skips through the block and returns the next
         line after this block.
         """
-        next_line = parent_line
-
-        while next_line.get("next") is not None:
-            next_line = self.line(next_line["next"])
-
-            # See if the next line is a block. If it is, skip through it.
-            if (
-                next_line.get("enter", None) is not None
-                and next_line.get("parent") == parent_line["ln"]
-            ):
-                next_line = self.next_block(next_line)
-
-                if next_line is None:
-                    return None
-
-            if not self.line_has_parent(parent_line["ln"], next_line):
-                break
-
-        # We might have skipped through all the lines in this story,
-        # and ended up on on the last line.
-        # If this last line belongs to the same parent, then return None.
-        # This check is required because the while loop breaks when it can't
-        # find a next line.
-        if next_line.get("parent") is not None and self.line_has_parent(
-            parent_line["ln"], next_line
-        ):
-            return None
-
-        # If the next_line == parent_line, then there weren't any more lines
-        # after the parent.
-        if next_line["ln"] == parent_line["ln"]:
-            return None
-
-        return next_line
+        return self.block_index().next_block(parent_line)
 
     @staticmethod
     def get_str_for_logging(result) -> str:
@@ -179,13 +233,14 @@ class Story:
         """
         Resolves line argument to their real value
         """
-        result = Resolver(self).resolve(arg)
+        result = self.expressions().resolve(self, arg)
 
-        self.logger.debug(
-            f'Resolved "{arg}" to '
-            f'"{self.get_str_for_logging(result)}" '
-            f"with type {type(result)}"
-        )
+        if self.logger.is_debug_enabled():
+            self.logger.debug(
+                f'Resolved "{arg}" to '
+                f'"{self.get_str_for_logging(result)}" '
+                f"with type {type(result)}"
+            )
 
         # encode and escape then format for shell
         if encode:
@@ -226,6 +281,7 @@ class Story:
         return results
 
     def start_line(self, line_number):
+        self._forget_unused_values()
         self.results[line_number] = {"start": time.time()}
 
     def end_line(self, line_number, output=None, assign=None):
@@ -260,7 +316,41 @@ class Story:
         # Resolving context for assign['paths'][0] works
         # because all subsequent paths have been resolved to their values
         context = self.resolve_context(variable)
-        Dict.set(context, assign["paths"], output)
+        Dict.set(context, assign["paths"], self.sanitize(output))
+
+    def sanitize(self, value):
+        """
+        Sanitizes a value which is about to be written to the context
+        (see TypeUtils#safe_type). Lists and maps are only walked once;
+        writing the same value again (such as in b = a) returns it as it
+        is, for as long as the story uses the value.
+        """
+        if isinstance(value, StreamingService):
+            # Streaming services are the runtime's own handle to a
+            # container, and are looked up again by when blocks.
+            return value
+
+        value = TypeUtils.safe_type(value, self._safe_values)
+        if type(value) in (list, dict):
+            self._safe_values[id(value)] = value
+
+        return value
+
+    def _forget_unused_values(self):
+        """
+        Forgets the sanitized values which nothing but _safe_values refers
+        to anymore, so that they are not kept alive by it. Lists and maps
+        can't be weakly referenced, so their reference count is checked
+        instead.
+        """
+        safe_values = self._safe_values
+        unused = [
+            key
+            for key in safe_values
+            if sys.getrefcount(safe_values[key]) <= 2
+        ]
+        for key in unused:
+            del safe_values[key]
 
     def function_line_by_name(self, function_name):
         """
@@ -270,6 +360,16 @@ class Story:
         return self.line(line_number)
 
     def argument_by_name(self, line, argument_name, encode=False):
+        arguments = self.arguments().find(line)
+        if arguments is not None:
+            arg = arguments.get(argument_name)
+            if arg is None:
+                return None
+
+            return self.resolve(
+                arg.get("argument", arg.get("arg")), encode=encode
+            )
+
         args = line.get("args", line.get("arguments", line.get("arg")))
         if args is None:
             return None
@@ -284,7 +384,23 @@ class Story:
 
         return None
 
-    def context_for_function_call(self, line, function_line):
+    def fork(self):
+        """
+        Returns a story which shares everything with this one, except for
+        its stack of frames and its local contexts: the local contexts of
+        the fork are the ones of this story, with a new context on top.
+
+        Forks are used to execute blocks concurrently. Variables assigned
+        by a fork are assigned in its own context, unless they already
+        exist in one of the contexts it shares with this story.
+        """
+        story = copy.copy(self)
+        story._frames = self._frames + [{}]
+        story._slots = {}
+        story._stack = list(self._stack)
+        return story
+
+    def context_for_function_call(self, line, function_line, borrow=False):
         """
         Prepares a new context for calling a function.
         This context consists of the arguments required by the function,
@@ -297,6 +413,8 @@ class Story:
         3. Execute the function block
         4. Restore the original Story#context and continue execution
 
+        :param borrow: if True, arguments are not copied. This is only safe
+                       for functions which never write into a value in place
         :return: A new context, which contains the arguments required (if any)
         """
         new_context = {}
@@ -305,8 +423,9 @@ class Story:
             if arg["$OBJECT"] == "argument" or arg["$OBJECT"] == "arg":
                 arg_name = arg["name"]
                 actual = self.argument_by_name(line, arg_name)
-                copied = copy.deepcopy(actual)
-                Dict.set(new_context, [arg_name], copied)
+                if not borrow:
+                    actual = copy.deepcopy(actual)
+                Dict.set(new_context, [arg_name], actual)
 
         return new_context
 
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import weakref
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledBody:
+    """
+    The body of a response which was too large to be kept in memory, and
+    was spooled to a file instead (see ResponseSpool). It is passed
+    around by stories like any other value, without being read, and it is
+    only read by whoever needs its contents.
+
+    The file is removed once the body is no longer referenced.
+    """
+
+    __slots__ = ("path", "size", "content_type", "__weakref__")
+
+    def __init__(self, path: str, size: int, content_type: str = None):
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        weakref.finalize(self, _remove, path)
+
+    def open(self, mode="rb", encoding=None):
+        return open(self.path, mode, encoding=encoding)
+
+    def read(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        Yields the body in chunks of chunk_size bytes.
+        """
+        with self.open() as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def copy_to(self, path: str):
+        shutil.copyfile(self.path, path)
+
+    def __copy__(self):
+        # The file belongs to this object, so copies must share it.
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return (
+            f"SpooledBody(size={self.size}, content_type={self.content_type})"
+        )
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -4,7 +4,7 @@ import time
 from requests.structures import CaseInsensitiveDict
 
 import tornado
-from tornado.httputil import HTTPServerRequest
+from tornado.httputil import HTTPServerRequest, _parse_header
 
 import ujson
 
@@ -13,13 +13,73 @@ from .. import Metrics
 from ..Apps import Apps
 from ..constants import ContextConstants
 from ..entities.Multipart import FileFormField
+from ..entities.SpooledBody import SpooledBody
 from ..processing import Stories
 from ..utils.Dict import Dict
+from ..utils.MultipartSpool import MultipartSpool
 
 CLOUD_EVENTS_FILE_KEY = "_ce_payload"
 
 
+@tornado.web.stream_request_body
 class StoryEventHandler(BaseHandler):
+    """
+    Runs a story for an event. The body of the request is streamed in, and
+    the files uploaded with a multipart/form-data request are spooled to
+    disk as they are received if they are larger than the
+    upload_memory_limit of the app (see MultipartSpool). Every other body
+    is kept in memory.
+    """
+
+    _chunks = None
+    _multipart = None
+
+    def prepare(self):
+        content_type = self.get_req().headers.get("Content-Type", "")
+        boundary = None
+        if content_type.startswith("multipart/form-data"):
+            _, params = _parse_header(content_type)
+            boundary = params.get("boundary")
+
+        if not boundary:
+            self._chunks = []
+            return
+
+        app = None
+        memory_limit = None
+        try:
+            app = Apps.get(self.get_argument("app"))
+            memory_limit = app.app_config.upload_memory_limit
+        except BaseException:
+            # The app is looked up again (and reported) by post.
+            pass
+
+        if not isinstance(memory_limit, int):
+            memory_limit = None
+        self._multipart = MultipartSpool(boundary.encode(), app, memory_limit)
+
+    def data_received(self, chunk: bytes):
+        if self._multipart is not None:
+            self._multipart.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def body_received(self):
+        """
+        Completes the request once all of its body has been received.
+        """
+        request = self.get_req()
+        if self._multipart is not None:
+            self._multipart.finish()
+            request.files = self._multipart.files
+            for name, values in self._multipart.arguments.items():
+                request.body_arguments.setdefault(name, []).extend(values)
+                request.arguments.setdefault(name, []).extend(values)
+            self._multipart = None
+        elif self._chunks is not None:
+            request.body = b"".join(self._chunks)
+            self._chunks = None
+
     async def run_story(self, app_id, story_name, block, event_body):
         io_loop = tornado.ioloop.IOLoop.current()
         context = {
@@ -60,6 +120,7 @@ class StoryEventHandler(BaseHandler):
         app_id = self.get_argument("app")
 
         try:
+            self.body_received()
             event_body = self.get_ce_event_payload()
             self.logger.info(
                 f"Running story for {app_id}: "
@@ -97,7 +158,10 @@ class StoryEventHandler(BaseHandler):
             assert file is not None  # If not there, then we need to raise.
             assert len(file) == 1  # There can be only one payload.
             assert file[0].content_type == "application/json"
-            payload = ujson.loads(file[0].body.decode("utf-8"))
+            body = file[0].body
+            if isinstance(body, SpooledBody):
+                body = body.read()
+            payload = ujson.loads(body.decode("utf-8"))
         else:
             raise Exception(
                 f"Unsupported Content-Type ({ct}) " f"for CloudEvents payload!"
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import random
 from collections import deque
 
 from .Exceptions import (
@@ -81,40 +82,112 @@ class ServiceOutputValidator:
               properties:
                 name:
                   type: string
+
+        Callers which validate many bodies against the same output should
+        compile it once instead (see compile).
+        """
+        cls.compile(expected_output)(body, action_resolution_chain)
+
+    @classmethod
+    def compile(cls, expected_output: dict):
+        """
+        Compiles expected_output (see raise_if_invalid) into a validator,
+        which is called with the body and the action_resolution_chain.
+
+        The schema is only read here. The validator checks a body in a
+        single pass over the properties of the schema, with the types to
+        expect resolved already.
         """
         omg_type = expected_output.get("type")
         if omg_type != "object":
-            cls.raise_for_type_mismatch(
-                "#root", omg_type, body, action_resolution_chain
-            )
-            return
+            return cls._compile_type_check("#root", omg_type)
 
         props = expected_output.get("properties")
-
         if props is None:
-            return
+            return _valid
 
+        checks = []
         for prop_name, prop_config in props.items():
-            if prop_name not in body:
-                raise MissingFieldOmgError(
-                    prop_name, action_resolution_chain, body
+            if prop_config.get("type") == "object":
+                checks.append((prop_name, True, cls.compile(prop_config)))
+            else:
+                checks.append(
+                    (
+                        prop_name,
+                        False,
+                        cls._compile_type_check(
+                            prop_name, prop_config.get("type")
+                        ),
+                    )
                 )
-            elif prop_config.get("type") == "object":
-                if body.get(prop_name) is None:
+
+        def validate(body, action_resolution_chain):
+            for prop_name, is_object, check in checks:
+                if prop_name not in body:
                     raise MissingFieldOmgError(
                         prop_name, action_resolution_chain, body
                     )
 
-                cls.raise_if_invalid(
-                    prop_config, body.get(prop_name), action_resolution_chain
-                )
-            else:
-                cls.raise_for_type_mismatch(
-                    prop_name,
-                    prop_config.get("type"),
-                    body.get(prop_name),
-                    action_resolution_chain,
-                )
+                value = body[prop_name]
+                if is_object and value is None:
+                    raise MissingFieldOmgError(
+                        prop_name, action_resolution_chain, body
+                    )
+
+                check(value, action_resolution_chain)
+
+        return validate
+
+    @classmethod
+    def _compile_type_check(cls, prop_name, omg_type_name):
+        """
+        Compiles raise_for_type_mismatch for a property.
+        """
+        python_type = cls.omg_types_to_python_types.get(omg_type_name)
+
+        if python_type is None:
+
+            def unsupported(value, action_resolution_chain):
+                raise UnsupportedTypeOmgError(omg_type_name)
+
+            return unsupported
+
+        if python_type is object:
+            return _valid
+
+        if type(python_type) is list:  # For number (it can be int/float).
+            python_types = tuple(python_type)
+        else:
+            python_types = (python_type,)
+
+        def check(value, action_resolution_chain):
+            if value is None or type(value) in python_types:
+                return
+
+            raise FieldValueTypeMismatchOmgError(
+                prop_name,
+                omg_type_name,
+                cls.python_types_to_omg_types.get(type(value), "unknown"),
+                value,
+                action_resolution_chain,
+            )
+
+        return check
+
+    @staticmethod
+    def sampled(validate, rate: float):
+        """
+        Wraps a compiled validator so that it only validates a fraction
+        (rate) of the bodies it is called with, picked at random.
+        """
+        if rate >= 1:
+            return validate
+
+        def sample(body, action_resolution_chain):
+            if random.random() < rate:
+                validate(body, action_resolution_chain)
+
+        return sample
 
     @classmethod
     def ensure_type(
@@ -136,3 +209,7 @@ class ServiceOutputValidator:
         raise FieldValueTypeMismatchOmgError(
             key, omg_type, omg_type_name, val, action_resolution_chain
         )
+
+
+def _valid(body, action_resolution_chain):
+    pass
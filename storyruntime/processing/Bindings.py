@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import re
+from math import inf
+
+
+class ArgumentBinding:
+    """
+    A single argument of a command, as declared in the OMG, compiled
+    ahead of time.
+    """
+
+    __slots__ = ("name", "conf", "location", "to_json", "validate")
+
+    def __init__(self, name: str, conf: dict):
+        self.name = name
+        self.conf = conf
+        self.location = conf.get("in", "requestBody")
+        self.to_json = conf.get("type", "any") == "string"
+        """
+        Whether lists and maps are sent as JSON (see Services#smart_insert).
+        """
+        self.validate = self.compile_validator(name, conf)
+
+    @classmethod
+    def compile_validator(cls, name: str, conf: dict):
+        """
+        Compiles the checks of Services#raise_for_type_mismatch for an
+        argument into a function, which takes a value and returns None if
+        the value is valid, or the name and type of the offending argument
+        (or property of an object) if it isn't.
+        """
+        t = conf.get("type", "any")
+        optional = not conf.get("required", False)
+        if t == "object":
+            return cls._compile_object(name, conf.get("properties"), optional)
+
+        matches = cls._compile_type(conf, t)
+
+        def validate(value):
+            if (value is None and optional) or matches(value):
+                return None
+            return name, t
+
+        return validate
+
+    @classmethod
+    def _compile_type(cls, conf: dict, t: str):
+        if t == "string":
+            return cls._compile_string(conf.get("pattern"))
+        elif t == "int" or t == "float":
+            python_type = int if t == "int" else float
+            number_range = conf.get("range")
+            low = high = None
+            if number_range is not None:
+                low = number_range.get("min", -inf)
+                high = number_range.get("max", inf)
+
+            def number(value):
+                if not isinstance(value, python_type):
+                    return False
+                return low is None or low <= value <= high
+
+            return number
+        elif t == "list":
+            return lambda value: isinstance(value, list)
+        elif t == "map":
+            return lambda value: isinstance(value, dict)
+        elif t == "boolean":
+            return lambda value: isinstance(value, bool)
+        elif t == "enum":
+            valid_values = conf.get("enum", [])
+            return lambda value: (
+                isinstance(value, str) and value in valid_values
+            )
+        elif t == "any":
+            return lambda value: True
+
+        return lambda value: False
+
+    @staticmethod
+    def _compile_string(pattern):
+        if pattern in ["", None]:
+            return lambda value: isinstance(value, str)
+
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            # Fails in the same way as it always has, once a value is
+            # actually matched against the pattern.
+            def string(value):
+                return (
+                    isinstance(value, str)
+                    and re.fullmatch(pattern, value) is not None
+                )
+
+            return string
+
+        def string(value):
+            return (
+                isinstance(value, str) and regex.fullmatch(value) is not None
+            )
+
+        return string
+
+    @classmethod
+    def _compile_object(cls, name: str, properties, optional: bool):
+        validators = []
+        keys = None
+        if properties is not None:
+            keys = properties.keys()
+            validators = [
+                cls.compile_validator(property_name, conf)
+                for property_name, conf in properties.items()
+            ]
+
+        def validate(value):
+            if value is None and optional:
+                return None
+
+            if keys is None or not isinstance(value, dict):
+                return name, "object"
+            if keys != value.keys():
+                return name, "object"
+
+            # The properties of an object are validated in order, and the
+            # first one which doesn't match is reported.
+            for property_name, validate_property in zip(keys, validators):
+                mismatch = validate_property(value.get(property_name))
+                if mismatch is not None:
+                    return mismatch
+            return None
+
+        return validate
+
+
+class BindingPlan:
+    """
+    The arguments of a command (the "arguments" of its config in the OMG),
+    compiled once per line, so that binding the arguments of a service
+    call is a single pass over them (see Services#execute_http).
+    """
+
+    __slots__ = ("command_conf", "bindings")
+
+    def __init__(self, command_conf: dict):
+        self.command_conf = command_conf
+        self.bindings = [
+            ArgumentBinding(name, conf)
+            for name, conf in command_conf.get("arguments", {}).items()
+        ]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from .. import Metrics
+from ..Exceptions import ServiceBusyError
+from ..utils.TypeUtils import TypeUtils
+
+DEFAULT_MAX_QUEUE = 100
+DEFAULT_QUEUE_TIMEOUT = 30
+
+
+class Bulkhead:
+    """
+    Limits the number of concurrent calls an app makes to a service, so
+    that a burst of calls queues in the runtime rather than overloading
+    the service (see Services#bulkhead).
+
+    Calls over the limit wait for their turn, in the order they were made.
+    A call fails with ServiceBusyError if max_queue calls are already
+    waiting, or if it waited queue_timeout seconds.
+    """
+
+    __slots__ = (
+        "app_id",
+        "service",
+        "max_concurrency",
+        "max_queue",
+        "queue_timeout",
+        "waiting",
+        "_slots",
+    )
+
+    def __init__(
+        self,
+        app_id: str,
+        service: str,
+        max_concurrency: int,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+    ):
+        assert isinstance(max_concurrency, int) and max_concurrency >= 1
+        assert isinstance(max_queue, int) and max_queue >= 0
+        assert TypeUtils.is_number(queue_timeout) and queue_timeout > 0
+        self.app_id = app_id
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_limits(cls, app_id: str, service: str, limits: dict):
+        """
+        :return: A bulkhead for the limits of a service (max_concurrency,
+                 max_queue and queue_timeout), or None if the calls to the
+                 service are not limited
+        """
+        if limits.get("max_concurrency") is None:
+            return None
+
+        return cls(
+            app_id,
+            service,
+            limits["max_concurrency"],
+            max_queue=limits.get("max_queue", DEFAULT_MAX_QUEUE),
+            queue_timeout=limits.get("queue_timeout", DEFAULT_QUEUE_TIMEOUT),
+        )
+
+    async def __aenter__(self):
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise ServiceBusyError(
+                self.service, f"{self.waiting} calls are waiting for it"
+            )
+
+        labels = {"app_id": self.app_id, "service": self.service}
+        depth = Metrics.service_queue_depth.labels(**labels)
+        start = time.time()
+        self.waiting += 1
+        depth.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ServiceBusyError(
+                self.service,
+                f"a call waited longer than {self.queue_timeout}s for it",
+            )
+        finally:
+            self.waiting -= 1
+            depth.dec()
+            Metrics.service_queue_seconds.labels(**labels).observe(
+                time.time() - start
+            )
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._slots.release()
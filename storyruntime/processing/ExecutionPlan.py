@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+from .Program import Program
+from ..Exceptions import InvalidKeywordUsage
+from ..utils.ArgumentIndex import ArgumentIndex
+from ..utils.BlockIndex import BlockIndex
+from ..utils.ExpressionCompiler import ExpressionCompiler
+
+
+class LinePlan:
+    """
+    A single line of a story, compiled ahead of time. The handler which
+    implements the line's method is bound directly to it, so that
+    executing the line does not require looking at the method again.
+    """
+
+    __slots__ = ("ln", "line", "method", "handler", "scoped")
+
+    def __init__(self, line: dict, handler, scoped: bool):
+        self.ln = line.get("ln")
+        self.line = line
+        self.method = line["method"]
+        self.handler = handler
+        self.scoped = scoped
+        """
+        Whether the line must be executed in a new context
+        (see Story#new_context).
+        """
+
+
+class ExecutionPlan:
+    """
+    The compiled form of a story tree.
+
+    A plan is built once per story when an App is constructed, and is
+    shared by every Story created from the same release.
+    """
+
+    def __init__(self, tree: dict, handler_for, scoped_methods):
+        self.tree = tree
+        self.index = BlockIndex(tree)
+        self.expressions = ExpressionCompiler(tree)
+        self.expressions.compile_tree()
+        self.arguments = ArgumentIndex(tree)
+        self.writing_functions = set()
+        """
+        Line numbers of the functions whose body writes into a value in
+        place (such as a[b] = c). Arguments to every other function are
+        passed without copying them (see Story#context_for_function_call).
+        """
+        self.lines = {}
+        for ln, line in tree.items():
+            if self._writes_in_place(line):
+                self._add_writing_functions(tree, line)
+
+            method = line.get("method")
+            handler = handler_for(method)
+            if handler is None:
+                # Lines such as catch/finally are never executed directly.
+                continue
+
+            self.lines[ln] = LinePlan(line, handler, method in scoped_methods)
+
+        self._program = None
+
+        self.concurrent_runs = {}
+        """
+        Runs of consecutive service calls which do not depend on each
+        other, keyed by the line number of the first call in the run.
+        """
+        self._find_concurrent_runs(tree)
+
+        self.parallel_loops = set()
+        """
+        Line numbers of the foreach loops whose iterations may be executed
+        concurrently, since neither the loop nor its body assign to a
+        variable which is assigned anywhere else.
+        """
+        self._find_parallel_loops(tree)
+
+    @property
+    def program(self) -> Program:
+        """
+        The lines of the story, lowered to a list of instructions. It is
+        only built once a story is executed by the stack interpreter.
+        """
+        if self._program is None:
+            self._program = Program(self.tree, self.index, self.lines)
+        return self._program
+
+    def get(self, line_number) -> LinePlan:
+        return self.lines.get(line_number)
+
+    def validate(self, story_name: str):
+        """
+        Raises InvalidKeywordUsage for the first break, continue or return
+        which is not nested inside a block it may be used in, so that such
+        stories fail to deploy rather than when the line is executed.
+        """
+        for ln in self.index.order:
+            line = self.tree[ln]
+            keyword = line.get("method")
+            blocks = _keyword_blocks.get(keyword)
+            if blocks is None:
+                continue
+
+            if all(
+                self.index.enclosing(ln, block) is None for block in blocks
+            ):
+                raise InvalidKeywordUsage(
+                    None, line, keyword, story_name=story_name
+                )
+
+    def _find_concurrent_runs(self, tree: dict):
+        seen = set()
+        for ln, line in tree.items():
+            if ln in seen or not self._may_run_concurrently(line):
+                continue
+
+            run = [line]
+            services = {line.get("service")}
+            defs = _names(line.get("name")) | _names(line.get("output"))
+            uses = _path_roots(line.get("args")) | services
+            seen.add(ln)
+
+            next_line = tree.get(line.get("next"))
+            while (
+                next_line is not None
+                and next_line["ln"] not in seen
+                and next_line.get("parent") == line.get("parent")
+                and self._may_run_concurrently(next_line)
+            ):
+                service = next_line.get("service")
+                next_defs = _names(next_line.get("name")) | _names(
+                    next_line.get("output")
+                )
+                next_uses = _path_roots(next_line.get("args")) | {service}
+                if (
+                    service in services
+                    or next_defs & (defs | uses)
+                    or next_uses & defs
+                ):
+                    break
+
+                run.append(next_line)
+                services.add(service)
+                defs |= next_defs
+                uses |= next_uses
+                seen.add(next_line["ln"])
+                next_line = tree.get(next_line.get("next"))
+
+            if len(run) > 1:
+                self.concurrent_runs[ln] = run
+
+    def _find_parallel_loops(self, tree: dict):
+        loops = [
+            ln for ln, line in tree.items() if line.get("method") == "for"
+        ]
+        if len(loops) == 0:
+            return
+
+        assigned = {ln: _assigned_names(line) for ln, line in tree.items()}
+        for loop in loops:
+            inside = set()
+            outside = set()
+            for ln, names in assigned.items():
+                if ln == loop or self.index.is_ancestor(loop, ln):
+                    inside |= names
+                else:
+                    outside |= names
+
+            if not inside & outside:
+                self.parallel_loops.add(loop)
+
+    @staticmethod
+    def _may_run_concurrently(line: dict) -> bool:
+        # Streaming services (with a block) are started, not executed.
+        return line.get("method") == "execute" and line.get("enter") is None
+
+    @staticmethod
+    def _writes_in_place(line: dict) -> bool:
+        name = line.get("name")
+        if name is not None and len(name) > 1:
+            return True
+
+        output = line.get("output")
+        return isinstance(output, dict) and len(output.get("paths", ())) > 1
+
+    def _add_writing_functions(self, tree: dict, line: dict):
+        parent = line.get("parent")
+        while parent is not None and parent in tree:
+            parent_line = tree[parent]
+            if parent_line.get("method") == "function":
+                self.writing_functions.add(parent)
+            parent = parent_line.get("parent")
+
+
+_keyword_blocks = {
+    "break": ("for", "while"),
+    "continue": ("for", "while"),
+    "return": ("when", "function"),
+}
+
+
+def _names(node) -> set:
+    """
+    Returns every name assigned to by the name or output of a line.
+    """
+    names = set()
+    if isinstance(node, str):
+        names.add(node)
+    elif isinstance(node, dict):
+        if "paths" in node:
+            names |= _names(node["paths"][:1])
+    elif isinstance(node, list):
+        for item in node:
+            names |= _names(item)
+    return names
+
+
+def _assigned_names(line: dict) -> set:
+    names = _names(line.get("name")) | _names(line.get("output"))
+    if line.get("method") == "function":
+        for arg in line.get("args", line.get("arg")) or ():
+            if isinstance(arg, dict) and arg.get("name") is not None:
+                names.add(arg["name"])
+    return names
+
+
+def _path_roots(node) -> set:
+    """
+    Returns the variables read by the arguments of a line.
+    """
+    roots = set()
+    if isinstance(node, dict):
+        if node.get("$OBJECT") == "path" and node.get("paths"):
+            roots.add(node["paths"][0])
+        for value in node.values():
+            roots |= _path_roots(value)
+    elif isinstance(node, list):
+        for item in node:
+            roots |= _path_roots(item)
+    return roots
@@ -0,0 +1,526 @@
+# -*- coding: utf-8 -*-
+from .Lexicon import Lexicon
+from .Program import Instruction
+from ..Exceptions import (
+    InvalidKeywordUsage,
+    StoryscriptError,
+    StoryscriptRuntimeError,
+)
+from ..constants.LineSentinels import LineSentinels
+
+
+class Interpreter:
+    """
+    Executes stories like Lexicon does, but without recursing.
+
+    Lexicon executes a nested block by awaiting Lexicon#execute_block from
+    the handler of the line which owns it (such as foreach or call), so
+    every level of nesting costs a few coroutines. The Interpreter keeps
+    an explicit stack of the blocks being executed instead, along with the
+    state of the constructs which own them, and iterates over it in a
+    single coroutine. It only awaits the handlers of the lines which do
+    not own a block (such as service calls).
+
+    Lines are executed from the story's Program: a block is a range of
+    instructions, and the position of the line being executed in each
+    block acts as its program counter.
+
+    The semantics are exactly those of Lexicon, down to the lines errors
+    are attributed to. The Interpreter is used when an app sets
+    runtime.interpreter to "stack" (see Stories#execute).
+    """
+
+    __slots__ = ("logger", "story", "plan", "program", "scheduler")
+
+    def __init__(self, logger, story):
+        self.logger = logger
+        self.story = story
+        self.plan = Lexicon.plan_for(story)
+        self.program = self.plan.program
+        self.scheduler = Lexicon.scheduler_for(story)
+
+    @classmethod
+    async def execute(cls, logger, story):
+        """
+        Executes each line in the story. See Stories#execute.
+        """
+        interpreter = cls(logger, story)
+        first_line = story.first_line()
+        root = _Block(None, interpreter.program.pc(first_line), top=True)
+        await interpreter.run(root)
+
+    @classmethod
+    async def execute_block(cls, logger, story, parent_line: dict):
+        """
+        Executes all the lines whose parent is parent_line.
+        See Lexicon#execute_block.
+        """
+        interpreter = cls(logger, story)
+        program = interpreter.program
+        first_line = Lexicon.enter_block(story, parent_line)
+        root = _Block(
+            program.at(program.pc(parent_line["ln"])),
+            program.pc(Lexicon.line_number_or_none(first_line)),
+        )
+        return await interpreter.run(root)
+
+    async def run(self, root):
+        """
+        Executes the root block, and every block nested in it.
+
+        The stack alternates between blocks and the constructs which own
+        them, with the root block at the bottom. The line being executed
+        in a block is not on the stack, unless it owns a block itself.
+
+        :return: The sentinel which ended the root block, if any.
+        """
+        story = self.story
+        stack = [root]
+        result = None
+        error = None
+        ended = False
+
+        while True:
+            block = stack[-1]
+            if not ended:
+                if not block.contains(block.pc):
+                    result = None
+                else:
+                    try:
+                        result = await self.execute_line(stack, block.pc)
+                        if result is _PUSHED:
+                            continue
+                        if not LineSentinels.is_sentinel(result):
+                            self.advance(block, result)
+                            continue
+                    except BaseException as e:
+                        error = e
+                        result = None
+
+            # The block has ended, with a sentinel, an error or neither.
+            ended = False
+            if block.top and result is not None:
+                raise StoryscriptRuntimeError(
+                    message=f"A sentinel has escaped ({result})!",
+                    story=story,
+                    line=self.program.at(block.pc).line,
+                )
+
+            stack.pop()
+            if len(stack) == 0:
+                if error is not None:
+                    raise error
+                return result
+
+            construct = stack.pop()
+            try:
+                if error is not None:
+                    error, e = None, error
+                    result = construct.failed(self, e)
+                else:
+                    result = construct.done(self, result)
+                result = await self.push(stack, construct, result)
+            except BaseException as e:
+                # The construct's line failed (see Lexicon#execute_line),
+                # which ends the block it belongs to.
+                error = Lexicon._line_error(story, construct.line, e)
+                result = None
+                ended = True
+                continue
+
+            if result is _PUSHED:
+                continue
+
+            self.end_line(construct.scoped)
+            if LineSentinels.is_sentinel(result):
+                ended = True
+                continue
+
+            try:
+                self.advance(stack[-1], result)
+            except BaseException as e:
+                error = e
+                ended = True
+
+    async def execute_line(self, stack, pc):
+        """
+        Executes a single line, like Lexicon#execute_line does. If the
+        line owns a block, the line and its block are pushed instead.
+
+        :return: The result of the line, or _PUSHED.
+        """
+        story = self.story
+        instruction = self.program.at(pc)
+        line_number = instruction.ln
+        run = self.plan.concurrent_runs.get(line_number)
+        if run is not None and Lexicon._can_run_concurrently(story, run):
+            return await Lexicon.execute_concurrently(self.logger, story, run)
+
+        op = instruction.op
+        line = instruction.line
+
+        story.start_line(line_number)
+        story.push_frame(line_number)
+        try:
+            await self.scheduler.step(story, line)
+
+            if op is None:
+                op = Lexicon.compile_line(line)
+
+            if op.scoped:
+                story.push_context()
+
+            construct = _constructs.get(op.handler)
+            if construct is not None and construct.applies(story, line):
+                construct = construct(instruction, op.scoped)
+                result = construct.start(self)
+                result = await self.push(stack, construct, result)
+                if result is _PUSHED:
+                    return result
+            else:
+                result = await op.handler(self.logger, story, line)
+        except BaseException as e:
+            raise Lexicon._line_error(story, line, e)
+
+        self.end_line(op.scoped)
+        return result
+
+    async def push(self, stack, construct, result):
+        """
+        Pushes the construct and the block it returned, if any.
+
+        :return: The result of the construct's line, or _PUSHED.
+        """
+        if not isinstance(result, _Block):
+            return result
+
+        if construct.steps:
+            # Every iteration is a step, even if its block is empty.
+            await self.scheduler.step(self.story, construct.line)
+
+        stack.append(construct)
+        stack.append(result)
+        return _PUSHED
+
+    def advance(self, block, line_number):
+        """
+        Moves on to the line returned by the line just executed.
+        """
+        block.pc = self.program.pc(line_number)
+        if block.top:
+            self.logger.log("story-execution", line_number)
+
+    def end_line(self, scoped):
+        if scoped:
+            self.story.pop_context()
+        self.story.pop_frame()
+
+    def line_number(self, pc):
+        if pc is None:
+            return None
+
+        return self.program.at(pc).ln
+
+
+_PUSHED = object()
+"""Returned instead of a result when a block has been pushed."""
+
+
+class _Block:
+    """
+    The lines nested inside the block of an instruction, from the line
+    being executed onwards. The top level block of a story has no
+    instruction.
+    """
+
+    __slots__ = ("instruction", "pc", "top")
+
+    def __init__(self, instruction: Instruction, pc, top=False):
+        self.instruction = instruction
+        self.pc = pc
+        self.top = top
+
+    def contains(self, pc) -> bool:
+        if self.top:
+            return pc is not None
+
+        return self.instruction.contains(pc)
+
+
+class _Construct:
+    """
+    The state of a line which owns a block, such as a loop.
+
+    start, done and failed return either the next block to execute, or
+    the result of the line (as its handler in Lexicon would).
+    """
+
+    __slots__ = ("instruction", "line", "scoped")
+
+    steps = False
+    """Whether every execution of the block counts as a step."""
+
+    def __init__(self, instruction: Instruction, scoped):
+        self.instruction = instruction
+        self.line = instruction.line
+        self.scoped = scoped
+
+    @staticmethod
+    def applies(story, line) -> bool:
+        return True
+
+    def start(self, interpreter):
+        raise NotImplementedError()
+
+    def done(self, interpreter, result):
+        raise NotImplementedError()
+
+    def failed(self, interpreter, e):
+        """
+        Called when the block failed with e. Raises e, unless the construct
+        handles it.
+        """
+        raise e
+
+    @staticmethod
+    def block(instruction: Instruction):
+        return _Block(instruction, instruction.enter)
+
+
+class _If(_Construct):
+    """
+    See Lexicon#if_condition.
+    """
+
+    __slots__ = ("branch",)
+
+    def start(self, interpreter):
+        instruction = self.instruction
+        if instruction.chain is None:
+            # elif/else lines have been evaluated along with their if.
+            return interpreter.line_number(instruction.exit)
+
+        logger = interpreter.logger
+        story = interpreter.story
+        for branch in instruction.chain:
+            if logger.is_debug_enabled():
+                logger.log(
+                    "lexicon-if", branch.line, story.build_combined_context()
+                )
+
+            if branch.line["method"] == "else" or (
+                Lexicon._is_if_condition_true(story, branch.line)
+            ):
+                self.branch = branch
+                return self.block(branch)
+
+        return interpreter.line_number(instruction.chain[-1].exit)
+
+    def done(self, interpreter, result):
+        if LineSentinels.is_sentinel(result):
+            return result
+
+        return interpreter.line_number(self.branch.next)
+
+
+class _ForEach(_Construct):
+    """
+    See Lexicon#foreach.
+    """
+
+    __slots__ = ("data", "iterable")
+
+    @staticmethod
+    def applies(story, line) -> bool:
+        # Concurrent iterations are left to Lexicon.
+        return Lexicon.foreach_concurrency(story, line) == 1
+
+    def start(self, interpreter):
+        story = interpreter.story
+        line = self.line
+        data = story.resolve(line["args"][0], encode=False)
+        assert type(data) in [list, dict], f"Cannot iterate over {type(data)}"
+        iterable = enumerate(data) if isinstance(data, list) else data.items()
+
+        output = line["output"]
+        assert (
+            1 <= len(output) <= 2
+        ), f"foreach output must be 1 or 2 values, found {len(output)}"
+
+        self.data = data
+        self.iterable = iter(iterable)
+        return self.next(interpreter)
+
+    def next(self, interpreter):
+        item = next(self.iterable, None)
+        if item is None:
+            return interpreter.line_number(self.instruction.exit)
+
+        Lexicon._set_foreach_output(
+            interpreter.story, self.line, self.data, *item
+        )
+        return self.block(self.instruction)
+
+    def done(self, interpreter, result):
+        if LineSentinels.BREAK == result:
+            return interpreter.line_number(self.instruction.exit)
+        if LineSentinels.is_sentinel(result) and (
+            LineSentinels.CONTINUE != result
+        ):
+            return result
+
+        return self.next(interpreter)
+
+
+class _While(_Construct):
+    """
+    See Lexicon#while_.
+    """
+
+    __slots__ = ("iterations",)
+
+    steps = True
+
+    def __init__(self, instruction: Instruction, scoped):
+        super().__init__(instruction, scoped)
+        self.iterations = 0
+
+    def start(self, interpreter):
+        story = interpreter.story
+        if not story.resolve(self.line["args"][0]):
+            return interpreter.line_number(self.instruction.exit)
+
+        interpreter.scheduler.iterate(story, self.line, self.iterations)
+        self.iterations += 1
+        return self.block(self.instruction)
+
+    def done(self, interpreter, result):
+        if LineSentinels.BREAK == result:
+            return interpreter.line_number(self.instruction.exit)
+        if LineSentinels.is_sentinel(result) and (
+            LineSentinels.CONTINUE != result
+        ):
+            return result
+
+        return self.start(interpreter)
+
+
+class _Call(_Construct):
+    """
+    See Lexicon#call.
+    """
+
+    __slots__ = ("old_contexts", "borrow")
+
+    def start(self, interpreter):
+        story = interpreter.story
+        program = interpreter.program
+        self.old_contexts = story._contexts
+        function_line, self.borrow = Lexicon.enter_function(story, self.line)
+        return self.block(program.at(program.pc(function_line["ln"])))
+
+    def done(self, interpreter, result):
+        output = None
+        try:
+            output = Lexicon.function_result(result, self.borrow)
+            return interpreter.line_number(self.instruction.next)
+        finally:
+            Lexicon.leave_function(
+                interpreter.story, self.line, self.old_contexts, output
+            )
+
+    def failed(self, interpreter, e):
+        Lexicon.leave_function(
+            interpreter.story, self.line, self.old_contexts, None
+        )
+        raise e
+
+
+class _Try(_Construct):
+    """
+    See Lexicon#try_catch.
+    """
+
+    __slots__ = ("next_pc", "block_name", "sentinel", "error")
+
+    def start(self, interpreter):
+        self.next_pc = self.instruction.exit
+        self.block_name = "try"
+        self.sentinel = None
+        self.error = None
+        return self.block(self.instruction)
+
+    def done(self, interpreter, result):
+        if self.block_name == "finally":
+            if LineSentinels.is_sentinel(result):
+                # Sentinels are banned inside finally block for now.
+                raise InvalidKeywordUsage(
+                    interpreter.story, self.line, result.keyword
+                )
+            return self.after_finally(interpreter)
+
+        if LineSentinels.is_sentinel(result):
+            self.sentinel = result
+        return self.next_block_or_finally(interpreter)
+
+    def failed(self, interpreter, e):
+        if self.block_name == "finally" or not isinstance(e, StoryscriptError):
+            raise e
+
+        if self.block_name == "catch":
+            # The finally block is executed, followed by raising e.
+            self.error = e
+            return self.next_block_or_finally(interpreter)
+
+        if self.next_pc is None:
+            return None
+
+        next_line = interpreter.program.at(self.next_pc)
+        method = next_line.line["method"]
+        if method != "finally" and method != "catch":
+            return next_line.ln
+        elif method == "finally":
+            # skip right to the finally block
+            return self.next_block_or_finally(interpreter)
+
+        self.block_name = "catch"
+        return self.block(next_line)
+
+    def next_block_or_finally(self, interpreter):
+        if self.next_pc is None:
+            if self.error is not None:
+                raise self.error
+            return None
+
+        program = interpreter.program
+        next_line = program.at(self.next_pc)
+        if next_line.line["method"] != "finally":
+            self.next_pc = next_line.exit
+
+        if self.next_pc is not None:
+            last_block = program.at(self.next_pc)
+            if last_block.line["method"] == "finally":
+                self.block_name = "finally"
+                return self.block(last_block)
+
+        return self.after_finally(interpreter)
+
+    def after_finally(self, interpreter):
+        if self.block_name == "finally":
+            self.next_pc = interpreter.program.at(self.next_pc).exit
+
+        if self.error is not None:
+            raise self.error
+        if self.sentinel is not None:
+            return self.sentinel
+        return interpreter.line_number(self.next_pc)
+
+
+_constructs = {
+    Lexicon.if_condition: _If,
+    Lexicon.foreach: _ForEach,
+    Lexicon.while_: _While,
+    Lexicon.call: _Call,
+    Lexicon.try_catch: _Try,
+}
+"""The constructs for the handlers of the lines which own a block."""
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import copy
 import time
 
+from .ExecutionPlan import ExecutionPlan, LinePlan
 from .Mutations import Mutations
+from .Scheduler import Scheduler
 from .Services import Services
 from .. import Metrics
 from ..Exceptions import (
@@ -56,87 +59,208 @@ class Lexicon:
 
             return Lexicon.line_number_or_none(story.line(line.get("enter")))
         else:
-            output = await Services.execute(story, line)
-            Metrics.container_exec_seconds_total.labels(
-                app_id=story.app.app_id, story_name=story.name, service=service
-            ).observe(time.time() - start)
+            output = await Lexicon._execute_service(story, line)
+            Lexicon._assign_service_output(story, line, output)
+            return Lexicon.line_number_or_none(story.line(line.get("next")))
 
-            if line.get("name") and len(line["name"]) == 1:
-                story.end_line(
-                    line["ln"], output=output, assign={"paths": line["name"]}
-                )
-            else:
-                story.end_line(
-                    line["ln"], output=output, assign=line.get("output")
-                )
+    @staticmethod
+    async def _execute_service(story, line):
+        start = time.time()
+        output = await Services.execute(story, line)
+        Metrics.container_exec_seconds_total.labels(
+            app_id=story.app.app_id,
+            story_name=story.name,
+            service=line[LineConstants.service],
+        ).observe(time.time() - start)
+        return output
 
-            return Lexicon.line_number_or_none(story.line(line.get("next")))
+    @staticmethod
+    def _assign_service_output(story, line, output):
+        if line.get("name") and len(line["name"]) == 1:
+            story.end_line(
+                line["ln"], output=output, assign={"paths": line["name"]}
+            )
+        else:
+            story.end_line(
+                line["ln"], output=output, assign=line.get("output")
+            )
+
+    @staticmethod
+    def _can_run_concurrently(story, run) -> bool:
+        if story.app.app_config.concurrent_services is not True:
+            return False
+
+        # Only external services are known not to share any state, which
+        # internal services (such as file or http) might.
+        for line in run:
+            service = line[LineConstants.service]
+            if story.app.services.get(service) is None or Services.is_internal(
+                service, line.get("command")
+            ):
+                return False
+
+        return True
+
+    @staticmethod
+    async def execute_concurrently(logger, story, run):
+        """
+        Executes a run of independent service calls (see
+        ExecutionPlan#concurrent_runs) concurrently.
+
+        Outputs are assigned in the order of the lines once all the calls
+        have completed. If a call failed, its error is raised as if the
+        lines had been executed one after another; outputs of the lines
+        after it are discarded.
+
+        :return: The line number after the run, or None if there is none.
+        """
+        for line in run:
+            story.start_line(line["ln"])
+
+        results = await asyncio.gather(
+            *[Lexicon._execute_service(story, line) for line in run],
+            return_exceptions=True,
+        )
+
+        for line, result in zip(run, results):
+            with story.new_frame(line["ln"]):
+                if isinstance(result, BaseException):
+                    raise Lexicon._line_error(story, line, result)
+
+                Lexicon._assign_service_output(story, line, result)
+
+        return Lexicon.line_number_or_none(story.line(run[-1].get("next")))
+
+    methods = {
+        "if": "if_condition",
+        "elif": "if_condition",
+        "else": "if_condition",
+        "for": "foreach",
+        "execute": "execute",
+        "set": "set",
+        "expression": "set",
+        "mutation": "set",
+        "call": "call",
+        "function": "function",
+        "when": "when",
+        "return": "ret",
+        "break": "break_",
+        "continue": "continue_",
+        "while": "while_",
+        "try": "try_catch",
+        "throw": "throw",
+    }
+    """
+    Maps the method of a line to the name of its implementation.
+    """
+
+    scoped_methods = ("for", "while")
+    """
+    Methods which are executed in a new context.
+    """
+
+    @classmethod
+    def handler_for(cls, method):
+        name = cls.methods.get(method)
+        if name is None:
+            return None
+
+        return getattr(cls, name)
+
+    @classmethod
+    def compile(cls, tree: dict) -> ExecutionPlan:
+        """
+        Compiles a story tree into an execution plan, binding every line
+        to the handler which implements it.
+        """
+        return ExecutionPlan(tree, cls.handler_for, cls.scoped_methods)
+
+    @classmethod
+    def compile_line(cls, line: dict) -> LinePlan:
+        method = line["method"]
+        handler = cls.handler_for(method)
+        if handler is None:
+            raise NotImplementedError(f"Unknown method to execute: {method}")
+
+        return LinePlan(line, handler, method in cls.scoped_methods)
+
+    @classmethod
+    def plan_for(cls, story) -> ExecutionPlan:
+        """
+        Returns the execution plan for the story. The plan compiled by
+        the app is used, unless the story's tree has been swapped out.
+        """
+        plan = story.execution_plan
+        if not isinstance(plan, ExecutionPlan) or plan.tree is not story.tree:
+            plan = cls.compile(story.tree)
+            story.execution_plan = plan
+
+        return plan
+
+    @staticmethod
+    def scheduler_for(story) -> Scheduler:
+        """
+        Returns the scheduler of the story, creating it on first use.
+        """
+        scheduler = story.scheduler
+        if not isinstance(scheduler, Scheduler):
+            scheduler = Scheduler.for_app_config(story.app.app_config)
+            story.scheduler = scheduler
+
+        return scheduler
 
     @staticmethod
     async def execute_line(logger, story, line_number):
         """
-        Executes a single line by calling the Lexicon for various operations.
+        Executes a single line by calling the handler compiled for it.
 
         To execute a function completely, see Lexicon#call.
 
         :return: Returns the next line number to be executed
         (return value from Lexicon), or None if there is none.
         """
-        line: dict = story.line(line_number)
+        plan = Lexicon.plan_for(story)
+        run = plan.concurrent_runs.get(line_number)
+        if run is not None and Lexicon._can_run_concurrently(story, run):
+            return await Lexicon.execute_concurrently(logger, story, run)
+
+        op: LinePlan = plan.get(line_number)
+        if op is None:
+            line: dict = story.line(line_number)
+        else:
+            line = op.line
+
         story.start_line(line_number)
 
         with story.new_frame(line_number):
             try:
-                method = line["method"]
-                if method == "if" or method == "else" or method == "elif":
-                    return await Lexicon.if_condition(logger, story, line)
-                elif method == "for":
-                    with story.new_context():
-                        return await Lexicon.foreach(logger, story, line)
-                elif method == "execute":
-                    return await Lexicon.execute(logger, story, line)
-                elif (
-                    method == "set"
-                    or method == "expression"
-                    or method == "mutation"
-                ):
-                    return await Lexicon.set(logger, story, line)
-                elif method == "call":
-                    return await Lexicon.call(logger, story, line)
-                elif method == "function":
-                    return await Lexicon.function(logger, story, line)
-                elif method == "when":
-                    return await Lexicon.when(logger, story, line)
-                elif method == "return":
-                    return await Lexicon.ret(logger, story, line)
-                elif method == "break":
-                    return await Lexicon.break_(logger, story, line)
-                elif method == "continue":
-                    return await Lexicon.continue_(logger, story, line)
-                elif method == "while":
+                await Lexicon.scheduler_for(story).step(story, line)
+
+                if op is None:
+                    op = Lexicon.compile_line(line)
+
+                if op.scoped:
                     with story.new_context():
-                        return await Lexicon.while_(logger, story, line)
-                elif method == "try":
-                    return await Lexicon.try_catch(logger, story, line)
-                elif method == "throw":
-                    return await Lexicon.throw(logger, story, line)
-                else:
-                    raise NotImplementedError(
-                        f"Unknown method to execute: {method}"
-                    )
+                        return await op.handler(logger, story, line)
+
+                return await op.handler(logger, story, line)
             except BaseException as e:
-                # Don't wrap StoryscriptError.
-                if isinstance(e, StoryscriptError):
-                    e.story = story  # Always set.
-                    e.line = line  # Always set.
-                    raise e
-
-                raise StoryscriptRuntimeError(
-                    message="Failed to execute line",
-                    story=story,
-                    line=line,
-                    root=e,
-                )
+                raise Lexicon._line_error(story, line, e)
+
+    @staticmethod
+    def _line_error(story, line, e):
+        """
+        Returns the error to raise for an exception raised by a line.
+        """
+        # Don't wrap StoryscriptError.
+        if isinstance(e, StoryscriptError):
+            e.story = story  # Always set.
+            e.line = line  # Always set.
+            return e
+
+        return StoryscriptRuntimeError(
+            message="Failed to execute line", story=story, line=line, root=e
+        )
 
     @staticmethod
     async def execute_block(logger, story, parent_line: dict):
@@ -149,6 +273,26 @@ class Lexicon:
         The result can have special significance, such as the BREAK
         line sentinel.
         """
+        next_line = Lexicon.enter_block(story, parent_line)
+        while next_line is not None and story.line_has_parent(
+            parent_line["ln"], next_line
+        ):
+            result = await Lexicon.execute_line(logger, story, next_line["ln"])
+
+            if LineSentinels.is_sentinel(result):
+                return result
+
+            next_line = story.line(result)
+
+        return None
+
+    @staticmethod
+    def enter_block(story, parent_line: dict):
+        """
+        Prepares the context for the block of parent_line.
+
+        :return: The first line of the block.
+        """
         next_line = story.line(parent_line["enter"])
 
         # If this block represents a streaming service, copy over it's
@@ -171,17 +315,7 @@ class Lexicon:
                     output=event_body.get("data"),
                 )
 
-        while next_line is not None and story.line_has_parent(
-            parent_line["ln"], next_line
-        ):
-            result = await Lexicon.execute_line(logger, story, next_line["ln"])
-
-            if LineSentinels.is_sentinel(result):
-                return result
-
-            next_line = story.line(result)
-
-        return None
+        return next_line
 
     @staticmethod
     async def function(logger, story, line):
@@ -200,32 +334,82 @@ class Lexicon:
         function block to be executed, and will return the output (if any).
         """
         old_contexts = story._contexts
-        function_line = story.function_line_by_name(line.get("function"))
-        context = story.context_for_function_call(line, function_line)
-        story.set_context(context)
+        function_line, borrow = Lexicon.enter_function(story, line)
         return_from_function_call = None
         try:
             result = await Lexicon.execute_block(logger, story, function_line)
-            if LineSentinels.is_sentinel(result):
-                if not isinstance(result, ReturnSentinel):
-                    raise StoryscriptRuntimeError(
-                        f"Uncaught sentinel has" f" escaped! sentinel={result}"
-                    )
-
-                return_from_function_call = result.return_value
-
+            return_from_function_call = Lexicon.function_result(result, borrow)
             return Lexicon.line_number_or_none(story.line(line.get("next")))
         finally:
-            story._contexts = old_contexts
-            if line.get("name") is not None and len(line["name"]) > 0:
-                story.end_line(
-                    line["ln"],
-                    output=return_from_function_call,
-                    assign={"$OBJECT": "path", "paths": line["name"]},
-                )
+            Lexicon.leave_function(
+                story, line, old_contexts, return_from_function_call
+            )
+
+    @staticmethod
+    def enter_function(story, line):
+        """
+        Sets up the context for the function called by line.
+
+        :return: The function line, and whether its arguments are borrowed
+        from the caller.
+        """
+        function_line = story.function_line_by_name(line.get("function"))
+        # Functions which never write into a value in place can safely
+        # share their arguments with the caller.
+        borrow = (
+            function_line["ln"]
+            not in Lexicon.plan_for(story).writing_functions
+        )
+        context = story.context_for_function_call(
+            line, function_line, borrow=borrow
+        )
+        story.set_context(context)
+        return function_line, borrow
+
+    @staticmethod
+    def function_result(result, borrow):
+        """
+        Returns the value returned by a function, given the result of its
+        block.
+        """
+        if not LineSentinels.is_sentinel(result):
+            return None
+
+        if not isinstance(result, ReturnSentinel):
+            raise StoryscriptRuntimeError(
+                f"Uncaught sentinel has" f" escaped! sentinel={result}"
+            )
+
+        if borrow and isinstance(result.return_value, (list, dict)):
+            # The value may be (a part of) a borrowed argument.
+            return copy.deepcopy(result.return_value)
+
+        return result.return_value
+
+    @staticmethod
+    def leave_function(story, line, old_contexts, output):
+        """
+        Restores the caller's context, and assigns the output of the call.
+        """
+        story._contexts = old_contexts
+        if line.get("name") is not None and len(line["name"]) > 0:
+            story.end_line(
+                line["ln"],
+                output=output,
+                assign={"$OBJECT": "path", "paths": line["name"]},
+            )
 
     @staticmethod
     def _does_line_have_parent_method(story, line, parent_method_wanted):
+        try:
+            enclosing = story.block_index().enclosing(
+                line["ln"], parent_method_wanted
+            )
+            return enclosing is not None
+        except KeyError:
+            # The line does not belong to the tree of the story.
+            pass
+
         # Just walk up the stack using 'parent'.
         while True:
             parent_line = line.get("parent")
@@ -241,9 +425,11 @@ class Lexicon:
 
     @staticmethod
     async def break_(logger, story, line):
-        # Ensure that we're in a foreach loop. If we are, return BREAK,
+        # Ensure that we're in a loop. If we are, return BREAK,
         # otherwise raise an exception.
-        if Lexicon._does_line_have_parent_method(story, line, "for"):
+        if Lexicon._does_line_have_parent_method(
+            story, line, "for"
+        ) or Lexicon._does_line_have_parent_method(story, line, "while"):
             return LineSentinels.BREAK
         else:
             # There is no parent, this is an illegal usage of break.
@@ -279,7 +465,7 @@ class Lexicon:
             # Check if args[1] is a mutation.
             if line["args"][1]["$OBJECT"] == "mutation":
                 value = Mutations.mutate(line["args"][1], value, story, line)
-                logger.debug(f"Mutation result: {value}")
+                logger.debug("Mutation result: {}", value)
             else:
                 raise StoryscriptError(
                     message=f"Unsupported argument in set: "
@@ -325,9 +511,28 @@ class Lexicon:
             # would have been executed already. See execution strategy above.
             return Lexicon.line_number_or_none(story.next_block(line))
 
-        # while true here because all if/elif/elif/else is executed here.
+        branch, next_line_number = Lexicon.if_branch(logger, story, line)
+        if branch is None:
+            return next_line_number
+
+        exec_res = await Lexicon.execute_block(logger, story, branch)
+        if LineSentinels.is_sentinel(exec_res):
+            return exec_res
+        return Lexicon.line_number_or_none(story.line(branch.get("next")))
+
+    @staticmethod
+    def if_branch(logger, story, line):
+        """
+        Evaluates the conditions of an if/elif/else construct (steps 1 to 3
+        of the execution strategy in Lexicon#if_condition).
+
+        :return: The line whose block must be executed, and the line number
+        to continue with if there is none.
+        """
+        # while true here because all if/elif/elif/else is evaluated here.
         while True:
-            logger.log("lexicon-if", line, story.build_combined_context())
+            if logger.is_debug_enabled():
+                logger.log("lexicon-if", line, story.build_combined_context())
 
             if line["method"] == "else":
                 result = True
@@ -335,18 +540,13 @@ class Lexicon:
                 result = Lexicon._is_if_condition_true(story, line)
 
             if result:
-                exec_res = await Lexicon.execute_block(logger, story, line)
-                if LineSentinels.is_sentinel(exec_res):
-                    return exec_res
-                return Lexicon.line_number_or_none(
-                    story.line(line.get("next"))
-                )
+                return line, None
             else:
                 # Check for an elif block or an else block
                 # (step 2 of execution strategy).
                 next_line = story.next_block(line)
                 if next_line is None:
-                    return None
+                    return None, None
 
                 # Ensure that the elif/else is in the same parent.
                 if next_line.get("parent") == line.get("parent") and (
@@ -359,13 +559,14 @@ class Lexicon:
                     continue
                 else:
                     # Next block is not a part of the if/elif/else.
-                    return Lexicon.line_number_or_none(next_line)
+                    return None, Lexicon.line_number_or_none(next_line)
 
         # Note: Control can NEVER reach here.
 
     @staticmethod
     def unless_condition(logger, story, line):
-        logger.log("lexicon-unless", line, story.build_combined_context())
+        if logger.is_debug_enabled():
+            logger.log("lexicon-unless", line, story.build_combined_context())
         result = story.resolve(line["args"][0], encode=False)
         if result:
             return line["exit"]
@@ -474,16 +675,18 @@ class Lexicon:
             1 <= len(output) <= 2
         ), f"foreach output must be 1 or 2 values, found {len(output)}"
 
-        for a, b in iterable:
-            if len(output) == 1:
-                story.set_variable(
-                    assign={"paths": output},
-                    output=b if isinstance(data, list) else a,
-                )
-            else:
-                story.set_variable(assign={"paths": [output[0]]}, output=a)
-                story.set_variable(assign={"paths": [output[1]]}, output=b)
+        limit = Lexicon.foreach_concurrency(story, line)
+        if limit > 1:
+            result = await Lexicon._foreach_concurrently(
+                logger, story, line, data, iterable, limit
+            )
+            if LineSentinels.is_sentinel(result):
+                return result
 
+            return Lexicon.line_number_or_none(story.next_block(line))
+
+        for a, b in iterable:
+            Lexicon._set_foreach_output(story, line, data, a, b)
             result = await Lexicon.execute_block(logger, story, line)
 
             if LineSentinels.BREAK == result:
@@ -499,26 +702,127 @@ class Lexicon:
         return Lexicon.line_number_or_none(story.next_block(line))
 
     @staticmethod
-    async def while_(logger, story, line):
-        call_count = 0
-        while story.resolve(line["args"][0]):
-            # note this is only a temporary solution,
-            # and we will address this in the future.
-            if call_count >= 100000:
-                raise StoryscriptRuntimeError(
-                    message="Call count limit reached within while loop. "
-                    "Only 100000 iterations allowed.",
-                    story=story,
-                    line=line,
+    def foreach_concurrency(story, line) -> int:
+        """
+        Returns the number of iterations of a foreach loop which may be
+        executed concurrently.
+        """
+        limit = story.app.app_config.foreach_concurrency
+        if (
+            isinstance(limit, int)
+            and limit > 1
+            and line["ln"] in Lexicon.plan_for(story).parallel_loops
+        ):
+            return limit
+
+        return 1
+
+    @staticmethod
+    def _set_foreach_output(story, line, data, a, b):
+        output = line["output"]
+        if len(output) == 1:
+            story.set_variable(
+                assign={"paths": output},
+                output=b if isinstance(data, list) else a,
+            )
+        else:
+            story.set_variable(assign={"paths": [output[0]]}, output=a)
+            story.set_variable(assign={"paths": [output[1]]}, output=b)
+
+    @staticmethod
+    async def _foreach_concurrently(
+        logger, story, line, data, iterable, limit
+    ):
+        """
+        Executes the iterations of a foreach loop concurrently, at most
+        limit at a time. Every iteration is executed in its own fork of
+        the story (see Story#fork), so variables assigned by an iteration
+        are not seen by any other iteration.
+
+        Iterations are started in order. Once an iteration breaks, returns
+        or fails, no further iterations are started, and the iterations
+        after it which are still running are cancelled. The outcome is the
+        one of the first such iteration, in the order of the iterations.
+
+        :return: The sentinel to bubble up, if any.
+        """
+
+        async def iterate(a, b):
+            fork = story.fork()
+            Lexicon._set_foreach_output(fork, line, data, a, b)
+            return await Lexicon.execute_block(logger, fork, line)
+
+        iterations = enumerate(iterable)
+        running = {}
+        stopped_at = None
+        outcomes = {}
+
+        try:
+            while True:
+                while len(running) < limit and stopped_at is None:
+                    index, values = next(iterations, (None, None))
+                    if index is None:
+                        break
+                    task = asyncio.ensure_future(iterate(*values))
+                    running[task] = index
+
+                if len(running) == 0:
+                    break
+
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
                 )
+                for task in done:
+                    index = running.pop(task)
+                    if task.exception() is not None:
+                        outcome = task.exception()
+                    else:
+                        outcome = task.result()
+                        if outcome == LineSentinels.CONTINUE or (
+                            not LineSentinels.is_sentinel(outcome)
+                        ):
+                            continue
+
+                    outcomes[index] = outcome
+                    if stopped_at is None or index < stopped_at:
+                        stopped_at = index
+
+                if stopped_at is not None:
+                    # These iterations would never have been started.
+                    cancelled = [
+                        task
+                        for task, index in running.items()
+                        if index > stopped_at
+                    ]
+                    for task in cancelled:
+                        task.cancel()
+                        del running[task]
+                    await asyncio.gather(*cancelled, return_exceptions=True)
+        finally:
+            for task in running:
+                task.cancel()
 
-            result = await Lexicon.execute_block(logger, story, line)
+        if stopped_at is None:
+            return None
 
-            if call_count % 10000 == 0:
-                # Let's sleep so we don't take up 100% of the CPU
-                await asyncio.sleep(0.0002)
+        outcome = outcomes[stopped_at]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == LineSentinels.BREAK:
+            return None
+        return outcome
 
-            call_count += 1
+    @staticmethod
+    async def while_(logger, story, line):
+        scheduler = Lexicon.scheduler_for(story)
+        iterations = 0
+        while story.resolve(line["args"][0]):
+            scheduler.iterate(story, line, iterations)
+            iterations += 1
+            # Every iteration is a step, even if its block is empty.
+            await scheduler.step(story, line)
+
+            result = await Lexicon.execute_block(logger, story, line)
 
             if result == LineSentinels.CONTINUE:
                 continue
@@ -15,6 +15,7 @@ class Mutations:
     def mutate(cls, mutation, value, story, line):
         operator = mutation["mutation"]
         handler = None
+        copied = True
         try:
             if isinstance(value, str):
                 handler = getattr(StringMutations, operator)
@@ -22,11 +23,15 @@ class Mutations:
                 handler = getattr(ListMutations, operator)
                 # See https://github.com/storyscript/runtime/issues/324
                 # for the reason behind the deep copy.
-                value = copy.deepcopy(value)
+                copied = operator not in ListMutations.read_only
+                if copied:
+                    value = copy.deepcopy(value)
             elif isinstance(value, dict) or isinstance(value, MutableMapping):
                 # See https://github.com/storyscript/runtime/issues/324
                 # for the reason behind the deep copy.
-                value = copy.deepcopy(value)
+                copied = operator not in MapMutations.read_only
+                if copied:
+                    value = copy.deepcopy(value)
                 handler = getattr(MapMutations, operator)
             elif isinstance(value, int):
                 handler = getattr(IntegerMutations, operator)
@@ -43,10 +48,17 @@ class Mutations:
                 line=line,
             )
         try:
-            return handler(mutation, value, story, line, operator)
+            result = handler(mutation, value, story, line, operator)
         except BaseException as e:
             raise StoryscriptError(
                 message=f"Failed to apply mutation {operator}! err={str(e)}",
                 story=story,
                 line=line,
             )
+
+        if not copied and isinstance(result, (list, dict)):
+            # The result of a read-only mutation may be a part of value
+            # (or of its arguments), which was not copied.
+            result = copy.deepcopy(result)
+
+        return result
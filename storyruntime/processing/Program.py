@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from ..utils.BlockIndex import BlockIndex
+
+_UNRESOLVED = object()
+
+
+class Instruction:
+    """
+    A line of a story, lowered to a position in a Program.
+
+    Jump targets are positions in the program, or None if there is no
+    such line.
+    """
+
+    __slots__ = (
+        "pc",
+        "ln",
+        "line",
+        "op",
+        "end",
+        "next",
+        "enter",
+        "program",
+        "_exit",
+        "_chain",
+    )
+
+    def __init__(self, pc: int, line: dict, op, end: int, program=None):
+        self.pc = pc
+        self.ln = line["ln"]
+        self.line = line
+        self.op = op
+        """The LinePlan of the line, or None if it is never executed."""
+        self.end = end
+        """The position right after the last line of the block."""
+        self.next = None
+        """The line after this one (line["next"])."""
+        self.enter = None
+        """The first line of the block (line["enter"])."""
+        self.program = program
+        self._exit = _UNRESOLVED
+        self._chain = _UNRESOLVED
+
+    @property
+    def exit(self):
+        """
+        The first line after the block (see Story#next_block). Like
+        Story#next_block, it is only looked up once it is needed.
+        """
+        if self._exit is _UNRESOLVED:
+            self._exit = self.program.exit_of(self)
+        return self._exit
+
+    @property
+    def chain(self):
+        """
+        For an if, the if/elif/else lines of the construct, in order.
+        """
+        if self._chain is _UNRESOLVED:
+            self._chain = None
+            if self.line.get("method") == "if":
+                self._chain = self.program.chain_of(self)
+        return self._chain
+
+    def contains(self, pc) -> bool:
+        """
+        :return: True if pc is nested inside the block of this line
+        """
+        return pc is not None and self.pc < pc < self.end
+
+
+class Program:
+    """
+    A story tree lowered to a flat list of instructions.
+
+    Lines are laid out in the order of a depth-first walk (see BlockIndex),
+    so the block of every line is the range of instructions between the
+    line and its end. The targets of every jump (the next line, a block's
+    first line and the line after it) are resolved ahead of time, so that
+    executing a story does not require following the pointers in the tree.
+    The line after a block is resolved the first time it is reached (see
+    Instruction#exit), as Story#next_block does.
+    """
+
+    def __init__(self, tree: dict, index: BlockIndex, lines: dict):
+        self.index = index
+        self.instructions = []
+        self.pcs = {}
+        """Maps the line number of every line to its position."""
+
+        for pc, ln in enumerate(index.order):
+            _, end = index.span(ln)
+            self.instructions.append(
+                Instruction(pc, tree[ln], lines.get(ln), end, self)
+            )
+            self.pcs[ln] = pc
+
+        for instruction in self.instructions:
+            line = instruction.line
+            instruction.next = self.pcs.get(line.get("next"))
+            instruction.enter = self.pcs.get(line.get("enter"))
+
+    def exit_of(self, instruction: Instruction):
+        """
+        :return: The position of the first line after the block of
+                 instruction, or None if there isn't one
+        """
+        exit_line = self.index.next_block(instruction.line)
+        if exit_line is None:
+            return None
+
+        return self.pcs[exit_line["ln"]]
+
+    def chain_of(self, instruction: Instruction) -> tuple:
+        chain = [instruction]
+        parent = instruction.line.get("parent")
+        while (
+            chain[-1].line.get("method") != "else"
+            and chain[-1].exit is not None
+        ):
+            following = self.instructions[chain[-1].exit]
+            if following.line.get("parent") != parent or (
+                following.line.get("method") not in ("elif", "else")
+            ):
+                break
+            chain.append(following)
+
+        return tuple(chain)
+
+    def at(self, pc) -> Instruction:
+        return self.instructions[pc]
+
+    def pc(self, line_number):
+        """
+        :return: The position of line_number, or None for None
+        """
+        if line_number is None:
+            return None
+
+        return self.pcs[line_number]
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import math
+import time
+from collections import deque
+
+from .. import Metrics
+from ..utils.TypeUtils import TypeUtils
+
+DEFAULT_INITIAL_DELAY = 0.1
+DEFAULT_WINDOW = 100
+MIN_SAMPLES = 10
+
+
+class RequestHedge:
+    """
+    Hedges the calls to a command of a service, to cut its tail latency
+    (see Services#request_hedge). Since every request may be sent twice,
+    only the calls of GET commands are hedged.
+
+    If a call doesn't respond within delay seconds, a second, identical
+    request is sent, and the first one to respond successfully wins. The
+    other one is cancelled. The delay is the given percentile of the
+    latencies of the original requests of the last window calls, or
+    initial_delay until enough calls were made.
+    """
+
+    __slots__ = (
+        "app_id",
+        "service",
+        "percentile",
+        "initial_delay",
+        "_latencies",
+    )
+
+    def __init__(
+        self,
+        app_id: str,
+        service: str,
+        percentile: float,
+        initial_delay: float = DEFAULT_INITIAL_DELAY,
+        window: int = DEFAULT_WINDOW,
+    ):
+        assert TypeUtils.is_number(percentile) and 0 < percentile <= 100
+        assert TypeUtils.is_number(initial_delay) and initial_delay >= 0
+        assert isinstance(window, int) and window >= MIN_SAMPLES
+        self.app_id = app_id
+        self.service = service
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self._latencies = deque(maxlen=window)
+
+    @classmethod
+    def from_hint(cls, app_id: str, service: str, hint: dict):
+        """
+        :return: A hedge for the hedge hint of a command (percentile,
+                 initial_delay and window), or None if its calls are not
+                 hedged
+        """
+        if hint.get("percentile") is None:
+            return None
+
+        return cls(
+            app_id,
+            service,
+            hint["percentile"],
+            initial_delay=hint.get("initial_delay", DEFAULT_INITIAL_DELAY),
+            window=hint.get("window", DEFAULT_WINDOW),
+        )
+
+    def delay(self) -> float:
+        """
+        :return: The seconds to wait for a response before hedging
+        """
+        if len(self._latencies) < MIN_SAMPLES:
+            return self.initial_delay
+
+        latencies = sorted(self._latencies)
+        rank = math.ceil(self.percentile / 100 * len(latencies))
+        return latencies[max(rank, 1) - 1]
+
+    async def fetch(self, fetch):
+        """
+        Calls fetch, and calls it again if the first call is slow.
+
+        :param fetch: A function returning an awaitable of the response
+        """
+        labels = {"app_id": self.app_id, "service": self.service}
+        Metrics.service_hedge_calls_total.labels(**labels).inc()
+        start = time.monotonic()
+        original = asyncio.ensure_future(fetch())
+        try:
+            done, _ = await asyncio.wait({original}, timeout=self.delay())
+        except asyncio.CancelledError:
+            original.cancel()
+            raise
+
+        if done:
+            response = original.result()
+            self._latencies.append(time.monotonic() - start)
+            return response
+
+        Metrics.service_hedges_total.labels(**labels).inc()
+        hedge = asyncio.ensure_future(fetch())
+        pending = {original, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+
+                    if task is original or not original.done():
+                        # The delay follows the latency of the original
+                        # requests. If the original request lost, the time
+                        # it has been running for is a lower bound of it,
+                        # which keeps the slow requests in the window.
+                        self._latencies.append(time.monotonic() - start)
+                    if task is hedge:
+                        Metrics.service_hedge_wins_total.labels(**labels).inc()
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Both requests failed, which is reported as if it wasn't hedged.
+        return original.result()
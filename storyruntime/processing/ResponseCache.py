@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from collections import OrderedDict
+
+from .. import Metrics
+from ..utils.TypeUtils import TypeUtils
+
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class ResponseCache:
+    """
+    Caches the responses of an idempotent command of a service, so that
+    calling it again with the same arguments does not call the service
+    (see Services#response_cache).
+
+    Responses are kept for ttl seconds, and only the max_entries most
+    recently used ones are kept. Identical calls which are made while
+    the first one is in flight wait for its response, rather than calling
+    the service themselves. Only successful (2xx) responses are kept.
+    """
+
+    __slots__ = (
+        "app_id",
+        "service",
+        "ttl",
+        "max_entries",
+        "_entries",
+        "_in_flight",
+    )
+
+    def __init__(
+        self,
+        app_id: str,
+        service: str,
+        ttl: float,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        assert TypeUtils.is_number(ttl) and ttl > 0
+        assert isinstance(max_entries, int) and max_entries >= 1
+        self.app_id = app_id
+        self.service = service
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        """The expiry time and the response, by key, least recent first."""
+        self._in_flight = {}
+
+    @classmethod
+    def from_hint(cls, app_id: str, service: str, hint: dict):
+        """
+        :return: A cache for the cache hint of a command (ttl and
+                 max_entries), or None if its responses are not cached
+        """
+        if hint.get("ttl") is None:
+            return None
+
+        return cls(
+            app_id,
+            service,
+            hint["ttl"],
+            max_entries=hint.get("max_entries", DEFAULT_MAX_ENTRIES),
+        )
+
+    async def fetch(self, key, fetch):
+        """
+        Returns the cached response for key, or calls fetch to get it.
+
+        :param key: The resolved arguments of the call (hashable)
+        :param fetch: A function returning an awaitable of the response
+        """
+        labels = {"app_id": self.app_id, "service": self.service}
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, response = entry
+            if time.monotonic() < expires:
+                self._entries.move_to_end(key)
+                Metrics.service_cache_hits_total.labels(**labels).inc()
+                return response
+
+            del self._entries[key]
+            Metrics.service_cache_evictions_total.labels(**labels).inc()
+
+        call = self._in_flight.get(key)
+        if call is None:
+            Metrics.service_cache_misses_total.labels(**labels).inc()
+            call = _Call()
+            # The request doesn't belong to the caller which made it, so
+            # that cancelling that caller doesn't cancel the others.
+            call.task = asyncio.ensure_future(self._fetch(key, fetch, call))
+            self._in_flight[key] = call
+        else:
+            Metrics.service_cache_hits_total.labels(**labels).inc()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller is gone, so nobody needs the response.
+                call.task.cancel()
+                self._forget(key, call)
+
+    async def _fetch(self, key, fetch, call):
+        try:
+            response = await fetch()
+        finally:
+            self._forget(key, call)
+
+        if int(response.code / 100) == 2:
+            self._store(key, response)
+        return response
+
+    def _forget(self, key, call):
+        if self._in_flight.get(key) is call:
+            del self._in_flight[key]
+
+    def _store(self, key, response):
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            Metrics.service_cache_evictions_total.labels(
+                app_id=self.app_id, service=self.service
+            ).inc()
+
+
+class _Call:
+    """
+    A request of a ResponseCache which is in flight, and the number of
+    callers waiting for its response.
+    """
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
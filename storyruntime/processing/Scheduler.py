@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from ..Exceptions import StoryscriptRuntimeError
+from ..utils.TypeUtils import TypeUtils
+
+
+class Scheduler:
+    """
+    Cooperatively schedules the execution of a story on the event loop.
+
+    Every executed line is a step. Once a story has been running for a
+    whole time slice without waiting on anything, it yields to the event
+    loop, so that a CPU heavy story cannot starve every other story
+    running on the same engine.
+
+    A scheduler is shared by the story and all of its forks (see
+    Story#fork), so the limits apply to the story as a whole.
+    """
+
+    __slots__ = (
+        "time_slice",
+        "max_steps",
+        "max_run_time",
+        "max_loop_iterations",
+        "steps",
+        "started",
+        "_slice_end",
+    )
+
+    def __init__(
+        self,
+        time_slice: float,
+        max_steps=None,
+        max_run_time=None,
+        max_loop_iterations=None,
+    ):
+        self.time_slice = time_slice
+        self.max_steps = max_steps
+        self.max_run_time = max_run_time
+        if max_loop_iterations is None:
+            max_loop_iterations = DEFAULT_MAX_LOOP_ITERATIONS
+        self.max_loop_iterations = max_loop_iterations
+        self.steps = 0
+        self.started = time.monotonic()
+        self._slice_end = self.started + time_slice
+
+    @classmethod
+    def for_app_config(cls, app_config):
+        def number(value, default):
+            return value if TypeUtils.is_number(value) else default
+
+        return cls(
+            time_slice=number(app_config.time_slice, DEFAULT_TIME_SLICE),
+            max_steps=number(app_config.max_steps, None),
+            max_run_time=number(app_config.max_run_time, None),
+            max_loop_iterations=number(
+                app_config.max_loop_iterations, DEFAULT_MAX_LOOP_ITERATIONS
+            ),
+        )
+
+    def iterate(self, story, line, iterations: int):
+        """
+        Checks that a while loop, which has run iterations times, may run
+        once more.
+
+        :raises StoryscriptRuntimeError: if the loop has run as many
+        iterations as a loop is allowed.
+        """
+        if iterations >= self.max_loop_iterations:
+            raise StoryscriptRuntimeError(
+                message="Call count limit reached within while loop. "
+                f"Only {self.max_loop_iterations} iterations allowed.",
+                story=story,
+                line=line,
+            )
+
+    async def step(self, story, line):
+        """
+        Accounts for the execution of a line, yielding to the event loop
+        if the current time slice is used up.
+
+        :raises StoryscriptRuntimeError: if the story has exceeded the
+        number of steps or the run time it is allowed.
+        """
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise StoryscriptRuntimeError(
+                message="Step limit reached. "
+                f"Only {self.max_steps} steps allowed.",
+                story=story,
+                line=line,
+            )
+
+        now = time.monotonic()
+        if now < self._slice_end:
+            return
+
+        if (
+            self.max_run_time is not None
+            and now - self.started > self.max_run_time
+        ):
+            raise StoryscriptRuntimeError(
+                message="Run time limit reached. "
+                f"Only {self.max_run_time} seconds allowed.",
+                story=story,
+                line=line,
+            )
+
+        await asyncio.sleep(0)
+        self._slice_end = time.monotonic() + self.time_slice
+
+
+DEFAULT_TIME_SLICE = 0.01
+"""The time in seconds a story may run before it yields to the loop."""
+
+DEFAULT_MAX_LOOP_ITERATIONS = 100000
+"""The number of iterations a while loop may run."""
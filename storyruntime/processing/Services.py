@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import base64
 import json
 import re
 import urllib
@@ -9,13 +8,14 @@ from functools import partial
 from math import inf
 from urllib import parse
 
-from requests.structures import CaseInsensitiveDict
-
 from tornado.gen import coroutine
-from tornado.httpclient import AsyncHTTPClient
 
 import ujson
 
+from .Bindings import ArgumentBinding, BindingPlan
+from .Bulkhead import Bulkhead
+from .RequestHedge import RequestHedge
+from .ResponseCache import ResponseCache
 from ..Containers import Containers
 from ..Exceptions import ArgumentTypeMismatchError, StoryscriptError
 from ..Logger import Logger
@@ -31,69 +31,52 @@ from ..constants.ContextConstants import ContextConstants
 from ..constants.LineConstants import LineConstants
 from ..constants.ServiceConstants import ServiceConstants
 from ..entities.Multipart import FileFormField, FormField
+from ..entities.SpooledBody import SpooledBody
 from ..omg.ServiceOutputValidator import ServiceOutputValidator
 from ..utils import Dict
+from ..utils.HttpClients import HttpClients
 from ..utils.HttpUtils import HttpUtils
+from ..utils.JsonCodec import JsonCodec
+from ..utils.ResponseSpool import ResponseSpool
 from ..utils.StringUtils import StringUtils
-from ..utils.TypeUtils import TypeUtils
+
+MULTIPART_CHUNK_SIZE = 64 * 1024
+"""The largest chunk of a multipart request body written at once."""
 
 
 class HttpDataEncoder(json.JSONEncoder):
     """
     This is utilized to sanitize the data sent back
-    from the http service.
+    from the http service. The encoding itself is done by JsonCodec,
+    this is kept for json.dumps(..., cls=HttpDataEncoder).
     """
 
-    def default(self, obj):
-        """
-        This converts anything that the default encoder
-        cannot handle. More importantly namedtuples, and
-        other objects utilized by services like FormField.
-
-        :param obj: the object we wish to convert
-        :return: returns the converted object
-        """
-        if isinstance(obj, bytes):
-            # we always want to convert bytes
-            # to base64 within json
-            return base64.b64encode(obj).decode("utf-8")
-        elif isinstance(obj, CaseInsensitiveDict):
-            # convert this to a regular dict
-            return dict(obj.items())
-        elif isinstance(obj, re.Pattern):
-            return obj.pattern
-
-        return json.JSONEncoder.default(self, obj)
-
     def encode(self, o):
         """
-        This makes it possible to override the default type conversion
-        for namedtuples.
-
         :param o: the object we wish to encode
         :return: returns an encoded json str
         """
-        return json.JSONEncoder.encode(self, self._convert_types(o))
+        return JsonCodec.dumps(o, safe=True)
 
-    def _convert_types(self, o):
-        """
-        This is utilized by encode() to effectively ensure that any
-        namedtuples or other objects are converted to a dictionary.
-        Otherwise the will not get encoded as desired.
 
-        :param o: the dictionary object we wish to convert
-        :return: returns a dictionary with all types converted
-        """
-        if isinstance(o, dict):
-            for k, v in o.items():
-                # convert the type to a safe type first,
-                # and then safely convert it to a dictionary
-                s = TypeUtils.safe_type(v)
-                if TypeUtils.isnamedtuple(s):
-                    o[k] = s._asdict()
-                else:
-                    o[k] = self._convert_types(s)
-        return o
+class ServiceRoute:
+    """
+    How an execute line is dispatched: the chain of the line (see
+    Services#resolve_chain), and whether it is a command of an internal
+    service. For other services, the config of the command, the URL it
+    is invoked on, and the binding plan of its arguments are added the
+    first time they are needed.
+    """
+
+    __slots__ = ("chain", "internal", "command_conf", "url", "bindings")
+
+    def __init__(self, chain: deque, internal: bool):
+        self.chain = chain
+        self.internal = internal
+        self.command_conf = None
+        self.url = None
+        """The URL of an HTTP command (see Services#url_template)."""
+        self.bindings = None
 
 
 class Services:
@@ -137,12 +120,44 @@ class Services:
         return chain[len(chain) - 1]
 
     @classmethod
-    async def execute(cls, story, line):
+    def route(cls, story, line) -> ServiceRoute:
+        """
+        Returns the route of an execute line. The route of a line never
+        changes for a release, so routes are resolved once, and kept by
+        the app (see App#service_routes).
+        """
+        route = cls.cached_route(story, line)
+        if route is not None:
+            return route
+
         chain = cls.resolve_chain(story, line)
         assert isinstance(chain, deque)
         assert isinstance(chain[0], Service)
+        route = ServiceRoute(
+            chain, cls.is_internal(chain[0].name, cls.last(chain).name)
+        )
+
+        routes = getattr(story.app, "service_routes", None)
+        if isinstance(routes, dict) and line.get("ln") is not None:
+            routes[(story.name, line["ln"])] = route
 
-        if cls.is_internal(chain[0].name, cls.last(chain).name):
+        return route
+
+    @classmethod
+    def cached_route(cls, story, line):
+        """
+        Returns the route of an execute line if it has been resolved
+        already, or None.
+        """
+        routes = getattr(story.app, "service_routes", None)
+        if not isinstance(routes, dict):
+            return None
+
+        return routes.get((story.name, line.get("ln")))
+
+    @classmethod
+    async def execute(cls, story, line):
+        if cls.route(story, line).internal:
             return await cls.execute_internal(story, line)
         else:
             return await cls.execute_external(story, line)
@@ -181,9 +196,156 @@ class Services:
         is application/json, this method will parse the response
         and return a dict.
         """
+        route = cls.route(story, line)
+        chain = route.chain
+        if route.command_conf is None:
+            route.command_conf = cls.get_command_conf(story, chain)
+        command_conf = route.command_conf
+        bulkhead = cls.bulkhead(story, chain[0].name)
+        if bulkhead is None:
+            return await cls.dispatch_external(
+                story, line, chain, command_conf
+            )
+
+        async with bulkhead:
+            return await cls.dispatch_external(
+                story, line, chain, command_conf
+            )
+
+    @classmethod
+    def bulkhead(cls, story, service: str):
+        """
+        Returns the bulkhead limiting the concurrent calls of the app to a
+        service, or None if they aren't limited. The limits are taken from
+        runtime.service_limits of asyncy.yaml, and otherwise from the
+        "limits" of the OMG of the service.
+        """
+        bulkheads = getattr(story.app, "bulkheads", None)
+        if not isinstance(bulkheads, dict):
+            return None
+
+        if service in bulkheads:
+            return bulkheads[service]
+
+        limits = {}
+        omg_limits = Dict.find(
+            story.app.services, f"{service}.{ServiceConstants.config}.limits"
+        )
+        if isinstance(omg_limits, dict):
+            limits.update(omg_limits)
+
+        app_limits = story.app.app_config.service_limits.get(service)
+        if app_limits is not None:
+            limits.update(app_limits)
+
+        bulkhead = Bulkhead.from_limits(story.app.app_id, service, limits)
+        bulkheads[service] = bulkhead
+        return bulkhead
+
+    @classmethod
+    def response_cache(cls, story, chain, command_conf):
+        """
+        Returns the response cache of an HTTP command, or None if its
+        responses are not cached. Caching is opted into with a cache hint
+        in runtime.service_cache of asyncy.yaml, or with the "cache" of
+        the command in the OMG of its service.
+        """
+        caches = getattr(story.app, "response_caches", None)
+        if not isinstance(caches, dict):
+            return None
+
+        service = chain[0].name
+        command = cls.last(chain).name
+        if (service, command) in caches:
+            return caches[(service, command)]
+
+        hint = {}
+        if isinstance(command_conf.get("cache"), dict):
+            hint.update(command_conf["cache"])
+
+        app_hint = story.app.app_config.service_cache.get(service, {})
+        if app_hint.get(command) is not None:
+            hint.update(app_hint[command])
+
+        cache = ResponseCache.from_hint(story.app.app_id, service, hint)
+        caches[(service, command)] = cache
+        return cache
+
+    @classmethod
+    def request_hedge(cls, story, chain, command_conf):
+        """
+        Returns the hedge of the calls of a GET command, or None if its
+        calls are not hedged. Hedging is opted into with a hedge hint in
+        runtime.service_hedging of asyncy.yaml, or with the "hedge" of the
+        command in the OMG of its service.
+        """
+        hedges = getattr(story.app, "request_hedges", None)
+        if not isinstance(hedges, dict):
+            return None
+
+        service = chain[0].name
+        command = cls.last(chain).name
+        if (service, command) in hedges:
+            return hedges[(service, command)]
+
+        hint = {}
+        if isinstance(command_conf.get("hedge"), dict):
+            hint.update(command_conf["hedge"])
+
+        app_hint = story.app.app_config.service_hedging.get(service, {})
+        if app_hint.get(command) is not None:
+            hint.update(app_hint[command])
+
+        hedge = RequestHedge.from_hint(story.app.app_id, service, hint)
+        hedges[(service, command)] = hedge
+        return hedge
+
+    @classmethod
+    def output_validator(cls, story, chain, command_conf):
+        """
+        Returns the compiled validator of the output of a command (see
+        ServiceOutputValidator#compile), or None if its output isn't
+        declared. The responses of services listed in
+        runtime.output_sampling of asyncy.yaml are only validated at the
+        rate set there.
+        """
+        validators = getattr(story.app, "output_validators", None)
+        key = tuple(entry.name for entry in chain)
+        if isinstance(validators, dict) and key in validators:
+            return validators[key]
+
+        validator = None
+        expected_output = command_conf.get("output")
+        if expected_output is not None:
+            validator = ServiceOutputValidator.compile(expected_output)
+            rate = story.app.app_config.output_sampling.get(chain[0].name)
+            if isinstance(rate, (int, float)):
+                validator = ServiceOutputValidator.sampled(validator, rate)
+
+        if isinstance(validators, dict):
+            validators[key] = validator
+        return validator
+
+    @classmethod
+    def prepare(cls, story, route: ServiceRoute):
+        """
+        Resolves the config of the command of an external route, and
+        compiles the validator of its output, so that this isn't done by
+        the first call (see App#start_services).
+        """
+        if route.internal or route.chain[0].name not in story.app.services:
+            return
+
+        if route.command_conf is None:
+            route.command_conf = cls.get_command_conf(story, route.chain)
+        cls.output_validator(story, route.chain, route.command_conf)
+
+    @classmethod
+    async def dispatch_external(cls, story, line, chain, command_conf):
+        """
+        Executes an external service, once its bulkhead let the call in.
+        """
         service = line[LineConstants.service]
-        chain = cls.resolve_chain(story, line)
-        command_conf = cls.get_command_conf(story, chain)
         if command_conf.get("format") is not None:
             return await Containers.exec(
                 story.logger, story, line, service, line["command"]
@@ -258,7 +420,7 @@ class Services:
             parent_line = get_owner(parent_line)
             assert parent_line is not None
 
-        story.logger.debug(f"Chain resolved - {chain}")
+        story.logger.debug("Chain resolved - {}", chain)
         return chain
 
     @classmethod
@@ -335,7 +497,7 @@ class Services:
         # Set the header for the first time to something we know.
         req.set_header("Content-Type", "application/stream+json")
 
-        req.write(json.dumps(body, cls=HttpDataEncoder) + "\n")
+        req.write(JsonCodec.dumps(body, safe=True) + "\n")
 
         # HTTP hack
         if chain[0].name == "http" and command.name == "finish":
@@ -346,7 +508,7 @@ class Services:
     def _fill_http_req_body(cls, http_res_kwargs, content_type, body):
         headers = http_res_kwargs.setdefault("headers", {})
         if content_type.startswith("application/json"):
-            http_res_kwargs["body"] = json.dumps(body)
+            http_res_kwargs["body"] = JsonCodec.dumps(body)
             headers["Content-Type"] = "application/json; charset=utf-8"
         elif content_type.startswith("multipart/form-data"):
             boundary = uuid.uuid4().hex
@@ -362,6 +524,11 @@ class Services:
         """
         Writes files as well as regular form fields.
 
+        Bodies are written in chunks of at most MULTIPART_CHUNK_SIZE
+        bytes, and files which were spooled to disk (see SpooledBody) are
+        read as they are written, so that the memory used by an upload
+        does not depend on the size of its files.
+
         Inspired directly from here:
         https://git.io/fjorx
         """
@@ -383,12 +550,19 @@ class Services:
 
             yield write(buf.encode())
 
-            if isinstance(field.body, bytes):
-                yield write(field.body)
-            elif not isinstance(field.body, str):
-                yield write(f"{field.body}".encode())
+            if isinstance(field.body, SpooledBody):
+                for chunk in field.body.chunks(MULTIPART_CHUNK_SIZE):
+                    yield write(chunk)
             else:
-                yield write(field.body.encode())
+                if isinstance(field.body, bytes):
+                    data = field.body
+                elif not isinstance(field.body, str):
+                    data = f"{field.body}".encode()
+                else:
+                    data = field.body.encode()
+
+                for i in range(0, len(data), MULTIPART_CHUNK_SIZE):
+                    yield write(data[i : i + MULTIPART_CHUNK_SIZE])
 
             yield write(b"\r\n")
 
@@ -455,6 +629,24 @@ class Services:
 
         raise ArgumentTypeMismatchError(name, t, story=story, line=line)
 
+    @classmethod
+    def binding_plan(cls, story, line, command_conf) -> BindingPlan:
+        """
+        Returns the binding plan for the arguments of command_conf. It is
+        kept with the route of the line, if there is one.
+        """
+        route = cls.cached_route(story, line)
+        if route is not None:
+            plan = route.bindings
+            if plan is not None and plan.command_conf is command_conf:
+                return plan
+
+        plan = BindingPlan(command_conf)
+        if route is not None:
+            route.bindings = plan
+
+        return plan
+
     @classmethod
     def smart_insert(
         cls, story, line, arg_conf: dict, key: str, value, m: dict
@@ -476,17 +668,31 @@ class Services:
         t = arg_conf.get("type", "any")
         if t == "string":
             if isinstance(value, dict) or isinstance(value, list):
-                value = json.dumps(value)
+                value = JsonCodec.dumps(value)
 
         cls.raise_for_type_mismatch(story, line, key, value, arg_conf)
 
         m[key] = value
 
+    @classmethod
+    def bind(cls, story, line, binding: ArgumentBinding, value, m: dict):
+        """
+        Sets an argument in the map m, as smart_insert does, using the
+        compiled binding of the argument.
+        """
+        if binding.to_json and isinstance(value, (dict, list)):
+            value = JsonCodec.dumps(value)
+
+        mismatch = binding.validate(value)
+        if mismatch is not None:
+            raise ArgumentTypeMismatchError(*mismatch, story=story, line=line)
+
+        m[binding.name] = value
+
     @classmethod
     async def execute_http(cls, story, line, chain, command_conf):
         assert isinstance(chain, deque)
         assert isinstance(chain[0], Service)
-        args = command_conf.get("arguments", {})
         body = {}
         query_params = {}
         path_params = {}
@@ -495,20 +701,16 @@ class Services:
         form_fields_count = 0
         request_body_fields_count = 0
 
-        for arg in args:
+        for binding in cls.binding_plan(story, line, command_conf).bindings:
+            arg = binding.name
             value = story.argument_by_name(line, arg)
-            arg_conf = args[arg]
-            location = arg_conf.get("in", "requestBody")
+            location = binding.location
             if location == "query":
-                cls.smart_insert(
-                    story, line, arg_conf, arg, value, query_params
-                )
+                cls.bind(story, line, binding, value, query_params)
             elif location == "path":
-                cls.smart_insert(
-                    story, line, arg_conf, arg, value, path_params
-                )
+                cls.bind(story, line, binding, value, path_params)
             elif location == "requestBody":
-                cls.smart_insert(story, line, arg_conf, arg, value, body)
+                cls.bind(story, line, binding, value, body)
                 request_body_fields_count += 1
             elif location == "formBody":
                 # Created in StoryEventHandler.
@@ -520,9 +722,7 @@ class Services:
                     body[arg] = FormField(arg, value)
                 form_fields_count += 1
             elif location == "header":
-                cls.smart_insert(
-                    story, line, arg_conf, arg, value, header_params
-                )
+                cls.bind(story, line, binding, value, header_params)
             else:
                 raise StoryscriptError(
                     f"Invalid location for"
@@ -552,6 +752,9 @@ class Services:
             "headers": header_params,
             "request_timeout": 60000 * 2,
             "retry_timeout": 1,
+            # A service which keeps failing is given time to recover,
+            # rather than being retried by every call.
+            "circuit_breaker": True,
         }
 
         content_type = command_conf["http"].get(
@@ -568,23 +771,62 @@ class Services:
                 line=line,
             )
 
-        url = await cls._get_url_for_http_call(
-            story, line, chain, command_conf, path_params, query_params
+        url = HttpUtils.add_params_to_url(
+            cls.url_template(story, line, chain, command_conf).format(
+                **path_params
+            ),
+            query_params,
         )
 
         story.logger.debug(f"Invoking service on {url} with payload {kwargs}")
 
-        client = AsyncHTTPClient()
-        response = await HttpUtils.fetch_with_retry(
-            3, story.logger, url, client, kwargs
+        if command_conf["http"].get("url") is not None:
+            client = HttpClients.get(HttpClients.INTERNET)
+        else:
+            client = HttpClients.get(HttpClients.SERVICES)
+        fetch = partial(
+            HttpUtils.fetch_with_retry, 3, story.logger, url, client, kwargs
         )
+        # Only GET requests are safe to answer from a cache, or to send
+        # twice.
+        cache = None
+        hedge = None
+        if method.lower() == "get":
+            cache = cls.response_cache(story, chain, command_conf)
+            hedge = cls.request_hedge(story, chain, command_conf)
+
+        if hedge is not None:
+            # fetch_with_retry consumes some of its kwargs, so each of the
+            # requests of a hedged call gets its own.
+            fetch = partial(
+                hedge.fetch,
+                lambda: HttpUtils.fetch_with_retry(
+                    3, story.logger, url, client, dict(kwargs)
+                ),
+            )
+
+        # Cached and hedged responses are kept in memory anyway, so only
+        # the others are streamed.
+        spool = None
+        if cache is None:
+            if hedge is None:
+                spool = cls.response_spool(story)
+            if spool is not None:
+                kwargs.update(spool.callbacks())
+            response = await cls._fetch_spooled(fetch, spool)
+        else:
+            key = (url, json.dumps(header_params, sort_keys=True, default=str))
+            response = await cache.fetch(key, fetch)
 
         story.logger.debug(f"HTTP response code is {response.code}")
         if int(response.code / 100) == 2:
             content_type = response.headers.get("Content-Type")
+            raw_output = response.body
+            if spool is not None:
+                raw_output = spool.body(content_type)
             if content_type and "application/json" in content_type:
                 try:
-                    body = ujson.loads(response.body)
+                    body = cls._load_json(raw_output)
                 except TypeError:
                     raise StoryscriptError(
                         message=f"Failed to parse service output as JSON!"
@@ -593,18 +835,20 @@ class Services:
                         line=line,
                     )
 
-                expected_service_output = command_conf.get("output")
-                if expected_service_output is not None:
-                    ServiceOutputValidator.raise_if_invalid(
-                        expected_service_output, body, chain
-                    )
+                validator = cls.output_validator(story, chain, command_conf)
+                if validator is not None:
+                    validator(body, chain)
                 return body
             else:
                 return cls.parse_output(
-                    command_conf, response.body, story, line, content_type
+                    command_conf, raw_output, story, line, content_type
                 )
         else:
-            response_body = HttpUtils.read_response_body_quietly(response)
+            if spool is None:
+                response_body = HttpUtils.read_response_body_quietly(response)
+            else:
+                response_body = spool.preview()
+                spool.discard()
             raise StoryscriptError(
                 message=f"Failed to invoke service! "
                 f"Status code: {response.code}; "
@@ -614,26 +858,53 @@ class Services:
             )
 
     @classmethod
-    async def _get_url_for_http_call(
-        cls, story, line, chain, command_conf, path_params, query_params
-    ):
-        external_url = command_conf["http"].get("url")
-        if external_url is not None:
-            return HttpUtils.add_params_to_url(
-                external_url.format(**path_params), query_params
-            )
-        else:
+    def response_spool(cls, story):
+        """
+        Returns a spool to stream a response into, or None if responses
+        are kept in memory (see AppConfig#response_memory_limit).
+        """
+        limit = story.app.app_config.response_memory_limit
+        if not isinstance(limit, int):
+            return None
+
+        return ResponseSpool(story.app, limit)
+
+    @staticmethod
+    async def _fetch_spooled(fetch, spool):
+        try:
+            return await fetch()
+        except BaseException:
+            if spool is not None:
+                spool.discard()
+            raise
+
+    @staticmethod
+    def _load_json(raw_output):
+        if isinstance(raw_output, SpooledBody):
+            with raw_output.open() as f:
+                return ujson.load(f)
+        return ujson.loads(raw_output)
+
+    @classmethod
+    def url_template(cls, story, line, chain, command_conf) -> str:
+        """
+        Returns the URL of an HTTP command, with placeholders for its path
+        params. It is kept with the route of the line, if there is one.
+        """
+        route = cls.cached_route(story, line)
+        if route is not None and route.url is not None:
+            return route.url
+
+        url = command_conf["http"].get("url")
+        if url is None:
             hostname = Containers.get_hostname(story, line, chain[0].name)
             port = command_conf["http"].get("port", 5000)
+            url = f"http://{hostname}:{port}{command_conf['http']['path']}"
 
-            path = HttpUtils.add_params_to_url(
-                command_conf["http"]["path"].format(**path_params),
-                query_params,
-            )
+        if route is not None:
+            route.url = url
 
-            url = f"http://{hostname}:{port}{path}"
-
-            return url
+        return url
 
     @classmethod
     def parse_output(
@@ -670,14 +941,15 @@ class Services:
 
     @classmethod
     def _convert_bytes_to_string(cls, raw):
+        if isinstance(raw, SpooledBody):
+            raw = raw.read()
         if isinstance(raw, bytes):
             return raw.decode()
         return raw
 
     @classmethod
     def _get_special_container(cls, story, line):
-        chain = cls.resolve_chain(story, line)
-        assert isinstance(chain[0], Service)
+        chain = cls.route(story, line).chain
 
         if cls.is_hosted_externally(story.app, chain[0].name):
             # Externally hosted service, such as an OpenAPI backed
@@ -779,12 +1051,12 @@ class Services:
         # so we must set this to a really high value.
         kwargs = {
             "method": "POST",
-            "body": json.dumps(body, cls=HttpDataEncoder),
+            "body": JsonCodec.dumps(body, safe=True),
             "headers": {"Content-Type": "application/json; charset=utf-8"},
             "request_timeout": 120,
         }
 
-        client = AsyncHTTPClient()
+        client = HttpClients.get(HttpClients.SYNAPSE)
         story.logger.debug(
             f"Subscribing to {service} " f"from {s.command} via Synapse..."
         )
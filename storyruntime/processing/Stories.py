@@ -6,6 +6,7 @@ from ..Exceptions import StoryscriptRuntimeError
 from ..Story import Story
 from ..constants.LineSentinels import LineSentinels
 from ..processing import Lexicon
+from ..processing.Interpreter import Interpreter
 
 
 class Stories:
@@ -20,11 +21,25 @@ class Stories:
         """
         logger.log("story-save", story.name, story.app_id)
 
+    @staticmethod
+    def interpreter(story):
+        """
+        Returns the implementation which executes the lines of the story
+        (see AppConfig#interpreter).
+        """
+        if story.app.app_config.interpreter == "stack":
+            return Interpreter
+
+        return Lexicon
+
     @staticmethod
     async def execute(logger, story):
         """
         Executes each line in the story
         """
+        if Stories.interpreter(story) is Interpreter:
+            return await Interpreter.execute(logger, story)
+
         line_number = story.first_line()
         while line_number:
             result = await Lexicon.execute_line(logger, story, line_number)
@@ -63,7 +78,7 @@ class Stories:
                 raise StoryscriptRuntimeError("No longer supported")
             elif block:
                 with story.new_frame(block):
-                    await Lexicon.execute_block(
+                    await cls.interpreter(story).execute_block(
                         logger, story, story.line(block)
                     )
             else:
@@ -5,6 +5,7 @@ import shutil
 
 from .Decorators import Decorators
 from ...Exceptions import StoryscriptError
+from ...entities.SpooledBody import SpooledBody
 
 
 def safe_path(story, path):
@@ -57,6 +58,11 @@ async def file_write(story, line, resolved_args):
 
     try:
         content = resolved_args["content"]
+        if isinstance(content, SpooledBody):
+            # Copied without being loaded into memory.
+            content.copy_to(path)
+            return
+
         if resolved_args.get("binary", False) and not isinstance(
             content, bytes
         ):
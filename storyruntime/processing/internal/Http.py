@@ -4,11 +4,12 @@ import json
 
 import certifi
 
-from tornado.httpclient import AsyncHTTPClient
-
 from .Decorators import Decorators
 from ...Exceptions import StoryscriptError
+from ...entities.SpooledBody import SpooledBody
+from ...utils.HttpClients import HttpClients
 from ...utils.HttpUtils import HttpUtils
+from ...utils.ResponseSpool import ResponseSpool
 
 
 @Decorators.create_service(
@@ -24,7 +25,7 @@ from ...utils.HttpUtils import HttpUtils
 )
 async def http_post(story, line, resolved_args):
     method = resolved_args.get("method", "get") or "get"
-    http_client = AsyncHTTPClient()
+    http_client = HttpClients.get(HttpClients.INTERNET)
     kwargs = {"method": method.upper(), "ca_certs": certifi.where()}
 
     headers = resolved_args.get("headers") or {}
@@ -38,9 +39,24 @@ async def http_post(story, line, resolved_args):
         if isinstance(kwargs["body"], dict):
             kwargs["body"] = json.dumps(kwargs["body"])
 
-    response = await HttpUtils.fetch_with_retry(
-        3, story.logger, resolved_args["url"], http_client, kwargs
-    )
+    spool = None
+    memory_limit = story.app.app_config.response_memory_limit
+    if isinstance(memory_limit, int):
+        spool = ResponseSpool(story.app, memory_limit)
+        kwargs.update(spool.callbacks())
+
+    try:
+        response = await HttpUtils.fetch_with_retry(
+            3, story.logger, resolved_args["url"], http_client, kwargs
+        )
+    except BaseException:
+        if spool is not None:
+            spool.discard()
+        raise
+
+    body = response.body
+    if spool is not None:
+        body = spool.body(response.headers.get("Content-Type"))
 
     charset = "utf-8"
 
@@ -54,8 +70,11 @@ async def http_post(story, line, resolved_args):
     if int(response.code / 100) != 2:
         # Attempt to read the response body.
         response_body = None
+        if isinstance(body, SpooledBody):
+            with body.open() as f:
+                body = f.read(1024)
         try:
-            response_body = response.body.decode(charset)
+            response_body = body.decode(charset)
         except UnicodeDecodeError:
             pass
 
@@ -68,15 +87,25 @@ async def http_post(story, line, resolved_args):
 
     if "application/json" in response.headers.get("Content-Type"):
         try:
-            return json.loads(response.body.decode(charset))
+            if isinstance(body, SpooledBody):
+                with body.open("r", encoding=charset) as f:
+                    return json.load(f)
+            return json.loads(body.decode(charset))
         except json.decoder.JSONDecodeError:
+            text = body
+            if not isinstance(body, SpooledBody):
+                text = body.decode(charset)
             story.logger.warn(
                 f"Failed to parse response as JSON, "
                 f"although application/json was specified! "
-                f"response={response.body.decode(charset)}"
+                f"response={text}"
             )
 
-    return response.body.decode(charset)
+    if isinstance(body, SpooledBody):
+        # Too large to be decoded, so it is left to whoever needs it.
+        return body
+
+    return body.decode(charset)
 
 
 def init():
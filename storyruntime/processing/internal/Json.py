@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
-import json
-
 from .Decorators import Decorators
+from ...utils.JsonCodec import JsonCodec
 
 
 @Decorators.create_service(
@@ -11,7 +10,7 @@ from .Decorators import Decorators
     output_type="string",
 )
 async def stringify(story, line, resolved_args):
-    return json.dumps(resolved_args["content"])
+    return JsonCodec.dumps(resolved_args["content"])
 
 
 @Decorators.create_service(
@@ -21,7 +20,7 @@ async def stringify(story, line, resolved_args):
     output_type="any",
 )
 async def parse(story, line, resolved_args):
-    return json.loads(resolved_args["content"])
+    return JsonCodec.loads(resolved_args["content"])
 
 
 def init():
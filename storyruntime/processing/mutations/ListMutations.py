@@ -5,6 +5,15 @@ from storyruntime.utils.TypeResolver import TypeResolver
 
 
 class ListMutations:
+    read_only = frozenset(
+        ("index", "length", "random", "min", "max", "sum", "contains", "join")
+    )
+    """
+    Mutations which never modify the list, and thus do not need a copy
+    of it. A list or map they return is copied instead (see
+    Mutations#mutate).
+    """
+
     @classmethod
     def index(cls, mutation, value, story, line, operator):
         item = story.argument_by_name(mutation, "of")
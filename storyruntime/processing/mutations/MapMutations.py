@@ -2,6 +2,14 @@
 
 
 class MapMutations:
+    read_only = frozenset(
+        ("size", "length", "keys", "values", "flatten", "get", "contains")
+    )
+    """
+    Mutations which never modify the map, and thus do not need a copy
+    of it. A list or map they return is copied instead (see
+    Mutations#mutate).
+    """
 
     # DEPRECATED: removed in SS 0.16.0
     @classmethod
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+
+class ArgumentIndex:
+    """
+    An index over the named arguments of every line of a story tree, so
+    that looking up an argument by its name does not require scanning the
+    arguments of the line (see Story#argument_by_name).
+    """
+
+    def __init__(self, tree: dict):
+        self.tree = tree
+        self._lines = {}
+        for ln, line in tree.items():
+            arguments = self._index(line)
+            if arguments is not None:
+                self._lines[ln] = arguments
+
+    @staticmethod
+    def _index(line: dict):
+        args = line.get("args", line.get("arguments", line.get("arg")))
+        if not isinstance(args, list):
+            return None
+
+        arguments = {}
+        for arg in args:
+            if not isinstance(arg, dict) or "$OBJECT" not in arg:
+                # Left to Story#argument_by_name, which fails on these.
+                return None
+
+            if arg["$OBJECT"] == "argument" or arg["$OBJECT"] == "arg":
+                if "name" not in arg:
+                    return None
+                # The first argument with a given name wins.
+                arguments.setdefault(arg["name"], arg)
+
+        return arguments
+
+    def find(self, line: dict):
+        """
+        :return: The named arguments of line, by their name, or None if
+                 line is not a line of the tree, or if its arguments are
+                 malformed
+        """
+        ln = line.get("ln")
+        if ln is None or self.tree.get(ln) is not line:
+            return None
+
+        return self._lines.get(ln)
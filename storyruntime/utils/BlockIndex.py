@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+
+class BlockIndex:
+    """
+    An index over the block structure of a story tree, which answers
+    ancestry and block exit queries in constant time.
+
+    Lines are numbered by a depth-first walk of the parent/child forest.
+    A line is a descendant of another line if its number falls within the
+    interval of numbers assigned to the other line's block.
+    """
+
+    ENCLOSING_METHODS = ("for", "while", "function", "when")
+    """The blocks that break, continue and return look for."""
+
+    def __init__(self, tree: dict):
+        self.tree = tree
+        self.order = []
+        """The line numbers of the tree, in the order of the walk."""
+        self.depth = {}
+        self._first = {}
+        self._last = {}
+        self._exits = {}
+        self._enclosing = {}
+
+        children = {}
+        roots = []
+        for ln, line in tree.items():
+            parent = line.get("parent")
+            if parent is None or parent not in tree:
+                roots.append(ln)
+            else:
+                children.setdefault(parent, []).append(ln)
+
+        counter = 0
+        stack = [(ln, 0, False, {}) for ln in reversed(roots)]
+        while stack:
+            ln, depth, visited, enclosing = stack.pop()
+            if visited:
+                self._last[ln] = counter
+                continue
+
+            self._first[ln] = counter
+            self.order.append(ln)
+            self.depth[ln] = depth
+            self._enclosing[ln] = enclosing
+            counter += 1
+
+            method = tree[ln].get("method")
+            if method in self.ENCLOSING_METHODS:
+                enclosing = {**enclosing, method: ln}
+
+            stack.append((ln, depth, True, None))
+            for child in reversed(children.get(ln, ())):
+                stack.append((child, depth + 1, False, enclosing))
+
+    def span(self, line_number):
+        """
+        :return: The position of line_number in the walk, and the position
+                 right after the last line nested inside its block
+        """
+        return self._first[line_number], self._last[line_number]
+
+    def is_ancestor(self, parent_line_number, line_number) -> bool:
+        """
+        :return: True if line_number is nested inside the block of
+                 parent_line_number (directly or indirectly)
+        """
+        first = self._first.get(parent_line_number)
+        number = self._first.get(line_number)
+        if first is None or number is None:
+            return False
+
+        return first < number < self._last[parent_line_number]
+
+    def enclosing(self, line_number, method):
+        """
+        :param method: One of ENCLOSING_METHODS
+        :return: The line number of the innermost block with the given
+                 method that line_number is nested inside, or None if
+                 there isn't one
+        """
+        return self._enclosing[line_number].get(method)
+
+    def next_block(self, parent_line: dict):
+        """
+        Returns the first line after the block of parent_line, or None if
+        there isn't one. Results are computed once, and shared by every
+        story using this index.
+        """
+        ln = parent_line["ln"]
+        try:
+            return self._exits[ln]
+        except KeyError:
+            exit_line = self._find_next_block(parent_line)
+            self._exits[ln] = exit_line
+            return exit_line
+
+    def _find_next_block(self, parent_line: dict):
+        parent_ln = parent_line["ln"]
+        next_line = parent_line
+
+        while next_line.get("next") is not None:
+            next_line = self.tree[next_line["next"]]
+
+            # See if the next line is a block. If it is, skip through it.
+            if (
+                next_line.get("enter") is not None
+                and next_line.get("parent") == parent_ln
+            ):
+                next_line = self.next_block(next_line)
+
+                if next_line is None:
+                    return None
+
+            if not self._has_parent(parent_ln, next_line):
+                break
+
+        # We might have skipped through all the lines in this story,
+        # and ended up on the last line.
+        # If this last line belongs to the same parent, then return None.
+        if next_line.get("parent") is not None and self._has_parent(
+            parent_ln, next_line
+        ):
+            return None
+
+        # If the next_line == parent_line, then there weren't any more lines
+        # after the parent.
+        if next_line["ln"] == parent_ln:
+            return None
+
+        return next_line
+
+    def _has_parent(self, parent_line_number, line: dict) -> bool:
+        if parent_line_number == line.get("parent"):
+            return True
+
+        return self.is_ancestor(parent_line_number, line["ln"])
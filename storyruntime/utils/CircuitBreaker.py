@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+from urllib.parse import urlsplit
+
+from .. import Metrics
+from ..Exceptions import CircuitOpenError
+
+
+class RetryBudget:
+    """
+    Limits the retries made to an endpoint to a fraction of the requests
+    made to it, so that retries never multiply the load on an endpoint
+    which is already failing.
+
+    Every request deposits ratio tokens and every retry withdraws one.
+    The budget starts full, so that an endpoint which is rarely called
+    can still be retried.
+    """
+
+    def __init__(self, ratio: float, capacity: float):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Tracks the failures of an endpoint (scheme, host and port) shared by
+    all of its callers (see HttpUtils#fetch_with_retry).
+
+    Once failure_threshold requests in a row have failed, the circuit
+    opens and requests fail fast for reset_timeout seconds. After that,
+    a single request is let through (the circuit is half-open), which
+    either closes the circuit again or reopens it.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    _state_values = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    failure_threshold = 5
+    reset_timeout = 10
+    """Seconds for which an open circuit fails requests."""
+
+    max_backoff = 5
+    """Seconds, no matter how many attempts were made."""
+
+    retry_ratio = 0.2
+    retry_capacity = 10
+
+    _breakers = {}
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.failures = 0
+        self.opened_at = None
+        self.probed_at = None
+        self.budget = RetryBudget(self.retry_ratio, self.retry_capacity)
+        self._set_state(self.CLOSED)
+
+    @classmethod
+    def init(cls, config):
+        """
+        Reads the thresholds from the config (HTTP_CIRCUIT_BREAKER_*).
+        """
+        if config.HTTP_CIRCUIT_BREAKER_FAILURES is not None:
+            cls.failure_threshold = int(config.HTTP_CIRCUIT_BREAKER_FAILURES)
+        if config.HTTP_CIRCUIT_BREAKER_RESET_SECONDS is not None:
+            cls.reset_timeout = float(
+                config.HTTP_CIRCUIT_BREAKER_RESET_SECONDS
+            )
+
+    @classmethod
+    def get(cls, url: str) -> "CircuitBreaker":
+        endpoint = cls.endpoint_of(url)
+        breaker = cls._breakers.get(endpoint)
+        if breaker is None:
+            breaker = cls(endpoint)
+            cls._breakers[endpoint] = breaker
+
+        return breaker
+
+    @staticmethod
+    def endpoint_of(url: str) -> str:
+        parts = urlsplit(url)
+        if not parts.netloc:
+            return url
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @classmethod
+    def backoff(cls, attempt: int, base: float) -> float:
+        """
+        :return: The number of seconds to wait before retrying a request
+                 which failed attempt times, picked at random (full
+                 jitter) so that concurrent callers don't retry in step
+        """
+        delay = base * 2 ** (attempt - 1)
+        return random.uniform(0, min(cls.max_backoff, delay))
+
+    def before_request(self):
+        """
+        Raises CircuitOpenError unless a request may be made.
+        """
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            retry_in = self.opened_at + self.reset_timeout - now
+            if retry_in > 0:
+                self._reject(retry_in)
+            self._set_state(self.HALF_OPEN)
+            self.probed_at = None
+
+        if self.state == self.HALF_OPEN:
+            # Only one request at a time may probe the endpoint. A probe
+            # whose outcome was never recorded expires after reset_timeout.
+            if (
+                self.probed_at is not None
+                and now - self.probed_at < self.reset_timeout
+            ):
+                self._reject(self.probed_at + self.reset_timeout - now)
+            self.probed_at = now
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if (
+            self.state == self.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.failures = 0
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _reject(self, retry_in: float):
+        Metrics.http_circuit_breaker_rejected_total.labels(
+            endpoint=self.endpoint
+        ).inc()
+        raise CircuitOpenError(self.endpoint, retry_in)
+
+    def _set_state(self, state: str):
+        self.state = state
+        Metrics.http_circuit_breaker_state.labels(endpoint=self.endpoint).set(
+            self._state_values[state]
+        )
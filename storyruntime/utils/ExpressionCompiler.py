@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+import re
+
+from .RegExpUtils import RegExpUtils
+from .Resolver import Resolver
+from .TypeResolver import TypeResolver
+from .TypeUtils import TypeUtils
+from ..Exceptions import StoryscriptRuntimeError
+
+
+class ExpressionCompiler:
+    """
+    Compiles the argument ASTs of a story tree into closures, which take
+    the story as their only argument and return the resolved value.
+
+    Nodes are compiled the first time they are resolved, and the closure
+    is cached by the identity of the node. Only nodes which belong to the
+    tree are cached; nodes built on the fly (such as the paths that the
+    runtime resolves itself) are compiled every time.
+
+    The closures mirror the semantics of Resolver exactly. Like the
+    Resolver, they do not sanitize values; literals in the tree are safe,
+    and everything else is sanitized when it is written to the context.
+
+    Subtrees which do not read any variable (such as literals, regular
+    expressions, or arithmetic on literals) are evaluated once when they
+    are compiled, and their value is reused from then on. Repetitions of
+    strings and large powers are left to be evaluated when they are
+    resolved, since they may take a long time to evaluate.
+    """
+
+    def __init__(self, tree: dict):
+        self.tree = tree
+        self._nodes = {}
+        self._compiled = {}
+
+        for line in tree.values():
+            self._collect(line)
+
+    def _collect(self, node):
+        if isinstance(node, dict):
+            values = node.values()
+        elif isinstance(node, list):
+            values = node
+        else:
+            return
+
+        self._nodes[id(node)] = node
+        for value in values:
+            self._collect(value)
+
+    def compile_tree(self):
+        """
+        Compiles the arguments of every line ahead of time.
+        """
+        for line in self.tree.values():
+            args = line.get("args")
+            if isinstance(args, list):
+                for arg in args:
+                    self.compile(arg)
+
+    def resolve(self, story, item):
+        """
+        Resolves an argument to its real value. See Resolver#resolve.
+        """
+        fn = self._compiled.get(id(item))
+        if fn is None:
+            fn = self.compile(item)
+        return fn(story)
+
+    def compile(self, item):
+        """
+        Returns the closure for an argument, compiling it if required.
+        """
+        key = id(item)
+        fn = self._compiled.get(key)
+        if fn is not None:
+            return fn
+
+        try:
+            fn = self._compile(item)
+        except Exception:
+            # Malformed nodes are left to the Resolver, so that they
+            # fail in exactly the same way as they always have.
+            def fn(story):
+                return Resolver(story).resolve(item)
+
+        if self._nodes.get(key) is item:
+            self._compiled[key] = fn
+
+        return fn
+
+    def _compile(self, item):
+        """
+        Compiles an item as Resolver#resolve would resolve it.
+        """
+        if type(item) is dict:
+            return self._compile_object(item)
+        elif type(item) is list:
+            items = [self.compile(i) for i in item]
+
+            def join(story):
+                return " ".join([fn(story) for fn in items])
+
+            return self._fold(join, items)
+
+        return self._constant(item)
+
+    def _compile_object(self, item):
+        """
+        Compiles an item as Resolver#object would resolve it.
+        """
+        if not isinstance(item, dict):
+            return self._constant(item)
+
+        object_type = item.get("$OBJECT")
+        if object_type == "string":
+            return self._compile_string(item)
+        elif object_type == "dot":
+            return self._constant(item["dot"])
+        elif object_type == "int":
+            return self._constant(item["int"])
+        elif object_type == "time":
+            return self._constant(item["ms"])
+        elif object_type == "boolean":
+            return self._constant(item["boolean"])
+        elif object_type == "float":
+            return self._constant(item["float"])
+        elif object_type == "path":
+            return self._compile_path(item["paths"])
+        elif object_type == "regexp":
+            return self._compile_regexp(item)
+        elif object_type == "value":
+            return self._constant(item["value"])
+        elif object_type == "dict":
+            return self._compile_dict(item["items"])
+        elif object_type == "list":
+            items = [self.compile(i) for i in item["items"]]
+
+            def list_object(story):
+                return [fn(story) for fn in items]
+
+            return self._fold(list_object, items)
+        elif object_type == "expression" or object_type == "assertion":
+            return self._compile_expression(item)
+        elif object_type == "type_cast" or object_type == "type":
+            return self._compile_type_cast(item)
+
+        return self._compile_dictionary(item)
+
+    @staticmethod
+    def _constant(value):
+        if isinstance(value, (list, dict)):
+            # Lists and maps are copied on every resolution, so that they
+            # are never shared between evaluations.
+            def copied(story):
+                return _copy(value)
+
+            copied.constant = value
+            return copied
+
+        def constant(story):
+            return value
+
+        constant.constant = value
+        return constant
+
+    def _fold(self, fn, children):
+        """
+        Returns a constant in place of fn, if all of its children are
+        constants. Subtrees which fail to evaluate are left as they are,
+        so that they fail when they are resolved, as they always have.
+        """
+        for child in children:
+            if not hasattr(child, "constant"):
+                return fn
+
+        try:
+            value = fn(None)
+        except Exception:
+            return fn
+
+        return self._constant(value)
+
+    def _compile_string(self, item):
+        string = item["string"]
+        values = item.get("values")
+        if not values:
+            return self._constant(string)
+
+        values = [self.compile(value) for value in values]
+
+        def format_string(story):
+            return string.format(*[fn(story) for fn in values])
+
+        return self._fold(format_string, values)
+
+    def _compile_regexp(self, item):
+        pattern = item["regexp"]
+        flags = RegExpUtils.process_flags(item.get("flags", ""))
+
+        def regexp(story):
+            return re.compile(pattern, flags=flags)
+
+        return self._fold(regexp, ())
+
+    def _compile_dict(self, items):
+        pairs = [
+            (self._compile_object(k), self._compile_object(v))
+            for k, v in items
+        ]
+
+        def dictionary(story):
+            result = {}
+            for key_fn, value_fn in pairs:
+                k = key_fn(story)
+                if k in (list, tuple, dict):
+                    continue
+                result[k] = value_fn(story)
+            return result
+
+        return self._fold(dictionary, [fn for pair in pairs for fn in pair])
+
+    def _compile_dictionary(self, item):
+        pairs = [(key, self.compile(value)) for key, value in item.items()]
+
+        def dictionary(story):
+            return {key: fn(story) for key, fn in pairs}
+
+        return self._fold(dictionary, [fn for _, fn in pairs])
+
+    def _compile_type_cast(self, item):
+        type_ = item["type"]
+        value = self._compile_object(item["value"])
+
+        def type_cast(story):
+            return TypeResolver.type_cast(value(story), type_)
+
+        return self._fold(type_cast, (value,))
+
+    def _compile_path(self, paths):
+        name = paths[0]
+        steps = [self._compile_path_step(path) for path in paths[1:]]
+
+        if len(steps) == 0:
+
+            def variable(story):
+                try:
+                    return story.resolve_context(name)[name]
+                except IndexError:
+                    raise _index_out_of_bounds(name)
+                except (KeyError, AttributeError):
+                    raise _key_not_found(name)
+                except TypeError:
+                    return None
+
+            return variable
+
+        def path(story):
+            resolved = name
+            try:
+                item = story.resolve_context(name)[name]
+                for step, a, b in steps:
+                    if step is _KEY:
+                        resolved = a(story)
+                        # Allow a namedtuple to use keys or index
+                        # to retrieve data.
+                        if TypeUtils.isnamedtuple(item) and isinstance(
+                            resolved, str
+                        ):
+                            item = getattr(item, resolved)
+                        else:
+                            item = item[resolved]
+                    elif step is _RANGE:
+                        start = 0
+                        end = len(item)
+                        if a is not None:
+                            start = a(story)
+                        if b is not None:
+                            end = b(story)
+                        item = item[start:end]
+                    elif step is _STRING:
+                        item = item[a]
+                        raise AssertionError()
+                    else:
+                        raise AssertionError()
+                return item
+            except IndexError:
+                raise _index_out_of_bounds(resolved)
+            except (KeyError, AttributeError):
+                raise _key_not_found(resolved)
+            except TypeError:
+                return None
+
+        return path
+
+    def _compile_path_step(self, path):
+        if isinstance(path, str):
+            return _STRING, path, None
+        elif not isinstance(path, dict):
+            return None, None, None
+        elif path.get("$OBJECT") == "range":
+            range_ = path["range"]
+            start = end = None
+            if "start" in range_:
+                start = self._compile_object(range_["start"])
+            if "end" in range_:
+                end = self._compile_object(range_["end"])
+            return _RANGE, start, end
+
+        return _KEY, self._compile_object(path), None
+
+    def _compile_expression(self, item):
+        a = item.get("assertion", item.get("expression"))
+        values = item["values"]
+        left = self.compile(values[0])
+
+        if a == "or":
+            rest = [self.compile(value) for value in values[1:]]
+
+            def or_(story):
+                if left(story) is True:
+                    return True
+                for fn in rest:
+                    if fn(story) is True:
+                        return True
+                return False
+
+            return self._fold(or_, [left, *rest])
+        elif a == "and":
+            rest = [self.compile(value) for value in values[1:]]
+
+            def and_(story):
+                if left(story) is False:
+                    return False
+                for fn in rest:
+                    if fn(story) is False:
+                        return False
+                return True
+
+            return self._fold(and_, [left, *rest])
+        elif a == "sum":
+            rest = [self.compile(value) for value in values[1:]]
+
+            def sum_(story):
+                result = left(story)
+                assert type(result) in (int, float, str, list)
+                # Sum supports flattened values since this only occurs when
+                # a string like "{a} {b} {c}" is compiled. Everything else,
+                # including arithmetic is compiled as a nested expression.
+                for fn in rest:
+                    r = fn(story)
+                    if type(r) in (int, float, list) and type(result) in (
+                        int,
+                        float,
+                        list,
+                    ):
+                        # Not +=, which would modify a list operand in place.
+                        result = result + r
+                    else:
+                        result = f"{str(result)}{str(r)}"
+                return result
+
+            return self._fold(sum_, [left, *rest])
+        elif a == "not":
+
+            def not_(story):
+                return not left(story)
+
+            return self._fold(not_, (left,))
+
+        operation = _binary_operations.get(a)
+        if operation is None:
+
+            def unsupported(story):
+                left(story)
+                assert False, f"Unsupported operation: {a}"
+
+            return unsupported
+
+        right = self.compile(values[1])
+
+        def binary(story):
+            return operation(left(story), right(story))
+
+        if not _cheap_to_fold(a, left, right):
+            return binary
+
+        return self._fold(binary, (left, right))
+
+
+def _copy(value):
+    """
+    Copies a value built from literals: lists and maps of immutable values.
+    """
+    if type(value) is list:
+        return [_copy(item) for item in value]
+    elif type(value) is dict:
+        return {key: _copy(item) for key, item in value.items()}
+
+    return value
+
+
+_MAX_FOLDED_POWER_BITS = 4096
+"""The size in bits up to which powers of integers are folded."""
+
+
+def _cheap_to_fold(operation, left, right) -> bool:
+    """
+    :return: False if the operation may take long to evaluate for the
+             constant operands left and right (such as 10 ** 10 ** 9, or
+             a repeated string), so that it must not be folded
+    """
+    if operation != "multiplication" and operation != "exponential":
+        return True
+
+    left = getattr(left, "constant", None)
+    right = getattr(right, "constant", None)
+    if not (TypeUtils.is_number(left) and TypeUtils.is_number(right)):
+        return False
+
+    if operation == "exponential" and type(left) is int and type(right) is int:
+        bits = max(abs(left).bit_length(), 1)
+        return abs(right) * bits <= _MAX_FOLDED_POWER_BITS
+
+    return True
+
+
+_KEY = "key"
+_RANGE = "range"
+_STRING = "string"
+
+
+def _index_out_of_bounds(resolved):
+    return StoryscriptRuntimeError(
+        message=f"List index out of bounds: {resolved}"
+    )
+
+
+def _key_not_found(resolved):
+    return StoryscriptRuntimeError(
+        message=f'Map does not contain the key "{resolved}". '
+        f"Use map.get(key: <key> default: <default value>) to "
+        f"prevent an exception from being thrown. Additionally, you "
+        f"may also use map.contains(key: <key>) to check if a key "
+        f"exists in a map."
+    )
+
+
+def _less(left, right):
+    return left < right
+
+
+def _less_equal(left, right):
+    return left <= right
+
+
+def _equals(left, right):
+    return left == right
+
+
+def _subtraction(left, right):
+    assert type(left) in (int, float)
+    assert type(right) in (int, float)
+    return left - right
+
+
+def _multiplication(left, right):
+    assert type(left) in (int, float, str)
+    assert type(right) in (int, float, str)
+    return left * right
+
+
+def _modulus(left, right):
+    assert type(left) in (int, float)
+    assert type(right) in (int, float)
+    return left % right
+
+
+def _division(left, right):
+    assert type(left) in (int, float, str)
+    assert type(right) in (int, float, str)
+    return left / right
+
+
+def _exponential(left, right):
+    assert type(left) in (int, float)
+    assert type(right) in (int, float)
+    return left**right
+
+
+_binary_operations = {
+    "equals": _equals,
+    "equal": _equals,
+    "less": _less,
+    "less_equal": _less_equal,
+    "subtraction": _subtraction,
+    "multiplication": _multiplication,
+    "modulus": _modulus,
+    "division": _division,
+    "exponential": _exponential,
+}
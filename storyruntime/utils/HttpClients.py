@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import weakref
+from functools import partial
+
+from tornado.httpclient import AsyncHTTPClient
+from tornado.ioloop import IOLoop
+
+from .. import Metrics
+
+try:
+    # Keeps connections alive between requests, if pycurl is installed
+    # (see the "curl" extra).
+    from tornado.curl_httpclient import CurlAsyncHTTPClient
+except ImportError:
+    CurlAsyncHTTPClient = None
+
+_CURL_UNSUPPORTED = ("body_producer", "ssl_options")
+"""Options of a request which only the simple client supports."""
+
+
+class HttpPool:
+    """
+    A pool of HTTP connections to one class of destinations (see
+    HttpClients), which limits the number of requests in flight to them.
+
+    Requests over the limit wait for the pool, rather than in the queue
+    of the underlying client, so that the time they wait is known.
+    It has the same fetch method as AsyncHTTPClient, so that it can be
+    used in its place (see HttpUtils#fetch_with_retry).
+    """
+
+    def __init__(self, name: str, max_clients: int):
+        self.name = name
+        self.max_clients = max_clients
+        self._slots = asyncio.Semaphore(max_clients)
+        self._clients = {}
+
+    def client(self, kwargs: dict) -> AsyncHTTPClient:
+        """
+        Returns the client for a request. Requests are sent by a client
+        which keeps connections alive if there is one, unless they use
+        options which only the simple client supports.
+        """
+        cls = AsyncHTTPClient
+        if CurlAsyncHTTPClient is not None and not any(
+            kwargs.get(option) is not None for option in _CURL_UNSUPPORTED
+        ):
+            cls = CurlAsyncHTTPClient
+
+        client = self._clients.get(cls)
+        if client is None:
+            client = cls(force_instance=True, max_clients=self.max_clients)
+            self._clients[cls] = client
+
+        return client
+
+    async def fetch(self, request, **kwargs):
+        waiting = Metrics.http_pool_waiting_requests.labels(pool=self.name)
+        queued_at = time.time()
+        waiting.inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            waiting.dec()
+
+        Metrics.http_pool_queue_seconds.labels(pool=self.name).observe(
+            time.time() - queued_at
+        )
+        active = Metrics.http_pool_active_requests.labels(pool=self.name)
+        active.inc()
+        try:
+            response = asyncio.ensure_future(
+                self.client(kwargs).fetch(request, **kwargs)
+            )
+        except BaseException:
+            self._release(active, None)
+            raise
+
+        # The clients can't abort a request once it was sent, so a caller
+        # which is cancelled stops waiting for its response, but its slot
+        # is only released once the request is actually done.
+        response.add_done_callback(partial(self._release, active))
+        return await asyncio.shield(response)
+
+    def _release(self, active, response):
+        active.dec()
+        self._slots.release()
+        if response is not None and not response.cancelled():
+            # Nobody retrieves the error of a request whose caller is gone.
+            response.exception()
+
+
+class HttpClients:
+    """
+    The HTTP clients used by the runtime, with a pool for every class of
+    destination, so that requests to one of them never queue behind the
+    requests to another.
+    """
+
+    SERVICES = "services"
+    """Services running in the cluster."""
+    KUBERNETES = "kubernetes"
+    SYNAPSE = "synapse"
+    INTERNET = "internet"
+    """Everything else, such as externally hosted services."""
+
+    max_clients = {SERVICES: 100, KUBERNETES: 20, SYNAPSE: 20, INTERNET: 50}
+
+    _pools = weakref.WeakKeyDictionary()
+    """The pools of every IOLoop, since clients are bound to their loop."""
+
+    @classmethod
+    def init(cls, config):
+        """
+        Reads the size of every pool from the config
+        (HTTP_MAX_CLIENTS_<POOL>).
+        """
+        for pool in list(cls.max_clients):
+            value = getattr(config, f"HTTP_MAX_CLIENTS_{pool.upper()}")
+            if value is not None:
+                cls.max_clients[pool] = int(value)
+
+    @classmethod
+    def get(cls, pool: str) -> HttpPool:
+        pools = cls._pools.setdefault(IOLoop.current(), {})
+        http_pool = pools.get(pool)
+        if http_pool is None:
+            http_pool = HttpPool(pool, cls.max_clients[pool])
+            pools[pool] = http_pool
+
+        return http_pool
@@ -5,6 +5,10 @@ from urllib.parse import urlencode
 
 from tornado.httpclient import HTTPError
 
+from .CircuitBreaker import CircuitBreaker
+from .. import Metrics
+from ..Exceptions import CircuitOpenError
+
 
 class HttpUtils:
     @staticmethod
@@ -16,6 +20,12 @@ class HttpUtils:
 
     @staticmethod
     async def fetch_with_retry(tries, logger, url, http_client, kwargs):
+        """
+        Fetches url, retrying up to tries times on network errors, with
+        exponential backoff. If circuit_breaker=True is passed in kwargs,
+        the requests to the endpoint share a circuit breaker and a retry
+        budget (see CircuitBreaker).
+        """
         kwargs["raise_error"] = False
 
         # this makes it possible to override the default
@@ -25,9 +35,34 @@ class HttpUtils:
         if "retry_timeout" in kwargs:
             del kwargs["retry_timeout"]
 
+        breaker = None
+        if kwargs.pop("circuit_breaker", False):
+            breaker = CircuitBreaker.get(url)
+            breaker.budget.deposit()
+
         attempts = 0
         last_exception = None
         while attempts < tries:
+            if attempts > 0:
+                if breaker is not None and not breaker.budget.withdraw():
+                    Metrics.http_retry_budget_exhausted_total.labels(
+                        endpoint=breaker.endpoint
+                    ).inc()
+                    logger.error(
+                        f"Not retrying {url}; the retry budget of "
+                        f"{breaker.endpoint} is used up"
+                    )
+                    break
+                await asyncio.sleep(
+                    CircuitBreaker.backoff(attempts, retry_timeout)
+                )
+
+            if breaker is not None:
+                try:
+                    breaker.before_request()
+                except CircuitOpenError as e:
+                    raise e from last_exception
+
             attempts = attempts + 1
             try:
                 res = await http_client.fetch(url, **kwargs)
@@ -35,13 +70,18 @@ class HttpUtils:
                     raise HTTPError(
                         res.code, message=str(res.error), response=res
                     )
-                return res
             except HTTPError as e:
+                if breaker is not None:
+                    breaker.record_failure()
                 last_exception = e
                 logger.error(
                     f"Failed to call {url}; attempt={attempts}; err={str(e)}"
                 )
-                await asyncio.sleep(retry_timeout)
+                continue
+
+            if breaker is not None:
+                breaker.record_success()
+            return res
 
         assert last_exception is not None  # Impossible.
         raise HTTPError(
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+import re
+
+from requests.structures import CaseInsensitiveDict
+
+from ..Exceptions import StoryscriptRuntimeError
+from ..Types import (
+    InternalCommand,
+    InternalService,
+    SafeInternalCommand,
+    SafeStreamingService,
+    StreamingService,
+)
+from ..entities.Multipart import FileFormField, FormField
+from ..entities.SpooledBody import SpooledBody
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+_RE_PATTERN = type(re.compile("a"))
+
+
+class JsonCodec:
+    """
+    The JSON codec used by the runtime for everything it sends.
+
+    Values are converted into plain JSON types in a single walk, which
+    never modifies them and only copies the containers which hold a value
+    that had to be converted. The result is serialized by serialize,
+    which is the C accelerated encoder of the json module by default, and
+    may be replaced by any function with the same signature.
+
+    The conversions are:
+    - bytes (and SpooledBody) to base64 encoded strings
+    - CaseInsensitiveDict to objects
+    - re.Pattern to its pattern
+    - namedtuples to objects, and other tuples to arrays
+
+    Values from stories are encoded with safe=True, which also hides the
+    internals of services (see TypeUtils#safe_type) and fails with
+    StoryscriptRuntimeError on types stories can't hold.
+    """
+
+    serialize = json.JSONEncoder().encode
+    deserialize = json.JSONDecoder().decode
+
+    @classmethod
+    def dumps(cls, o, safe=False) -> str:
+        return cls.serialize(cls.encodable(o, safe))
+
+    @classmethod
+    def loads(cls, s):
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode("utf-8")
+        return cls.deserialize(s)
+
+    @classmethod
+    def encodable(cls, o, safe=False):
+        """
+        :return: o, with every value converted into a plain JSON type
+        """
+        if type(o) in _PRIMITIVES:
+            return o
+
+        if isinstance(o, dict):
+            converted = None
+            for key, value in o.items():
+                encodable = cls.encodable(value, safe)
+                if encodable is not value:
+                    if converted is None:
+                        converted = dict(o)
+                    converted[key] = encodable
+            return o if converted is None else converted
+        elif isinstance(o, list):
+            converted = None
+            for i, value in enumerate(o):
+                encodable = cls.encodable(value, safe)
+                if encodable is not value:
+                    if converted is None:
+                        converted = list(o)
+                    converted[i] = encodable
+            return o if converted is None else converted
+        elif isinstance(o, bytes):
+            return base64.b64encode(o).decode("utf-8")
+        elif isinstance(o, SpooledBody):
+            return base64.b64encode(o.read()).decode("utf-8")
+        elif isinstance(o, CaseInsensitiveDict):
+            return cls.encodable(dict(o.items()), safe)
+        elif isinstance(o, _RE_PATTERN):
+            return o.pattern
+
+        if safe:
+            o = cls._safe(o)
+            if isinstance(o, dict):
+                return cls.encodable(o, safe)
+
+        if isinstance(o, tuple):
+            if hasattr(o, "_asdict"):
+                return cls.encodable(dict(o._asdict()), safe)
+            return cls.encodable(list(o), safe)
+
+        # Left to serialize, which fails on the types it doesn't know.
+        return o
+
+    @staticmethod
+    def _safe(o):
+        if isinstance(o, StreamingService):
+            return SafeStreamingService(name=o.name, command=o.command)
+        elif isinstance(o, InternalService):
+            return {"commands": o.commands}
+        elif isinstance(o, InternalCommand):
+            return SafeInternalCommand(
+                arguments=o.arguments, output_type=o.output_type
+            )
+        elif isinstance(o, (FormField, FileFormField, SafeStreamingService)):
+            return o
+
+        raise StoryscriptRuntimeError(message=f"Incompatible type: {type(o)}")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from math import inf
+
+from tornado.httputil import HTTPFile, HTTPHeaders, _parse_header
+from tornado.log import gen_log
+
+from .ResponseSpool import ResponseSpool
+
+MAX_HEADERS_SIZE = 64 * 1024
+"""The size in bytes up to which the headers of a part are accepted."""
+
+_PREAMBLE = "preamble"
+_DELIMITER = "delimiter"
+_HEADERS = "headers"
+_BODY = "body"
+_END = "end"
+
+
+class MultipartSpool:
+    """
+    Parses a multipart/form-data body as it is streamed in (see
+    StoryEventHandler), rather than once all of it has been buffered.
+
+    The body of every file is collected by a ResponseSpool, so that files
+    larger than memory_limit bytes are written to the spool dir of the app
+    as they are received. Only the data which may still contain the
+    boundary is held on to in between chunks.
+
+    Once the body has been received, files and arguments hold the parts of
+    the body, as tornado's parse_multipart_form_data would parse them. The
+    body of a file is bytes, or a SpooledBody if it was spooled.
+    """
+
+    def __init__(self, boundary: bytes, app, memory_limit: int = None):
+        if boundary.startswith(b'"') and boundary.endswith(b'"'):
+            boundary = boundary[1:-1]
+        self.app = app
+        self.memory_limit = inf if memory_limit is None else memory_limit
+        self.files = {}
+        self.arguments = {}
+        self._delimiter = b"--" + boundary
+        self._separator = b"\r\n--" + boundary
+        self._buffer = bytearray()
+        self._state = _PREAMBLE
+        self._part = None
+        self._spool = None
+
+    def write(self, chunk: bytes):
+        self._buffer += chunk
+        while self._step():
+            pass
+
+    def finish(self):
+        """
+        Completes the body. A body without its final boundary is invalid,
+        and none of its parts are kept.
+        """
+        if self._state != _END:
+            gen_log.warning("Invalid multipart/form-data: no final boundary")
+            if self._spool is not None:
+                self._spool.discard()
+            self.files = {}
+            self.arguments = {}
+
+        self._buffer = bytearray()
+        self._part = None
+        self._spool = None
+
+    def _step(self) -> bool:
+        """
+        :return: True if more of the buffer can be parsed right away
+        """
+        if self._state == _PREAMBLE:
+            return self._skip_preamble()
+        elif self._state == _DELIMITER:
+            return self._read_delimiter()
+        elif self._state == _HEADERS:
+            return self._read_headers()
+        elif self._state == _BODY:
+            return self._read_body()
+
+        # Anything after the final boundary is ignored.
+        self._buffer = bytearray()
+        return False
+
+    def _skip_preamble(self) -> bool:
+        index = self._buffer.find(self._delimiter)
+        if index == -1:
+            self._keep_tail(len(self._delimiter) - 1)
+            return False
+
+        del self._buffer[: index + len(self._delimiter)]
+        self._state = _DELIMITER
+        return True
+
+    def _read_delimiter(self) -> bool:
+        if len(self._buffer) < 2:
+            return False
+
+        end = bytes(self._buffer[:2])
+        del self._buffer[:2]
+        if end == b"\r\n":
+            self._state = _HEADERS
+        else:
+            # -- marks the final boundary.
+            self._state = _END
+        return True
+
+    def _read_headers(self) -> bool:
+        eoh = self._buffer.find(b"\r\n\r\n")
+        if eoh == -1:
+            if len(self._buffer) > MAX_HEADERS_SIZE:
+                raise ValueError("multipart/form-data headers too large")
+            return False
+
+        headers = HTTPHeaders.parse(self._buffer[:eoh].decode("utf-8"))
+        del self._buffer[: eoh + 4]
+        self._start_part(headers)
+        self._state = _BODY
+        return True
+
+    def _read_body(self) -> bool:
+        index = self._buffer.find(self._separator)
+        if index == -1:
+            keep = len(self._separator) - 1
+            if len(self._buffer) > keep:
+                self._write_part(bytes(self._buffer[:-keep]))
+                del self._buffer[:-keep]
+            return False
+
+        self._write_part(bytes(self._buffer[:index]))
+        del self._buffer[: index + len(self._separator)]
+        self._end_part()
+        self._state = _DELIMITER
+        return True
+
+    def _keep_tail(self, size: int):
+        if len(self._buffer) > size:
+            del self._buffer[:-size]
+
+    def _start_part(self, headers: HTTPHeaders):
+        disposition, params = _parse_header(
+            headers.get("Content-Disposition", "")
+        )
+        if disposition != "form-data":
+            gen_log.warning("Invalid multipart/form-data")
+            return
+        if not params.get("name"):
+            gen_log.warning("multipart/form-data value missing name")
+            return
+
+        filename = params.get("filename")
+        content_type = None
+        memory_limit = inf
+        if filename:
+            content_type = headers.get("Content-Type", "application/unknown")
+            memory_limit = self.memory_limit
+
+        self._part = (params["name"], filename, content_type)
+        self._spool = ResponseSpool(self.app, memory_limit)
+
+    def _write_part(self, data: bytes):
+        if self._spool is not None and data:
+            self._spool.write(data)
+
+    def _end_part(self):
+        if self._spool is None:
+            return
+
+        name, filename, content_type = self._part
+        body = self._spool.body(content_type)
+        if filename:
+            self.files.setdefault(name, []).append(
+                HTTPFile(
+                    filename=filename, body=body, content_type=content_type
+                )
+            )
+        else:
+            self.arguments.setdefault(name, []).append(body)
+
+        self._part = None
+        self._spool = None
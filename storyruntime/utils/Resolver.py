@@ -186,7 +186,8 @@ class Resolver:
                     float,
                     list,
                 ):
-                    result += r
+                    # Not +=, which would modify a list operand in place.
+                    result = result + r
                 else:
                     result = f"{str(result)}{str(r)}"
 
@@ -249,9 +250,8 @@ class Resolver:
         return item[start:end]
 
     def resolve(self, item):
-        # Sanitize this item so we can ensure that
-        # any unwanted data doesn't leak.
-        item = TypeUtils.safe_type(item)
+        # Items are not sanitized here. Values are sanitized once, when they
+        # are written to the context (see Story#set_variable).
         if type(item) is dict:
             return self.object(item)
         elif type(item) is list:
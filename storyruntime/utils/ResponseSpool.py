@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+from ..entities.SpooledBody import SpooledBody
+
+
+class ResponseSpool:
+    """
+    Collects the body of a response as it is streamed in (see the
+    streaming_callback of tornado's HTTPRequest), rather than having the
+    client buffer all of it.
+
+    Bodies of up to memory_limit bytes are kept in memory. Larger ones are
+    spooled to a file in the spool dir of the app (see App#get_spool_dir),
+    so that they never have to be held in memory as a whole.
+    """
+
+    def __init__(self, app, memory_limit: int):
+        self.app = app
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.path = None
+        self._chunks = []
+        self._file = None
+
+    def callbacks(self) -> dict:
+        """
+        :return: The arguments for fetching a response into this spool
+        """
+        return {
+            "streaming_callback": self.write,
+            "header_callback": self.header,
+        }
+
+    def header(self, line: str):
+        # The status line starts every response, including the response
+        # to a retried request, which starts a new body.
+        if line.startswith("HTTP/"):
+            self.discard()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+
+        self._chunks.append(chunk)
+        if self.size > self.memory_limit:
+            self._spool()
+
+    def _spool(self):
+        spool_dir = self.app.get_spool_dir()
+        os.makedirs(spool_dir, mode=0o700, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=spool_dir)
+        self._file = os.fdopen(fd, "wb")
+        for chunk in self._chunks:
+            self._file.write(chunk)
+        self._chunks = []
+
+    def body(self, content_type: str = None):
+        """
+        :return: The body as bytes if it was kept in memory, or as a
+                 SpooledBody if it was spooled to a file
+        """
+        if self._file is None:
+            return b"".join(self._chunks)
+
+        self._file.close()
+        body = SpooledBody(self.path, self.size, content_type)
+        self._file = None
+        self.path = None
+        self.size = 0
+        return body
+
+    def preview(self, limit=1024):
+        """
+        :return: The first limit bytes of the body, decoded, or None if
+                 they can't be decoded (for error messages)
+        """
+        try:
+            if self._file is None:
+                return b"".join(self._chunks)[:limit].decode("utf-8")
+
+            self._file.flush()
+            with open(self.path, "rb") as f:
+                return f.read(limit).decode("utf-8")
+        except BaseException:
+            return None
+
+    def discard(self):
+        """
+        Drops what was collected so far, removing the spooled file.
+        """
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.path)
+        self._file = None
+        self.path = None
+        self._chunks = []
+        self.size = 0
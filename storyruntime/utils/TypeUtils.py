@@ -11,6 +11,7 @@ from ..Types import (
     StreamingService,
 )
 from ..entities.Multipart import FileFormField, FormField
+from ..entities.SpooledBody import SpooledBody
 
 
 class TypeUtils:
@@ -20,6 +21,7 @@ class TypeUtils:
     allowed_types = [
         FileFormField,
         FormField,
+        SpooledBody,
         RE_PATTERN,
         str,
         int,
@@ -42,27 +44,41 @@ class TypeUtils:
         return all(type(n) == str for n in f)
 
     @staticmethod
-    def safe_type(o):
+    def is_number(o) -> bool:
+        """
+        :return: True if o is an int or a float (but not a bool)
+        """
+        return isinstance(o, (int, float)) and not isinstance(o, bool)
+
+    @staticmethod
+    def safe_type(o, checked=None):
         """
         This will safely convert the object to a safe type that won't
         expose sensitive information or internal data.
 
         :param o: the object you wish to convert
+        :param checked: an optional mapping of id(value) to value, of
+                        values which are known to be safe already. These
+                        values (and anything nested in them) are not
+                        walked again
         :return: returns a converted type
         """
         if o is None:
             return None
 
+        if checked is not None and checked.get(id(o)) is o:
+            return o
+
         if isinstance(o, dict) or isinstance(o, CaseInsensitiveDict):
             for key, val in o.items():
-                o[key] = TypeUtils.safe_type(val)
+                o[key] = TypeUtils.safe_type(val, checked)
 
             return o
         elif isinstance(o, list):
 
             def build_list():
                 for d in o:
-                    yield TypeUtils.safe_type(d)
+                    yield TypeUtils.safe_type(d, checked)
 
             return list(build_list())
 
@@ -12,18 +12,20 @@ from pytest import fixture, mark
 from storyruntime.App import App, AppData
 from storyruntime.AppConfig import Forward
 from storyruntime.Containers import Containers
-from storyruntime.Exceptions import StoryscriptError
+from storyruntime.Exceptions import InvalidKeywordUsage, StoryscriptError
 from storyruntime.Kubernetes import Kubernetes
+from storyruntime.Story import Story
 from storyruntime.Types import StreamingService
 from storyruntime.constants.ServiceConstants import ServiceConstants
 from storyruntime.entities.Release import Release
 from storyruntime.enums.AppEnvironment import AppEnvironment
-from storyruntime.processing import Stories
+from storyruntime.processing import Lexicon, Stories
 from storyruntime.processing.Services import Command, Service, Services
 from storyruntime.utils.ConstDict import ConstDict
+from storyruntime.utils.HttpClients import HttpClients
 from storyruntime.utils.HttpUtils import HttpUtils
 
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
+from tornado.httpclient import HTTPRequest, HTTPResponse
 
 
 @fixture
@@ -116,9 +118,7 @@ async def test_unsubscribe_all(patch, app, async_mock, magic, response_code):
         HttpUtils, "fetch_with_retry", new=async_mock(return_value=res)
     )
 
-    patch.init(AsyncHTTPClient)
-
-    client = AsyncHTTPClient()
+    client = HttpClients.get(HttpClients.SERVICES)
 
     await app.unsubscribe_all()
 
@@ -194,6 +194,11 @@ def test_app_init(magic, config, logger, env, always_pull_images):
     assert app.app_context["secrets"] == expected_secrets
     assert app.entrypoint == stories["entrypoint"]
     assert app.app_config == app_config
+    assert app.execution_plans == {}
+    assert app.bulkheads == {}
+    assert app.response_caches == {}
+    assert app.request_hedges == {}
+    assert app.output_validators == {}
 
     if always_pull_images is True:
         assert app.image_pull_policy() == "Always"
@@ -217,6 +222,80 @@ async def test_app_bootstrap(patch, app, async_mock):
         assert isinstance(app.story_global_contexts[story], ConstDict)
 
 
+def test_app_init_execution_plans(patch, magic, config, logger):
+    patch.object(Lexicon, "compile")
+    tree = {"1": {"ln": "1", "method": "execute"}}
+    app = App(
+        app_data=AppData(
+            release=Release(
+                app_uuid="app_id",
+                app_name="app_name",
+                app_dns="app_dns",
+                version=1,
+                stories={
+                    "stories": {"foo": {"tree": tree}},
+                    "entrypoint": ["foo"],
+                },
+                always_pull_images=False,
+                environment={},
+                owner_uuid="owner_1",
+                owner_email="example@example.com",
+                maintenance=False,
+                deleted=False,
+                state="QUEUED",
+                app_environment=AppEnvironment.PRODUCTION,
+            ),
+            app_config=magic(),
+            services={},
+            config=config,
+            logger=logger,
+        )
+    )
+
+    Lexicon.compile.assert_called_with(tree)
+    assert app.execution_plans == {"foo": Lexicon.compile()}
+    Lexicon.compile().validate.assert_called_with("foo")
+
+
+def test_app_init_invalid_keyword(magic, config, logger):
+    tree = {
+        "1": {"ln": "1", "method": "if", "enter": "2"},
+        "2": {"ln": "2", "method": "break", "parent": "1", "src": "  break"},
+    }
+    with pytest.raises(InvalidKeywordUsage) as e:
+        App(
+            app_data=AppData(
+                release=Release(
+                    app_uuid="app_id",
+                    app_name="app_name",
+                    app_dns="app_dns",
+                    version=1,
+                    stories={
+                        "stories": {"foo.story": {"tree": tree}},
+                        "entrypoint": ["foo.story"],
+                    },
+                    always_pull_images=False,
+                    environment={},
+                    owner_uuid="owner_1",
+                    owner_email="example@example.com",
+                    maintenance=False,
+                    deleted=False,
+                    state="QUEUED",
+                    app_environment=AppEnvironment.PRODUCTION,
+                ),
+                app_config=magic(),
+                services={},
+                config=config,
+                logger=logger,
+            )
+        )
+
+    assert str(e.value) == (
+        'InvalidKeywordUsage: Invalid usage of keyword "break".\n'
+        "    at line 2: break (in foo.story)"
+    )
+
+
 def test_app_get_tmp_dir(app):
     assert app.get_tmp_dir() == "/tmp/story.app_uuid"
 
@@ -261,9 +340,14 @@ def test_app_cleanup_tmp_dir(patch, app):
     app.cleanup_tmp_dir()
 
     app.get_tmp_dir.assert_called()
+    shutil.rmtree.assert_any_call(f"{path}.spool", ignore_errors=True)
     shutil.rmtree.assert_called_with(path, ignore_errors=True)
 
 
+def test_app_get_spool_dir(app):
+    assert app.get_spool_dir() == "/tmp/story.app_uuid.spool"
+
+
 def test_app_cleanup_tmp_dir_exc(patch, app):
     path = f"/tmp/story.{app.app_id}"
 
@@ -345,6 +429,40 @@ async def test_start_services(patch, app, async_mock, magic, internal):
         assert Services.start_container.call_count == 0
 
 
+@mark.asyncio
+async def test_start_services_routes(patch, app, async_mock):
+    tree = {"1": {"ln": "1", "method": "execute"}}
+    app.stories = {"a.story": {"tree": tree, "entrypoint": "1"}}
+    chain = deque([Service(name="foo"), Command(name="bar")])
+    patch.object(Services, "resolve_chain", return_value=chain)
+    patch.object(Services, "is_internal", return_value=True)
+
+    await app.start_services()
+
+    route = app.service_routes[("a.story", "1")]
+    assert route.chain == chain
+    assert route.internal is True
+    assert (
+        Services.route(Story(app, "a.story", app.logger), tree["1"]) is route
+    )
+
+
+@mark.asyncio
+async def test_start_services_prepares_routes(patch, app):
+    tree = {"1": {"ln": "1", "method": "execute"}}
+    app.stories = {"a.story": {"tree": tree, "entrypoint": "1"}}
+    chain = deque([Service(name="foo"), Command(name="bar")])
+    patch.object(Services, "resolve_chain", return_value=chain)
+    patch.object(Services, "is_internal", return_value=True)
+    patch.object(Services, "prepare")
+
+    await app.start_services()
+
+    Services.prepare.assert_called_with(
+        ANY, app.service_routes[("a.story", "1")]
+    )
+
+
 @mark.asyncio
 async def test_start_services_multiple(patch, app, async_mock, magic):
     app.stories = {
@@ -510,7 +628,11 @@ async def test_clear_subscriptions_synapse(
 
     ret = await app.clear_subscriptions_synapse()
     HttpUtils.fetch_with_retry.mock.assert_called_with(
-        3, app.logger, expected_url, AsyncHTTPClient(), expected_kwargs
+        3,
+        app.logger,
+        expected_url,
+        HttpClients.get(HttpClients.SYNAPSE),
+        expected_kwargs,
     )
 
     if status_code == 200:
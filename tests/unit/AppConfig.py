@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import pytest
+from pytest import mark
+
 from storyruntime.AppConfig import AppConfig
 
 
@@ -24,3 +27,115 @@ def test_app_config():
         assert exposes[i].service == f"service_{i}"
         assert exposes[i].http_path == f"/my_expose_path_{i}"
         assert exposes[i].service_forward_name == f"expose_name_{i}"
+
+
+def test_app_config_concurrent_services():
+    assert AppConfig({}).concurrent_services is False
+    config = AppConfig({"runtime": {"concurrent_services": True}})
+    assert config.concurrent_services is True
+
+
+def test_app_config_foreach_concurrency():
+    assert AppConfig({}).foreach_concurrency == 1
+    config = AppConfig({"runtime": {"foreach_concurrency": 8}})
+    assert config.foreach_concurrency == 8
+
+
+@mark.parametrize("concurrency", [0, "8", None])
+def test_app_config_foreach_concurrency_invalid(concurrency):
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": {"foreach_concurrency": concurrency}})
+
+
+def test_app_config_scheduling():
+    config = AppConfig({})
+    assert config.time_slice == 0.01
+    assert config.max_steps is None
+    assert config.max_run_time is None
+    assert config.max_loop_iterations == 100000
+    config = AppConfig(
+        {
+            "runtime": {
+                "time_slice": 1,
+                "max_steps": 5,
+                "max_run_time": 1.5,
+                "max_loop_iterations": 10,
+            }
+        }
+    )
+    assert config.max_loop_iterations == 10
+    assert config.time_slice == 1
+    assert config.max_steps == 5
+    assert config.max_run_time == 1.5
+
+
+@mark.parametrize(
+    "runtime",
+    [
+        {"time_slice": 0},
+        {"time_slice": "1"},
+        {"max_steps": 0},
+        {"max_steps": 1.5},
+        {"max_run_time": -1},
+        {"max_run_time": True},
+        {"max_loop_iterations": 0},
+        {"max_loop_iterations": None},
+    ],
+)
+def test_app_config_scheduling_invalid(runtime):
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": runtime})
+
+
+def test_app_config_interpreter():
+    assert AppConfig({}).interpreter == "lexicon"
+    config = AppConfig({"runtime": {"interpreter": "stack"}})
+    assert config.interpreter == "stack"
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": {"interpreter": "unknown"}})
+
+
+def test_app_config_service_limits():
+    assert AppConfig({}).service_limits == {}
+    limits = {"cups": {"max_concurrency": 2}}
+    config = AppConfig({"runtime": {"service_limits": limits}})
+    assert config.service_limits == limits
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": {"service_limits": {"cups": 2}}})
+
+
+def test_app_config_service_cache():
+    assert AppConfig({}).service_cache == {}
+    hints = {"cups": {"status": {"ttl": 5}}}
+    config = AppConfig({"runtime": {"service_cache": hints}})
+    assert config.service_cache == hints
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": {"service_cache": {"cups": {"status": 5}}}})
+
+
+def test_app_config_service_hedging():
+    assert AppConfig({}).service_hedging == {}
+    hints = {"cups": {"status": {"percentile": 95}}}
+    config = AppConfig({"runtime": {"service_hedging": hints}})
+    assert config.service_hedging == hints
+    with pytest.raises(AssertionError):
+        AppConfig({"runtime": {"service_hedging": {"cups": {"status": 95}}}})
+
+
+def test_app_config_output_sampling():
+    assert AppConfig({}).output_sampling == {}
+    config = AppConfig({"runtime": {"output_sampling": {"cups": 0.1}}})
+    assert config.output_sampling == {"cups": 0.1}
+    for rate in [1.5, -1, "0.1"]:
+        with pytest.raises(AssertionError):
+            AppConfig({"runtime": {"output_sampling": {"cups": rate}}})
+
+
+@mark.parametrize("key", ["response_memory_limit", "upload_memory_limit"])
+def test_app_config_memory_limits(key):
+    assert getattr(AppConfig({}), key) is None
+    config = AppConfig({"runtime": {key: 1024}})
+    assert getattr(config, key) == 1024
+    for limit in [-1, 1.5, True]:
+        with pytest.raises(AssertionError):
+            AppConfig({"runtime": {key: limit}})
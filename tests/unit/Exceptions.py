@@ -3,6 +3,8 @@ from pytest import mark, raises
 
 from storyruntime import Exceptions
 from storyruntime.Exceptions import (
+    CircuitOpenError,
+    ServiceBusyError,
     StoryscriptError,
     TooManyActiveApps,
     TooManyServices,
@@ -88,3 +90,19 @@ def test_exception_trace(magic, patch, story, with_root, long_message):
 def test_many_services():
     with raises(TooManyServices):
         raise TooManyServices(10, 10)
+
+
+def test_circuit_open():
+    err = CircuitOpenError("http://foo:8080", 2.04)
+    assert isinstance(err, StoryscriptError)
+    assert err.message == (
+        "Calls to http://foo:8080 are failing, so it is not being called "
+        "for another 2.0s"
+    )
+
+
+def test_service_busy():
+    err = ServiceBusyError("cups", "10 calls are waiting for it")
+    assert err.message.startswith(
+        'The service "cups" is busy, since 10 calls are waiting for it.'
+    )
@@ -19,10 +19,9 @@ from storyruntime.constants.ServiceConstants import ServiceConstants
 from storyruntime.db.Database import Database
 from storyruntime.entities.ContainerConfig import ContainerConfig
 from storyruntime.entities.Volume import Volume
+from storyruntime.utils.HttpClients import HttpClients
 from storyruntime.utils.HttpUtils import HttpUtils
 
-from tornado.httpclient import AsyncHTTPClient
-
 
 @fixture
 def line():
@@ -255,9 +254,7 @@ async def test_make_k8s_call(patch, story, async_mock, method):
     patch.object(Kubernetes, "new_ssl_context", return_value=context)
     context.load_verify_locations = MagicMock()
 
-    patch.init(AsyncHTTPClient)
-
-    client = AsyncHTTPClient()
+    client = HttpClients.get(HttpClients.KUBERNETES)
 
     story.app.config.CLUSTER_CERT = "this_is\\nmy_cert"  # Notice the \\n.
     story.app.config.CLUSTER_AUTH_TOKEN = "my_token"
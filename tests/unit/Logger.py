@@ -204,6 +204,22 @@ def test_logger_log_args(patch, logger):
     Frustum.log.assert_called_with("my-event", "extra", "args")
 
 
+@mark.parametrize("enabled", [True, False])
+def test_logger_log_debug_event(patch, logger, enabled):
+    patch.object(Frustum, "log")
+    patch.object(logger, "is_debug_enabled", return_value=enabled)
+    logger.log("lexicon-if", "line", "context")
+    assert Frustum.log.called is enabled
+
+
+def test_logger_is_debug_enabled(patch, logger):
+    patch.object(logger, "frustum")
+    assert logger.is_debug_enabled() == (
+        logger.frustum.logger.isEnabledFor.return_value
+    )
+    logger.frustum.logger.isEnabledFor.assert_called_with(logging.DEBUG)
+
+
 def test_logger_log_info(patch, logger):
     patch.object(logger, "frustum")
     logger.info("my-event")
@@ -216,6 +232,17 @@ def test_logger_log_debug(patch, logger):
     logger.frustum.logger.debug.assert_called_with("my-event")
 
 
+@mark.parametrize("enabled", [True, False])
+def test_logger_log_debug_args(patch, logger, enabled):
+    patch.object(logger, "frustum")
+    patch.object(logger, "is_debug_enabled", return_value=enabled)
+    logger.debug("my-event {} {}", "a", 1)
+    if enabled:
+        logger.frustum.logger.debug.assert_called_with("my-event a 1")
+    else:
+        logger.frustum.logger.debug.assert_not_called()
+
+
 def test_logger_log_warn(patch, logger):
     patch.object(logger, "frustum")
     logger.warn("my-event")
@@ -5,10 +5,18 @@ import time
 import pytest
 from pytest import mark
 
-from storyruntime.Exceptions import StackOverflowException
+from storyruntime.Exceptions import (
+    StackOverflowException,
+    StoryscriptRuntimeError,
+)
 from storyruntime.Story import MAX_BYTES_LOGGING, Story
-from storyruntime.utils import Dict, Resolver
+from storyruntime.Types import StreamingService
+from storyruntime.utils import Dict
+from storyruntime.utils.ArgumentIndex import ArgumentIndex
+from storyruntime.utils.BlockIndex import BlockIndex
+from storyruntime.utils.ExpressionCompiler import ExpressionCompiler
 from storyruntime.utils.ConstDict import ConstDict
+from storyruntime.utils.TypeUtils import TypeUtils
 
 
 def test_story_init(app, logger, story):
@@ -113,6 +121,43 @@ def test_story_resolve_context(app, story):
     assert story.resolve_context("g") == story._contexts[1]
 
 
+def test_story_resolve_context_slots(app, story):
+    app.story_global_contexts = {story.name: {"a": 1}}
+    story._contexts = [{"b": 2}, {"c": 3}]
+    assert story.resolve_context("b") is story._contexts[0]
+    assert story._slots == {"b": story._contexts[0]}
+    assert story.resolve_context("a") is app.story_global_contexts[story.name]
+    assert story.resolve_context("x") is story._contexts[1]
+    assert story._slots == {"b": story._contexts[0]}
+
+
+def test_story_resolve_context_slots_lookup(app, story):
+    app.story_global_contexts = {story.name: {}}
+    story._contexts = [{"a": 1}]
+    story._slots["a"] = {"a": "slot"}
+    assert story.resolve_context("a") == {"a": "slot"}
+    story._slots["a"] = {}  # Stale slots are ignored.
+    assert story.resolve_context("a") is story._contexts[0]
+
+
+def test_story_contexts_setter(story):
+    story._slots["a"] = {"a": 1}
+    story._contexts = [{"b": 2}]
+    assert story._frames == [{"b": 2}]
+    assert story._slots == {}
+
+
+def test_story_new_context_forgets_slots(app, story):
+    app.story_global_contexts = {story.name: {}}
+    story._contexts = [{}]
+    with story.new_context():
+        story.resolve_context("x")["x"] = 1
+        assert story.resolve_context("x") is story._contexts[1]
+        assert "x" in story._slots
+    assert story._slots == {}
+    assert story.resolve_context("x") is story._contexts[0]
+
+
 def test_story_build_combined_context(app, story):
     app.story_global_contexts = {story.name: {"a": 1, "b": 2, "c": 3}}
     story._contexts = [{"d": 4, "e": 5, "f": 6}, {"g": 7, "h": 8, "i": 9}]
@@ -154,15 +199,24 @@ def test_story_function_line_by_name(patch, story):
 
 @mark.parametrize("encode", [True, False])
 def test_story_resolve(patch, story, encode):
-    patch.object(Resolver, "resolve")
-    patch.init(Resolver)
+    patch.object(ExpressionCompiler, "resolve")
     patch.object(Story, "encode")
     obj = {"$OBJECT": "string", "string": "string"}
     story.resolve(obj, encode)
-    Resolver.resolve.assert_called_with(obj)
+    ExpressionCompiler.resolve.assert_called_with(story, obj)
     assert Story.encode.call_count == encode
 
 
+@mark.parametrize("debug", [True, False])
+def test_story_resolve_debug(patch, story, debug):
+    patch.object(ExpressionCompiler, "resolve", return_value="result")
+    patch.object(Story, "get_str_for_logging")
+    story.logger.is_debug_enabled.return_value = debug
+    assert story.resolve({"$OBJECT": "int", "int": 1}) == "result"
+    assert story.logger.debug.called is debug
+    assert Story.get_str_for_logging.called is debug
+
+
 def test_command_arguments_list(patch, story):
     patch.object(Story, "resolve", return_value="something")
     obj = {"$OBJECT": "string", "string": "string"}
@@ -241,6 +295,48 @@ def test_story_end_line_output_as_bytes(patch, story):
     assert story.results["1"]["output"] == b"output"
 
 
+def test_story_set_variable(patch, story):
+    patch.object(Story, "sanitize", return_value="sanitized")
+    story.set_context({})
+    story.set_variable({"paths": ["x"]}, "output")
+    Story.sanitize.assert_called_with("output")
+    assert story._contexts[0]["x"] == "sanitized"
+
+
+def test_story_sanitize(story):
+    value = {"a": [1, {"b": 2}]}
+    assert story.sanitize(value) is value
+    assert value == {"a": [1, {"b": 2}]}
+    assert story._safe_values == {id(value): value}
+
+
+def test_story_sanitize_checked_values(patch, story):
+    value = [{"a": 1}]
+    value = story.sanitize(value)
+    story.start_line("2")
+    patch.object(TypeUtils, "safe_type", side_effect=TypeUtils.safe_type)
+    assert story.sanitize(value) is value
+    assert TypeUtils.safe_type.call_count == 1  # Not walked again.
+
+
+def test_story_sanitize_incompatible_type(story):
+    with pytest.raises(StoryscriptRuntimeError):
+        story.sanitize([object()])
+
+
+def test_story_sanitize_streaming_service(story):
+    service = StreamingService("name", "command", "container", "hostname")
+    assert story.sanitize(service) is service
+
+
+def test_story_sanitize_forgets_values(story):
+    used = story.sanitize([1])
+    story.sanitize([2])
+    story.start_line("1")
+    # Values are remembered across lines, for as long as they are used.
+    assert story._safe_values == {id(used): used}
+
+
 @mark.parametrize(
     "input,output",
     [
@@ -278,6 +374,23 @@ def test_story_argument_by_name_lookup(patch, story):
     story.resolve.assert_called_with(line["args"][0]["argument"], encode=False)
 
 
+def test_story_argument_by_name_index(patch, story):
+    story.tree = {
+        "1": {
+            "ln": "1",
+            "args": [
+                {"$OBJECT": "argument", "name": "foo", "argument": "bar"},
+            ],
+        }
+    }
+    patch.object(story, "resolve")
+    assert isinstance(story.arguments(), ArgumentIndex)
+    assert story.arguments().tree is story.tree
+    story.argument_by_name(story.tree["1"], "foo", encode=True)
+    story.resolve.assert_called_with("bar", encode=True)
+    assert story.argument_by_name(story.tree["1"], "missing") is None
+
+
 def test_story_argument_by_name_missing(patch, story):
     line = {"args": []}
     assert story.argument_by_name(line, "foo") is None
@@ -335,6 +448,23 @@ def test_story_next_block_only_block(patch, story):
     assert story.next_block(story.line("2")) is None
 
 
+def test_story_fork(story):
+    story._contexts = [{"a": 1}]
+    story._stack = ["1"]
+    story.resolve_context("a")
+    fork = story.fork()
+    assert fork.app is story.app
+    assert fork.tree is story.tree
+    assert fork._contexts == [{"a": 1}, {}]
+    assert fork._contexts[0] is story._contexts[0]
+    assert fork._slots == {}
+    assert fork._stack == ["1"]
+    assert fork._stack is not story._stack
+
+    fork.resolve_context("b")["b"] = 2
+    assert story._contexts == [{"a": 1}]
+
+
 def test_story_context_for_function_call(story):
     assert story.context_for_function_call({}, {}) == {}
 
@@ -376,6 +506,16 @@ def test_story_context_for_function_call_with_args(story):
     }
 
 
+@mark.parametrize("borrow", [True, False])
+def test_story_context_for_function_call_borrow(patch, story, borrow):
+    value = {"a": [1]}
+    patch.object(story, "argument_by_name", return_value=value)
+    function_line = {"args": [{"$OBJECT": "arg", "name": "foo"}]}
+    context = story.context_for_function_call({}, function_line, borrow)
+    assert context == {"foo": value}
+    assert (context["foo"] is value) is borrow
+
+
 def test_story_next_block_nested(patch, story):
     story.tree = {
         "2": {"ln": "2", "enter": "3", "next": "3"},
@@ -419,3 +559,36 @@ def test_story_next_block_nested_inner(patch, story):
     assert isinstance(story, Story)
 
     assert story.tree["7"] == story.next_block(story.line("4"))
+
+
+def test_story_block_index(story):
+    story.tree = {"1": {"ln": "1"}}
+    index = story.block_index()
+    assert isinstance(index, BlockIndex)
+    assert index.tree is story.tree
+    assert story.block_index() is index
+
+    story.tree = {"2": {"ln": "2"}}
+    assert story.block_index() is not index
+    assert story.block_index().tree is story.tree
+
+
+def test_story_block_index_shared(magic, story):
+    story.tree = {"1": {"ln": "1"}}
+    index = BlockIndex(story.tree)
+    story.execution_plan = magic(index=index)
+    assert story.block_index() is index
+
+
+def test_story_line_has_parent(story):
+    story.tree = {
+        "1": {"ln": "1", "enter": "2"},
+        "2": {"ln": "2", "parent": "1", "enter": "3"},
+        "3": {"ln": "3", "parent": "2"},
+        "4": {"ln": "4"},
+    }
+    assert story.line_has_parent("1", story.tree["2"]) is True
+    assert story.line_has_parent("1", story.tree["3"]) is True
+    assert story.line_has_parent("2", story.tree["3"]) is True
+    assert story.line_has_parent("1", story.tree["4"]) is False
+    assert story.line_has_parent("3", story.tree["1"]) is False
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import json
+import math
 
 import pytest
 from pytest import fixture, mark
@@ -7,6 +8,7 @@ from pytest import fixture, mark
 from storyruntime.Apps import Apps
 from storyruntime.constants import ContextConstants
 from storyruntime.entities.Multipart import FileFormField
+from storyruntime.entities.SpooledBody import SpooledBody
 from storyruntime.http_handlers.StoryEventHandler import (
     CLOUD_EVENTS_FILE_KEY,
     StoryEventHandler,
@@ -156,3 +158,91 @@ async def test_post(patch, logger, magic, async_mock, throw_exc, handler):
             context=expected_context,
             block="1",
         )
+
+
+def test_story_event_handler_streams_json(handler: StoryEventHandler):
+    handler.request.headers = {"Content-Type": "application/json"}
+    handler.prepare()
+    handler.data_received(b'{"foo": ')
+    handler.data_received(b'"bar"}')
+    handler.body_received()
+    assert handler.request.body == b'{"foo": "bar"}'
+    assert handler.get_ce_event_payload() == {"foo": "bar"}
+
+
+def test_story_event_handler_streams_multipart(
+    patch, handler: StoryEventHandler, tmpdir
+):
+    body = (
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="_ce_payload"; '
+        b'filename="payload"\r\n'
+        b"Content-Type: application/json\r\n"
+        b"\r\n"
+        b'{"foo": "bar"}\r\n'
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="large"; filename="l"\r\n'
+        b"Content-Type: image/jpeg\r\n"
+        b"\r\n"
+        b"a large file\r\n"
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="field"\r\n'
+        b"\r\n"
+        b"value\r\n"
+        b"--boundary--\r\n"
+    )
+    handler.request.headers = {
+        "Content-Type": "multipart/form-data; boundary=boundary"
+    }
+    handler.request.arguments = {}
+    handler.request.body_arguments = {}
+    patch.object(handler, "get_argument", return_value="app_id")
+    patch.object(Apps, "get")
+    app = Apps.get.return_value
+    app.app_config.upload_memory_limit = 10
+    app.get_spool_dir.return_value = str(tmpdir)
+
+    handler.prepare()
+    Apps.get.assert_called_with("app_id")
+    for i in range(0, len(body), 5):
+        handler.data_received(body[i : i + 5])
+    handler.body_received()
+
+    # The payload is larger than the limit, and spooled too.
+    assert handler.get_ce_event_payload() == {"foo": "bar"}
+    large = handler.request.files["large"][0]
+    assert isinstance(large.body, SpooledBody)
+    assert large.body.read() == b"a large file"
+    assert large.body.content_type == "image/jpeg"
+    assert handler.request.body_arguments == {"field": [b"value"]}
+    assert handler.request.arguments == {"field": [b"value"]}
+
+
+def test_story_event_handler_unknown_app(patch, handler: StoryEventHandler):
+    handler.request.headers = {
+        "Content-Type": "multipart/form-data; boundary=boundary"
+    }
+    patch.object(handler, "get_argument", return_value="app_id")
+    patch.object(Apps, "get", side_effect=KeyError("app_id"))
+    handler.prepare()
+    assert handler._multipart.app is None
+    assert handler._multipart.memory_limit == math.inf
+
+
+@mark.asyncio
+async def test_run_story_spooled_files(
+    patch, magic, async_mock, handler, tmpdir
+):
+    path = tmpdir.join("large")
+    path.write_binary(b"a large file")
+    spooled = SpooledBody(str(path), 12, "image/jpeg")
+    large_file = magic()
+    large_file.body = spooled
+    handler.request.files = {"large": [large_file]}
+
+    patch.object(Apps, "get")
+    patch.object(Stories, "run", new=async_mock())
+
+    event_body = {"data": {}}
+    await handler.run_story("app_id", "story_name", "1", event_body)
+    assert event_body["data"]["files"]["large"].body is spooled
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import random
 from collections import deque
 
 import pytest
@@ -175,3 +176,50 @@ def test_raise_if_invalid_nested(simple_chain, error_out_deep):
         ServiceOutputValidator.raise_if_invalid(
             command_conf, output, simple_chain
         )
+
+
+def test_compile(simple_chain):
+    expected_output = {
+        "type": "object",
+        "properties": {
+            "d0": {"type": "object", "properties": {"d1": {"type": "int"}}},
+            "n": {"type": "number"},
+        },
+    }
+    validate = ServiceOutputValidator.compile(expected_output)
+
+    # The schema isn't read again once compiled.
+    expected_output["properties"]["d0"]["properties"]["d1"]["type"] = "string"
+
+    validate({"d0": {"d1": 1}, "n": 1.5}, simple_chain)
+    with pytest.raises(FieldValueTypeMismatchOmgError):
+        validate({"d0": {"d1": "1"}, "n": 1}, simple_chain)
+    with pytest.raises(MissingFieldOmgError):
+        validate({"d0": None, "n": 1}, simple_chain)
+    with pytest.raises(MissingFieldOmgError):
+        validate({"d0": {"d1": 1}}, simple_chain)
+
+
+def test_compile_unsupported_type(simple_chain):
+    validate = ServiceOutputValidator.compile({"type": "unknown_omg_type"})
+    with pytest.raises(UnsupportedTypeOmgError):
+        validate(None, simple_chain)
+
+
+@mark.parametrize("sample,validated", [(0.1, True), (0.9, False)])
+def test_sampled(patch, magic, simple_chain, sample, validated):
+    patch.object(random, "random", return_value=sample)
+    validate = magic()
+
+    sampled = ServiceOutputValidator.sampled(validate, 0.5)
+    sampled({}, simple_chain)
+
+    if validated:
+        validate.assert_called_with({}, simple_chain)
+    else:
+        validate.assert_not_called()
+
+
+def test_sampled_always(magic):
+    validate = magic()
+    assert ServiceOutputValidator.sampled(validate, 1) is validate
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+from pytest import mark
+
+from storyruntime.Exceptions import ArgumentTypeMismatchError
+from storyruntime.processing.Bindings import ArgumentBinding, BindingPlan
+from storyruntime.processing.Services import Services
+
+cases = [
+    ({"type": "string", "pattern": "[a-z]+"}, "abc", None),
+    ({"type": "string", "pattern": "[a-z]+"}, "ab1", ("a", "string")),
+    ({"type": "int", "range": {"min": 1}}, 0, ("a", "int")),
+    ({"type": "float", "range": {"max": 1.0}}, 0.5, None),
+    ({"type": "enum", "enum": ["x"]}, "y", ("a", "enum")),
+    ({"type": "string"}, None, None),
+    ({"type": "string", "required": True}, None, ("a", "string")),
+    ({"type": "unknown"}, 1, ("a", "unknown")),
+    ({"type": "object"}, {}, ("a", "object")),
+    (
+        {"type": "object", "properties": {"b": {"type": "int"}}},
+        {"b": "1"},
+        ("b", "int"),
+    ),
+    (
+        {"type": "object", "properties": {"b": {"type": "int"}}},
+        {"c": 1},
+        ("a", "object"),
+    ),
+]
+
+
+@mark.parametrize("conf,value,expected", cases)
+def test_argument_binding_validate(conf, value, expected):
+    assert ArgumentBinding("a", conf).validate(value) == expected
+
+
+@mark.parametrize("conf,value,expected", cases)
+def test_argument_binding_validate_like_services(conf, value, expected):
+    if expected is None:
+        Services.raise_for_type_mismatch(None, {}, "a", value, conf)
+        return
+
+    with pytest.raises(ArgumentTypeMismatchError) as e:
+        Services.raise_for_type_mismatch(None, {}, "a", value, conf)
+    assert e.value.message == ArgumentTypeMismatchError(*expected).message
+
+
+def test_argument_binding_compiles_pattern_once(patch):
+    binding = ArgumentBinding("a", {"type": "string", "pattern": "[a-z]+"})
+    patch.object(re, "compile")
+    patch.object(re, "fullmatch")
+    assert binding.validate("abc") is None
+    re.compile.assert_not_called()
+    re.fullmatch.assert_not_called()
+
+
+def test_argument_binding_invalid_pattern():
+    binding = ArgumentBinding("a", {"type": "string", "pattern": "["})
+    assert binding.validate(1) == ("a", "string")
+    with pytest.raises(re.error):
+        binding.validate("abc")
+
+
+def test_argument_binding():
+    binding = ArgumentBinding("a", {"type": "string", "in": "query"})
+    assert binding.name == "a"
+    assert binding.location == "query"
+    assert binding.to_json is True
+    assert ArgumentBinding("a", {}).location == "requestBody"
+    assert ArgumentBinding("a", {}).to_json is False
+
+
+def test_binding_plan():
+    command_conf = {"arguments": {"a": {}, "b": {"in": "path"}}}
+    plan = BindingPlan(command_conf)
+    assert plan.command_conf is command_conf
+    assert [binding.name for binding in plan.bindings] == ["a", "b"]
+    assert BindingPlan({}).bindings == []
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from pytest import mark
+
+from storyruntime import Metrics
+from storyruntime.Exceptions import ServiceBusyError
+from storyruntime.processing.Bulkhead import Bulkhead
+
+
+def queue_depth(bulkhead):
+    return Metrics.service_queue_depth.labels(
+        app_id=bulkhead.app_id, service=bulkhead.service
+    )._value.get()
+
+
+def test_bulkhead_from_limits():
+    assert Bulkhead.from_limits("app_id", "cups", {}) is None
+    bulkhead = Bulkhead.from_limits(
+        "app_id",
+        "cups",
+        {"max_concurrency": 2, "max_queue": 3, "queue_timeout": 1.5},
+    )
+    assert bulkhead.max_concurrency == 2
+    assert bulkhead.max_queue == 3
+    assert bulkhead.queue_timeout == 1.5
+
+    bulkhead = Bulkhead.from_limits("app_id", "cups", {"max_concurrency": 2})
+    assert bulkhead.max_queue == 100
+    assert bulkhead.queue_timeout == 30
+
+
+@mark.parametrize(
+    "limits",
+    [
+        {"max_concurrency": 0},
+        {"max_concurrency": "1"},
+        {"max_concurrency": 1, "max_queue": -1},
+        {"max_concurrency": 1, "queue_timeout": 0},
+        {"max_concurrency": 1, "queue_timeout": True},
+    ],
+)
+def test_bulkhead_from_limits_invalid(limits):
+    with pytest.raises(AssertionError):
+        Bulkhead.from_limits("app_id", "cups", limits)
+
+
+@mark.asyncio
+async def test_bulkhead_limits_calls():
+    bulkhead = Bulkhead("app_id", "limits_calls", 2)
+    running = []
+    release = asyncio.Event()
+
+    async def call(i):
+        async with bulkhead:
+            running.append(i)
+            await release.wait()
+
+    calls = [asyncio.ensure_future(call(i)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    assert running == [0, 1]
+    assert bulkhead.waiting == 1
+    assert queue_depth(bulkhead) == 1
+
+    release.set()
+    await asyncio.gather(*calls)
+    assert running == [0, 1, 2]
+    assert bulkhead.waiting == 0
+    assert queue_depth(bulkhead) == 0
+
+
+@mark.asyncio
+async def test_bulkhead_queue_full():
+    bulkhead = Bulkhead("app_id", "queue_full", 1, max_queue=0)
+    async with bulkhead:
+        with pytest.raises(ServiceBusyError):
+            async with bulkhead:
+                pass
+
+    async with bulkhead:
+        pass
+
+
+@mark.asyncio
+async def test_bulkhead_queue_timeout():
+    bulkhead = Bulkhead("app_id", "queue_timeout", 1, queue_timeout=0.01)
+    async with bulkhead:
+        with pytest.raises(ServiceBusyError) as e:
+            async with bulkhead:
+                pass
+
+    assert "0.01s" in e.value.message
+    assert bulkhead.waiting == 0
+    assert queue_depth(bulkhead) == 0
+
+    async with bulkhead:
+        pass
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import pytest
+from pytest import mark
+
+from storyruntime.Exceptions import InvalidKeywordUsage
+from storyruntime.processing.ExecutionPlan import ExecutionPlan, LinePlan
+from storyruntime.processing.Program import Program
+from storyruntime.utils.ArgumentIndex import ArgumentIndex
+from storyruntime.utils.BlockIndex import BlockIndex
+from storyruntime.utils.ExpressionCompiler import ExpressionCompiler
+
+
+def handler_for(method):
+    if method == "catch":
+        return None
+    return f"handler_{method}"
+
+
+def test_line_plan():
+    line = {"ln": "1", "method": "for"}
+    plan = LinePlan(line, "handler", True)
+    assert plan.ln == "1"
+    assert plan.line is line
+    assert plan.method == "for"
+    assert plan.handler == "handler"
+    assert plan.scoped is True
+
+
+def test_execution_plan():
+    tree = {
+        "1": {"ln": "1", "method": "try"},
+        "2": {"ln": "2", "method": "catch"},
+        "3": {"ln": "3", "method": "while"},
+    }
+    plan = ExecutionPlan(tree, handler_for, ("while",))
+    assert plan.tree is tree
+    assert plan.get("1").handler == "handler_try"
+    assert plan.get("1").line is tree["1"]
+    assert plan.get("1").scoped is False
+    assert plan.get("2") is None
+    assert plan.get("3").scoped is True
+    assert plan.get("4") is None
+
+
+def test_execution_plan_index():
+    tree = {"1": {"ln": "1", "method": "try"}}
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert isinstance(plan.index, BlockIndex)
+    assert plan.index.tree is tree
+
+
+def test_execution_plan_expressions():
+    tree = {"1": {"ln": "1", "method": "try"}}
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert isinstance(plan.expressions, ExpressionCompiler)
+    assert plan.expressions.tree is tree
+
+
+def test_execution_plan_arguments():
+    tree = {"1": {"ln": "1", "method": "try"}}
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert isinstance(plan.arguments, ArgumentIndex)
+    assert plan.arguments.tree is tree
+
+
+def test_execution_plan_writing_functions():
+    tree = {
+        "1": {"ln": "1", "method": "function"},
+        "2": {"ln": "2", "method": "for", "parent": "1"},
+        "3": {
+            "ln": "3",
+            "method": "expression",
+            "parent": "2",
+            "name": ["a", "b"],
+        },
+        "4": {"ln": "4", "method": "function"},
+        "5": {"ln": "5", "method": "expression", "parent": "4", "name": ["a"]},
+        "6": {"ln": "6", "method": "function"},
+        "7": {
+            "ln": "7",
+            "method": "execute",
+            "parent": "6",
+            "output": {"paths": ["a", "b"]},
+        },
+        "8": {"ln": "8", "method": "expression", "name": ["a", "b"]},
+    }
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert plan.writing_functions == {"1", "6"}
+
+
+def execute(ln, service, next_=None, name=None, args=None, **kwargs):
+    return {
+        "ln": ln,
+        "method": "execute",
+        "service": service,
+        "next": next_,
+        "name": name,
+        "args": args or [],
+        **kwargs,
+    }
+
+
+def path(name):
+    return {"$OBJECT": "path", "paths": [name]}
+
+
+def test_execution_plan_concurrent_runs():
+    tree = {
+        "1": execute("1", "a", "2", name=["x"]),
+        "2": execute("2", "b", "3", name=["y"], args=[path("z")]),
+        # Reads x, which is assigned by line 1.
+        "3": execute("3", "c", "4", args=[{"values": [path("x")]}]),
+        "4": execute("4", "d", "5", name=["w"]),
+        # Calls the same service as line 4.
+        "5": execute("5", "d", "6"),
+        "6": execute("6", "e", "7"),
+        # Streaming services are never part of a run.
+        "7": execute("7", "f", "8", enter="8"),
+        "8": execute("8", "g", "9", parent="7"),
+        "9": execute("9", "h", None, parent="7", output={"paths": ["q"]}),
+    }
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert plan.concurrent_runs == {
+        "1": [tree["1"], tree["2"]],
+        "3": [tree["3"], tree["4"]],
+        "5": [tree["5"], tree["6"]],
+        "8": [tree["8"], tree["9"]],
+    }
+
+
+def test_execution_plan_concurrent_runs_dependencies():
+    tree = {
+        "1": execute("1", "a", "2", args=[path("y")]),
+        # Assigns y, which is read by line 1.
+        "2": execute("2", "b", "3", name=["y"]),
+        # Assigns y again.
+        "3": execute("3", "c", None, output={"paths": ["y", "k"]}),
+    }
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert plan.concurrent_runs == {}
+
+
+def test_execution_plan_parallel_loops():
+    tree = {
+        "1": {"ln": "1", "method": "expression", "name": ["total"]},
+        # Assigns total, which is assigned outside of the loop.
+        "2": {"ln": "2", "method": "for", "output": ["a"]},
+        "3": {
+            "ln": "3",
+            "method": "expression",
+            "parent": "2",
+            "name": ["total"],
+        },
+        # Only assigns variables of its own.
+        "4": {"ln": "4", "method": "for", "output": ["b"]},
+        "5": {"ln": "5", "method": "for", "parent": "4", "output": ["c"]},
+        "6": {"ln": "6", "method": "execute", "parent": "5", "name": ["d"]},
+        # Its output is the argument of a function.
+        "7": {
+            "ln": "7",
+            "method": "function",
+            "args": [{"$OBJECT": "arg", "name": "e"}],
+        },
+        "8": {"ln": "8", "method": "for", "parent": "7", "output": ["e"]},
+    }
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert plan.parallel_loops == {"4", "5"}
+
+
+def test_execution_plan_program():
+    tree = {
+        "1": {"ln": "1", "method": "try"},
+        "2": {"ln": "2", "method": "catch"},
+    }
+    plan = ExecutionPlan(tree, handler_for, ())
+    assert plan._program is None
+    assert isinstance(plan.program, Program)
+    assert plan.program is plan.program
+    assert plan.program.at(0).op is plan.get("1")
+    assert plan.program.at(1).op is None
+
+
+def test_execution_plan_validate():
+    tree = {
+        "1": {"ln": "1", "method": "while"},
+        "2": {"ln": "2", "method": "break", "parent": "1"},
+        "3": {"ln": "3", "method": "when"},
+        "4": {"ln": "4", "method": "if", "parent": "3"},
+        "5": {"ln": "5", "method": "return", "parent": "4"},
+    }
+    ExecutionPlan(tree, handler_for, set()).validate("foo.story")
+
+
+@mark.parametrize(
+    "keyword,parent",
+    [("break", "function"), ("continue", "when"), ("return", "for")],
+)
+def test_execution_plan_validate_invalid(keyword, parent):
+    tree = {
+        "1": {"ln": "1", "method": parent},
+        "2": {"ln": "2", "method": "if", "parent": "1"},
+        "3": {"ln": "3", "method": keyword, "parent": "2", "src": keyword},
+    }
+    plan = ExecutionPlan(tree, handler_for, set())
+    with pytest.raises(InvalidKeywordUsage) as e:
+        plan.validate("foo.story")
+    assert e.value.line == tree["3"]
+    assert e.value.message == (
+        f'Invalid usage of keyword "{keyword}".\n'
+        f"    at line 3: {keyword} (in foo.story)"
+    )
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+import pytest
+from pytest import fixture, mark
+
+from storyruntime.Exceptions import (
+    StackOverflowException,
+    StoryscriptError,
+    StoryscriptRuntimeError,
+)
+from storyruntime.Story import Story
+from storyruntime.constants.LineSentinels import LineSentinels
+from storyruntime.processing import Lexicon, Stories
+from storyruntime.processing.Interpreter import Interpreter
+
+
+def path(name):
+    return {"$OBJECT": "path", "paths": [name]}
+
+
+def integer(value):
+    return {"$OBJECT": "int", "int": value}
+
+
+def string(value):
+    return {"$OBJECT": "string", "string": value}
+
+
+def expression(operator, *values):
+    return {
+        "$OBJECT": "expression",
+        "expression": operator,
+        "values": list(values),
+    }
+
+
+def argument(name, value):
+    return {"$OBJECT": "argument", "name": name, "argument": value}
+
+
+def lines(*items):
+    """
+    Builds a tree from (ln, method, parent, fields) tuples. Blocks are
+    entered at the next line, and the next line of a line which owns a
+    block is the one after its block.
+    """
+    parents = {ln: parent for ln, _, parent, _ in items}
+
+    def inside(ln, ancestor):
+        while ln is not None:
+            if ln == ancestor:
+                return True
+            ln = parents[ln]
+        return False
+
+    tree = {}
+    for i, (ln, method, parent, fields) in enumerate(items):
+        line = {"ln": ln, "method": method, "parent": parent, **fields}
+        following = [item[0] for item in items[i + 1 :]]
+        if following and parents[following[0]] == ln:
+            line["enter"] = following[0]
+        line["next"] = next(
+            (next_ln for next_ln in following if not inside(next_ln, ln)),
+            None,
+        )
+        tree[ln] = line
+    return tree
+
+
+def assign(name, value):
+    return {"name": [name], "args": [value]}
+
+
+def increment(name, by=integer(1)):
+    return assign(name, expression("sum", path(name), by))
+
+
+def loops_tree():
+    """
+    total = 0
+    foreach items as item
+        if item == 2
+            continue
+        elif item == 5
+            break
+        else
+            total = total + item
+    i = 0
+    while i < 10
+        i = i + 1
+        if i == 3
+            continue
+        total = total + 100
+    """
+    return lines(
+        ("1", "expression", None, assign("total", integer(0))),
+        ("2", "for", None, {"args": [path("items")], "output": ["item"]}),
+        (
+            "3",
+            "if",
+            "2",
+            {"args": [expression("equals", path("item"), integer(2))]},
+        ),
+        ("4", "continue", "3", {}),
+        (
+            "5",
+            "elif",
+            "2",
+            {"args": [expression("equals", path("item"), integer(5))]},
+        ),
+        ("6", "break", "5", {}),
+        ("7", "else", "2", {}),
+        ("8", "expression", "7", increment("total", path("item"))),
+        ("9", "expression", None, assign("i", integer(0))),
+        (
+            "10",
+            "while",
+            None,
+            {"args": [expression("less", path("i"), integer(10))]},
+        ),
+        ("11", "expression", "10", increment("i")),
+        (
+            "12",
+            "if",
+            "10",
+            {"args": [expression("equals", path("i"), integer(3))]},
+        ),
+        ("13", "continue", "12", {}),
+        ("14", "expression", "10", increment("total", integer(100))),
+    )
+
+
+def functions_tree(depth):
+    """
+    function count n:int returns int
+        if n == 0
+            return 0
+        try
+            if n == 3
+                throw "three"
+            r = count(n: n - 1)
+        catch
+            r = count(n: n - 1)
+        finally
+            done = true
+        return r + 1
+    result = count(n: depth)
+    """
+    n_minus_one = {
+        "name": ["r"],
+        "function": "count",
+        "args": [
+            argument("n", expression("subtraction", path("n"), integer(1)))
+        ],
+    }
+    return lines(
+        (
+            "1",
+            "function",
+            None,
+            {"function": "count", "args": [{"$OBJECT": "arg", "name": "n"}]},
+        ),
+        (
+            "2",
+            "if",
+            "1",
+            {"args": [expression("equals", path("n"), integer(0))]},
+        ),
+        ("3", "return", "2", {"args": [integer(0)]}),
+        ("4", "try", "1", {}),
+        (
+            "5",
+            "if",
+            "4",
+            {"args": [expression("equals", path("n"), integer(3))]},
+        ),
+        ("6", "throw", "5", {"args": [string("three")]}),
+        ("7", "call", "4", n_minus_one),
+        ("8", "catch", "1", {"output": []}),
+        ("9", "call", "8", n_minus_one),
+        ("10", "finally", "1", {}),
+        (
+            "11",
+            "expression",
+            "10",
+            assign("done", {"$OBJECT": "boolean", "boolean": True}),
+        ),
+        (
+            "12",
+            "return",
+            "1",
+            {"args": [expression("sum", path("r"), integer(1))]},
+        ),
+        (
+            "13",
+            "call",
+            None,
+            {
+                "name": ["result"],
+                "function": "count",
+                "args": [argument("n", integer(depth))],
+            },
+        ),
+    )
+
+
+def errors_tree():
+    """
+    foreach items as item
+        try
+            throw "in try"
+        catch
+            throw "in catch"
+        finally
+            cleaned = true
+    """
+    return lines(
+        ("1", "for", None, {"args": [path("items")], "output": ["item"]}),
+        ("2", "try", "1", {}),
+        ("3", "throw", "2", {"args": [string("in try")]}),
+        ("4", "catch", "1", {"output": []}),
+        ("5", "throw", "4", {"args": [string("in catch")]}),
+        ("6", "finally", "1", {}),
+        (
+            "7",
+            "expression",
+            "6",
+            assign("cleaned", {"$OBJECT": "boolean", "boolean": True}),
+        ),
+    )
+
+
+def finally_sentinel_tree():
+    """
+    foreach items as item
+        try
+            a = 1
+        finally
+            break
+    """
+    return lines(
+        ("1", "for", None, {"args": [path("items")], "output": ["item"]}),
+        ("2", "try", "1", {}),
+        ("3", "expression", "2", assign("a", integer(1))),
+        ("4", "finally", "1", {}),
+        ("5", "break", "4", {}),
+    )
+
+
+def escaping_sentinel_tree():
+    """
+    when s e as r
+        if true
+            return
+    """
+    tree = lines(
+        ("1", "when", None, {}),
+        ("2", "if", "1", {"args": [{"$OBJECT": "boolean", "boolean": True}]}),
+        ("3", "return", "2", {"args": []}),
+    )
+    tree["2"]["next"] = None
+    return tree
+
+
+@fixture
+def make_story(magic, logger):
+    def make_story(tree, interpreter, entrypoint="1", functions=None):
+        app = magic()
+        app.stories = {
+            "s": {
+                "tree": tree,
+                "entrypoint": entrypoint,
+                "functions": functions or {},
+            }
+        }
+        app.story_global_contexts = {"s": {}}
+        app.environment = {}
+        app.execution_plans = {}
+        app.app_config.interpreter = interpreter
+        app.app_config.foreach_concurrency = 1
+        app.app_config.concurrent_services = False
+        story = Story(app, "s", logger)
+        story.prepare({"items": [1, 2, 3, 4, 5, 6]})
+        return story
+
+    return make_story
+
+
+async def execute(logger, story):
+    try:
+        await Stories.execute(logger, story)
+    except StoryscriptError as e:
+        return type(e), e.message, e.line and e.line["ln"]
+    finally:
+        context = story.build_combined_context()
+        context.pop("app", None)
+        story.outcome = context, list(story.get_stack())
+
+
+@mark.parametrize(
+    "tree,entrypoint,functions,expected",
+    [
+        (loops_tree(), "1", None, {"total": 908, "i": 10}),
+        (functions_tree(5), "1", {"count": "1"}, {"result": 5}),
+        (functions_tree(200), "1", {"count": "1"}, StackOverflowException),
+        (errors_tree(), "1", None, StoryscriptError),
+        (finally_sentinel_tree(), "1", None, StoryscriptError),
+        (escaping_sentinel_tree(), "2", None, StoryscriptError),
+    ],
+)
+@mark.asyncio
+async def test_interpreter_matches_lexicon(
+    patch, logger, make_story, tree, entrypoint, functions, expected
+):
+    lexicon = make_story(tree, "lexicon", entrypoint, functions)
+    assert Stories.interpreter(lexicon) is Lexicon
+    lexicon_error = await execute(logger, lexicon)
+    lexicon_logs = logger.log.call_args_list
+    logger.reset_mock()
+
+    stack = make_story(tree, "stack", entrypoint, functions)
+    assert Stories.interpreter(stack) is Interpreter
+    stack_error = await execute(logger, stack)
+
+    assert stack_error == lexicon_error
+    assert stack.outcome == lexicon.outcome
+    assert logger.log.call_args_list == lexicon_logs
+    if isinstance(expected, dict):
+        assert lexicon_error is None
+        for key, value in expected.items():
+            assert stack.outcome[0][key] == value
+    else:
+        assert issubclass(lexicon_error[0], expected)
+
+
+@mark.asyncio
+async def test_interpreter_execute_block(logger, make_story):
+    tree = loops_tree()
+    story = make_story(tree, "stack")
+    story.set_context({"total": 0, "item": 5})
+    result = await Interpreter.execute_block(logger, story, tree["2"])
+    assert result == LineSentinels.BREAK
+
+
+@mark.asyncio
+async def test_interpreter_does_not_recurse(patch, logger, make_story):
+    story = make_story(functions_tree(5), "stack", functions={"count": "1"})
+    patch.object(Lexicon, "execute_block")
+    patch.object(Lexicon, "execute_line")
+    await Interpreter.execute(logger, story)
+    assert story.build_combined_context()["result"] == 5
+    Lexicon.execute_block.assert_not_called()
+    Lexicon.execute_line.assert_not_called()
+
+
+@mark.asyncio
+async def test_interpreter_concurrent_foreach(
+    patch, async_mock, logger, make_story
+):
+    tree = loops_tree()
+    story = make_story(tree, "stack")
+    story.app.app_config.foreach_concurrency = 2
+    story.execution_plan = Lexicon.compile(tree)
+    story.execution_plan.parallel_loops.add("2")
+    patch.object(Lexicon, "_foreach_concurrently", new=async_mock())
+    await Interpreter.execute(logger, story)
+    assert Lexicon._foreach_concurrently.mock.call_count == 1
+
+
+@mark.asyncio
+async def test_interpreter_errors_keep_the_stack(logger, make_story):
+    story = make_story(errors_tree(), "stack")
+    with pytest.raises(StoryscriptError) as e:
+        await Interpreter.execute(logger, story)
+    assert e.value.message == "in catch"
+    assert e.value.line["ln"] == "1"
+    # Like Lexicon, the frames of the failed lines are left on the stack.
+    assert story.get_stack() == ["1", "2", "3", "5"]
+    assert story.build_combined_context()["cleaned"] is True
+
+
+@mark.asyncio
+async def test_interpreter_while_limit_matches_lexicon(logger, make_story):
+    """
+    i = 0
+    while true
+        i = i + 1
+    """
+    tree = lines(
+        ("1", "expression", None, assign("i", integer(0))),
+        (
+            "2",
+            "while",
+            None,
+            {"args": [{"$OBJECT": "boolean", "boolean": True}]},
+        ),
+        ("3", "expression", "2", increment("i")),
+    )
+    outcomes = []
+    for interpreter in ["lexicon", "stack"]:
+        story = make_story(tree, interpreter)
+        story.app.app_config.max_loop_iterations = 50
+        error = await execute(logger, story)
+        outcomes.append((error, story.outcome))
+
+    assert outcomes[0] == outcomes[1]
+    error, (context, _) = outcomes[0]
+    assert error[0] is StoryscriptRuntimeError
+    assert error[2] == "2"
+    assert context["i"] == 50
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import collections
 from unittest import mock
 from unittest.mock import MagicMock, Mock
@@ -16,9 +17,10 @@ from storyruntime.Story import Story
 from storyruntime.Types import StreamingService
 from storyruntime.constants import ContextConstants
 from storyruntime.constants.LineConstants import LineConstants
-from storyruntime.constants.LineSentinels import LineSentinels
+from storyruntime.constants.LineSentinels import LineSentinels, ReturnSentinel
 from storyruntime.processing import Lexicon, Stories
 from storyruntime.processing.Mutations import Mutations
+from storyruntime.processing.Scheduler import Scheduler
 from storyruntime.processing.Services import Services
 
 
@@ -282,6 +284,27 @@ async def test_continue(logger, story, line, patch, valid_usage):
             await Lexicon.continue_(logger, story, line)
 
 
+@mark.asyncio
+async def test_break_and_continue_in_while(patch, logger, story):
+    tree = {
+        "1": {"ln": "1", "method": "while"},
+        "2": {"ln": "2", "method": "if", "parent": "1"},
+        "3": {"ln": "3", "method": "break", "parent": "2"},
+        "4": {"ln": "4", "method": "continue", "parent": "2"},
+    }
+    story.tree = tree
+    patch.object(story, "line")
+    assert (
+        await Lexicon.break_(logger, story, tree["3"]) == LineSentinels.BREAK
+    )
+    assert (
+        await Lexicon.continue_(logger, story, tree["4"])
+        == LineSentinels.CONTINUE
+    )
+    # The enclosing loop is looked up in the block index of the story.
+    story.line.assert_not_called()
+
+
 def test_lexicon_unless(logger, story, line, patch):
     patch.object(Story, "resolve")
     result = Lexicon.unless_condition(logger, story, line)
@@ -292,6 +315,15 @@ def test_lexicon_unless(logger, story, line, patch):
     assert result == line["exit"]
 
 
+def test_lexicon_unless_debug_disabled(logger, story, line, patch):
+    patch.object(Story, "resolve")
+    patch.object(Story, "build_combined_context")
+    logger.is_debug_enabled.return_value = False
+    Lexicon.unless_condition(logger, story, line)
+    logger.log.assert_not_called()
+    Story.build_combined_context.assert_not_called()
+
+
 def test_lexicon_unless_false(logger, story, line, patch):
     patch.object(Story, "resolve", return_value=False)
     assert Lexicon.unless_condition(logger, story, line) == line["enter"]
@@ -459,6 +491,8 @@ async def test_story_execute_function(patch, logger, story, async_mock):
     line = {"function": "my_super_awesome_function"}
     patch.many(story, ["function_line_by_name", "context_for_function_call"])
     patch.object(Lexicon, "execute_block", new=async_mock())
+    patch.object(Lexicon, "plan_for")
+    Lexicon.plan_for().writing_functions = set()
     first_context = {"first": "context"}
 
     story.set_context(first_context)
@@ -466,7 +500,7 @@ async def test_story_execute_function(patch, logger, story, async_mock):
 
     story.function_line_by_name.assert_called_with(line["function"])
     story.context_for_function_call.assert_called_with(
-        line, story.function_line_by_name()
+        line, story.function_line_by_name(), borrow=True
     )
 
     Lexicon.execute_block.mock.assert_called_with(
@@ -474,6 +508,35 @@ async def test_story_execute_function(patch, logger, story, async_mock):
     )
 
 
+@mark.parametrize("writes_in_place", [True, False])
+@mark.asyncio
+async def test_story_execute_function_borrow(
+    patch, logger, story, async_mock, writes_in_place
+):
+    returned = ["returned"]
+    line = {"ln": "2", "function": "f", "name": ["a"]}
+    function_line = {"ln": "1"}
+    patch.object(story, "function_line_by_name", return_value=function_line)
+    patch.many(story, ["context_for_function_call", "end_line", "line"])
+    patch.object(
+        Lexicon,
+        "execute_block",
+        new=async_mock(return_value=ReturnSentinel(return_value=returned)),
+    )
+    patch.object(Lexicon, "plan_for")
+    Lexicon.plan_for().writing_functions = {"1"} if writes_in_place else set()
+
+    await Lexicon.call(logger, story, line)
+
+    story.context_for_function_call.assert_called_with(
+        line, function_line, borrow=not writes_in_place
+    )
+    output = story.end_line.call_args[1]["output"]
+    assert output == returned
+    # Values returned from borrowing functions are copied.
+    assert (output is returned) is writes_in_place
+
+
 @mark.asyncio
 async def test_lexicon_execute_escaping_sentinel(
     patch, app, logger, story, async_mock
@@ -619,7 +682,6 @@ async def test_lexicon_execute_block(
             mock.call("4"),
             mock.call("5"),
             mock.call("6"),
-            mock.call("1"),
         ] == story.line.mock_calls
 
 
@@ -923,3 +985,354 @@ async def test_lexicon_when_invalid(story):
     line = {"service": "foo", "command": "bar"}
     with pytest.raises(StoryscriptError):
         await Lexicon.when(story.logger, story, line)
+
+
+def test_lexicon_handler_for():
+    assert Lexicon.handler_for("elif") == Lexicon.if_condition
+    assert Lexicon.handler_for("mutation") == Lexicon.set
+    assert Lexicon.handler_for("return") == Lexicon.ret
+    assert Lexicon.handler_for("catch") is None
+
+
+def test_lexicon_compile():
+    tree = {
+        "1": {"ln": "1", "method": "for"},
+        "2": {"ln": "2", "method": "execute", "parent": "1"},
+    }
+    plan = Lexicon.compile(tree)
+    assert plan.get("1").handler == Lexicon.foreach
+    assert plan.get("1").scoped is True
+    assert plan.get("2").handler == Lexicon.execute
+    assert plan.get("2").scoped is False
+
+
+def test_lexicon_compile_line_unknown_method():
+    with pytest.raises(NotImplementedError):
+        Lexicon.compile_line({"ln": "1", "method": "foo_method"})
+
+
+def test_lexicon_plan_for_shared(patch, story):
+    story.tree = {"1": {"ln": "1", "method": "execute"}}
+    plan = Lexicon.compile(story.tree)
+    story.execution_plan = plan
+    patch.object(Lexicon, "compile")
+    assert Lexicon.plan_for(story) is plan
+    Lexicon.compile.assert_not_called()
+
+
+def test_lexicon_plan_for_swapped_tree(story):
+    story.execution_plan = Lexicon.compile({})
+    story.tree = {"1": {"ln": "1", "method": "execute"}}
+    plan = Lexicon.plan_for(story)
+    assert plan.tree is story.tree
+    assert story.execution_plan is plan
+    assert Lexicon.plan_for(story) is plan
+
+
+def test_lexicon_scheduler_for(story):
+    scheduler = Lexicon.scheduler_for(story)
+    assert isinstance(scheduler, Scheduler)
+    assert story.scheduler is scheduler
+    assert Lexicon.scheduler_for(story) is scheduler
+    assert Lexicon.scheduler_for(story.fork()) is scheduler
+
+
+@mark.asyncio
+async def test_lexicon_execute_line_steps(patch, logger, story, async_mock):
+    story.tree = {"1": {"ln": "1", "method": "while"}}
+    patch.object(Lexicon, "while_", new=async_mock(return_value="2"))
+    patch.object(Scheduler, "step", new=async_mock())
+    await Lexicon.execute_line(logger, story, "1")
+    Scheduler.step.mock.assert_called_once_with(
+        story.scheduler, story, story.tree["1"]
+    )
+
+
+@mark.asyncio
+async def test_lexicon_while_step_limit(logger, story):
+    story.tree = {
+        "1": {
+            "ln": "1",
+            "method": "while",
+            "args": [{"$OBJECT": "boolean", "boolean": True}],
+            "enter": "2",
+        },
+        "2": {
+            "ln": "2",
+            "method": "expression",
+            "name": ["i"],
+            "args": [{"$OBJECT": "int", "int": 1}],
+            "parent": "1",
+        },
+    }
+    story.scheduler = Scheduler(time_slice=0, max_steps=20)
+    story.set_context({})
+    with pytest.raises(StoryscriptRuntimeError):
+        await Lexicon.while_(logger, story, story.tree["1"])
+    assert story.scheduler.steps == 21
+
+
+@mark.asyncio
+async def test_lexicon_while_iteration_limit(logger, story):
+    story.tree = {
+        "1": {
+            "ln": "1",
+            "method": "while",
+            "args": [{"$OBJECT": "boolean", "boolean": True}],
+            "enter": "2",
+        },
+        "2": {
+            "ln": "2",
+            "method": "expression",
+            "name": ["i"],
+            "args": [{"$OBJECT": "int", "int": 1}],
+            "parent": "1",
+        },
+    }
+    story.scheduler = Scheduler(time_slice=60, max_loop_iterations=5)
+    story.set_context({})
+    with pytest.raises(StoryscriptRuntimeError) as e:
+        await Lexicon.while_(logger, story, story.tree["1"])
+    assert e.value.message == (
+        "Call count limit reached within while loop. "
+        "Only 5 iterations allowed."
+    )
+    # The loop line and the line of its block, for every iteration.
+    assert story.scheduler.steps == 10
+
+
+@mark.asyncio
+async def test_lexicon_execute_line_compiled(patch, logger, story, async_mock):
+    story.tree = {"1": {"ln": "1", "method": "while"}}
+    patch.object(Lexicon, "while_", new=async_mock(return_value="2"))
+    patch.many(story, ["new_context", "line"])
+    assert await Lexicon.execute_line(logger, story, "1") == "2"
+    Lexicon.while_.mock.assert_called_with(logger, story, story.tree["1"])
+    story.new_context.assert_called_once()
+    story.line.assert_not_called()
+
+
+def concurrent_tree():
+    return {
+        "1": {
+            "ln": "1",
+            "method": "execute",
+            "service": "a",
+            "next": "2",
+            "command": "c",
+            "name": ["x"],
+            "args": [],
+        },
+        "2": {
+            "ln": "2",
+            "method": "execute",
+            "service": "b",
+            "next": "3",
+            "command": "c",
+            "name": ["y"],
+            "args": [],
+        },
+        "3": {
+            "ln": "3",
+            "method": "execute",
+            "service": "c",
+            "next": "4",
+            "command": "c",
+            "name": ["z"],
+            "args": [],
+        },
+        "4": {"ln": "4", "method": "expression", "name": ["w"]},
+    }
+
+
+@mark.parametrize(
+    "enabled,services,internal,expected",
+    [
+        (True, {"a": {}, "b": {}}, False, True),
+        (False, {"a": {}, "b": {}}, False, False),
+        (True, {"a": {}}, False, False),
+        (True, {"a": {}, "b": {}}, True, False),
+    ],
+)
+def test_lexicon_can_run_concurrently(
+    patch, story, enabled, services, internal, expected
+):
+    tree = concurrent_tree()
+    story.app.app_config.concurrent_services = enabled
+    story.app.services = services
+    patch.object(Services, "is_internal", return_value=internal)
+    run = [tree["1"], tree["2"]]
+    assert Lexicon._can_run_concurrently(story, run) is expected
+
+
+@mark.asyncio
+async def test_lexicon_execute_line_concurrently(patch, logger, story):
+    story.tree = concurrent_tree()
+    story.app.app_config.concurrent_services = True
+    story.app.services = {"a": {}, "b": {}, "c": {}}
+
+    async def execute(story, line):
+        # Complete the calls in the reverse order.
+        await asyncio.sleep(0.01 * (3 - int(line["ln"])))
+        return line["service"]
+
+    patch.object(Services, "execute", side_effect=execute)
+    patch.object(Story, "end_line")
+    assert await Lexicon.execute_line(logger, story, "1") == "4"
+    assert Story.end_line.call_args_list == [
+        mock.call("1", output="a", assign={"paths": ["x"]}),
+        mock.call("2", output="b", assign={"paths": ["y"]}),
+        mock.call("3", output="c", assign={"paths": ["z"]}),
+    ]
+
+
+@mark.asyncio
+async def test_lexicon_execute_concurrently_error(patch, logger, story):
+    story.tree = concurrent_tree()
+    run = [story.tree["1"], story.tree["2"], story.tree["3"]]
+
+    async def execute(story, line):
+        if line["ln"] != "1":
+            raise ValueError(line["ln"])
+        return "a"
+
+    patch.object(Services, "execute", side_effect=execute)
+    patch.object(Story, "end_line")
+    with pytest.raises(StoryscriptRuntimeError) as e:
+        await Lexicon.execute_concurrently(logger, story, run)
+
+    # The first error in the order of the lines is raised, and the
+    # outputs of the lines after it are discarded.
+    assert e.value.line is story.tree["2"]
+    assert str(e.value.root) == "2"
+    Story.end_line.assert_called_once_with(
+        "1", output="a", assign={"paths": ["x"]}
+    )
+
+
+def parallel_foreach(story, limit):
+    story.tree = {
+        "1": {
+            "ln": "1",
+            "method": "for",
+            "enter": "2",
+            "output": ["item"],
+            "args": [{"$OBJECT": "path", "paths": ["items"]}],
+        },
+        "2": {"ln": "2", "method": "execute", "parent": "1", "name": ["x"]},
+    }
+    story.app.app_config.foreach_concurrency = limit
+    story.app.story_global_contexts = {story.name: {}}
+    story.set_context({"items": [0, 1, 2, 3, 4, 5]})
+    return story.tree["1"]
+
+
+@mark.parametrize("limit", [1, 3])
+@mark.asyncio
+async def test_lexicon_foreach_concurrently(patch, logger, story, limit):
+    line = parallel_foreach(story, limit)
+    items = []
+    running = []
+    max_running = 0
+
+    async def execute_block(logger, our_story, our_line):
+        nonlocal max_running
+        item = our_story.resolve({"$OBJECT": "path", "paths": ["item"]})
+        running.append(item)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.001 * (6 - item))
+        running.remove(item)
+        items.append(item)
+        # Concurrent iterations are executed in forks of the story.
+        assert (our_story is story) is (limit == 1)
+
+    patch.object(Lexicon, "execute_block", side_effect=execute_block)
+    patch.object(story, "next_block", return_value=None)
+    with story.new_context():
+        assert await Lexicon.foreach(logger, story, line) is None
+
+    assert sorted(items) == [0, 1, 2, 3, 4, 5]
+    assert max_running == limit
+    if limit == 1:
+        assert items == [0, 1, 2, 3, 4, 5]
+
+
+@mark.parametrize(
+    "outcomes,delays,expected,started,completed",
+    [
+        # Iteration 2 breaks while 5 is running, which is cancelled.
+        (
+            {2: LineSentinels.BREAK},
+            {2: 2.5},
+            None,
+            [0, 1, 2, 3, 4, 5],
+            [0, 1, 3, 4, 2],
+        ),
+        (
+            {1: LineSentinels.CONTINUE},
+            {},
+            None,
+            [0, 1, 2, 3, 4, 5],
+            [0, 1, 2, 3, 4, 5],
+        ),
+        # The first error in the order of the iterations is raised.
+        (
+            {2: ValueError("2"), 3: ValueError("3")},
+            {2: 2.5},
+            ValueError,
+            [0, 1, 2, 3],
+            [0, 1, 3, 2],
+        ),
+        (
+            {0: LineSentinels.BREAK, 1: LineSentinels.RETURN},
+            {0: 2},
+            None,
+            [0, 1],
+            [1, 0],
+        ),
+        ({1: LineSentinels.RETURN}, {}, LineSentinels.RETURN, [0, 1], [0, 1]),
+    ],
+)
+@mark.asyncio
+async def test_lexicon_foreach_concurrently_stops(
+    patch, logger, story, outcomes, delays, expected, started, completed
+):
+    line = parallel_foreach(story, 2)
+    our_started = []
+    our_completed = []
+
+    async def execute_block(logger, our_story, our_line):
+        item = our_story.resolve({"$OBJECT": "path", "paths": ["item"]})
+        our_started.append(item)
+        await asyncio.sleep(0.01 * delays.get(item, 1))
+        our_completed.append(item)
+        outcome = outcomes.get(item)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    patch.object(Lexicon, "execute_block", side_effect=execute_block)
+    patch.object(story, "next_block", return_value=None)
+    with story.new_context():
+        if expected is ValueError:
+            with pytest.raises(ValueError, match="2"):
+                await Lexicon.foreach(logger, story, line)
+        else:
+            assert await Lexicon.foreach(logger, story, line) is expected
+
+    assert our_started == started
+    assert sorted(our_completed) == sorted(completed)
+
+
+@mark.asyncio
+async def test_lexicon_foreach_not_parallel(patch, logger, story, async_mock):
+    line = parallel_foreach(story, 3)
+    # x is assigned outside of the loop too.
+    story.tree["0"] = {"ln": "0", "method": "expression", "name": ["x"]}
+    patch.object(Lexicon, "_foreach_concurrently")
+    patch.object(Lexicon, "execute_block", new=async_mock())
+    patch.object(story, "next_block", return_value=None)
+    with story.new_context():
+        await Lexicon.foreach(logger, story, line)
+    Lexicon._foreach_concurrently.assert_not_called()
+    assert Lexicon.execute_block.mock.call_count == 6
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
+import copy
+
 import pytest
 
 from requests.structures import CaseInsensitiveDict
 
 from storyruntime.Exceptions import StoryscriptError
 from storyruntime.processing.Mutations import Mutations
+from storyruntime.processing.mutations.ListMutations import ListMutations
+from storyruntime.processing.mutations.MapMutations import MapMutations
 from storyruntime.processing.mutations.StringMutations import StringMutations
 
-
 # Note: All mutations are tested via integration
 # in Lexicon.py under integration tests.
 
@@ -26,6 +29,55 @@ def test_mutations_for_case_insensitive_dict(story, patch):
     assert ret is False
 
 
+@pytest.mark.parametrize(
+    "mutations,value,operator,copied",
+    [
+        (ListMutations, [1, 2], "length", False),
+        (ListMutations, [1, 2], "reverse", True),
+        (MapMutations, {"a": 1}, "keys", False),
+        (MapMutations, {"a": 1}, "remove", True),
+    ],
+)
+def test_mutations_copy(story, patch, mutations, value, operator, copied):
+    patch.object(mutations, operator)
+    Mutations.mutate({"mutation": operator}, value, story, None)
+    mutated = getattr(mutations, operator).call_args[0][1]
+    assert mutated == value
+    assert (mutated is not value) is copied
+
+
+@pytest.mark.parametrize(
+    "value,mutation,args",
+    [
+        ({"a": {"k": 0}}, "get", {"key": "a", "default": {}}),
+        ({}, "get", {"key": "a", "default": {"k": 0}}),
+        ({"a": {"k": 0}}, "values", {}),
+        ([{"k": 0}], "random", {}),
+        ([[{"k": 0}]], "max", {}),
+    ],
+)
+def test_mutations_read_only_result_is_copied(
+    story, patch, value, mutation, args
+):
+    """
+    Writing into the result of a read-only mutation leaves its source
+    untouched.
+    """
+    patch.object(
+        story, "argument_by_name", side_effect=lambda m, name: args.get(name)
+    )
+    expected = copy.deepcopy(value)
+    expected_args = copy.deepcopy(args)
+
+    result = Mutations.mutate({"mutation": mutation}, value, story, None)
+    while isinstance(result, list):
+        result = result[0]
+    result["k"] = 1
+
+    assert value == expected
+    assert args == expected_args
+
+
 def test_mutations_unexpected_type(story):
     mutation = {"mutation": "foo"}
 
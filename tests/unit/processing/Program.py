@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from storyruntime.processing.Program import Instruction, Program
+from storyruntime.utils.BlockIndex import BlockIndex
+
+tree = {
+    "1": {"ln": "1", "method": "for", "enter": "2", "next": "2"},
+    "2": {"ln": "2", "method": "if", "parent": "1", "enter": "3", "next": "4"},
+    "3": {"ln": "3", "method": "break", "parent": "2", "next": "4"},
+    "4": {
+        "ln": "4",
+        "method": "elif",
+        "parent": "1",
+        "enter": "5",
+        "next": "6",
+    },
+    "5": {"ln": "5", "method": "continue", "parent": "4", "next": "6"},
+    "6": {
+        "ln": "6",
+        "method": "else",
+        "parent": "1",
+        "enter": "7",
+        "next": "7",
+    },
+    "7": {"ln": "7", "method": "set", "parent": "6", "next": "8"},
+    "8": {"ln": "8", "method": "if", "enter": "9", "next": "10"},
+    "9": {"ln": "9", "method": "set", "parent": "8", "next": "10"},
+    "10": {"ln": "10", "method": "set"},
+}
+
+
+def program():
+    return Program(tree, BlockIndex(tree), {"1": "op1"})
+
+
+def test_program_instructions():
+    p = program()
+    assert [i.ln for i in p.instructions] == list(tree.keys())
+    assert p.pcs == {ln: pc for pc, ln in enumerate(tree.keys())}
+    assert p.at(0).line is tree["1"]
+    assert p.at(0).op == "op1"
+    assert p.at(1).op is None
+    assert p.pc("4") == 3
+    assert p.pc(None) is None
+
+
+def test_program_jump_targets():
+    p = program()
+    loop = p.at(p.pc("1"))
+    assert loop.end == p.pc("8")
+    assert loop.enter == p.pc("2")
+    assert loop.next == p.pc("2")
+    assert loop.exit == p.pc("8")
+    assert p.at(p.pc("2")).exit == p.pc("4")
+    assert p.at(p.pc("9")).exit == p.pc("10")
+    assert p.at(p.pc("10")).next is None
+    assert p.at(p.pc("10")).exit is None
+
+
+def test_program_chains():
+    p = program()
+    assert [i.ln for i in p.at(p.pc("2")).chain] == ["2", "4", "6"]
+    assert [i.ln for i in p.at(p.pc("8")).chain] == ["8"]
+    assert p.at(p.pc("4")).chain is None
+
+
+def test_program_exits_are_lazy():
+    dangling = {
+        "1": {"ln": "1", "method": "if", "enter": "2", "next": "2"},
+        "2": {"ln": "2", "method": "set", "parent": "1", "next": "9"},
+    }
+    p = Program(dangling, BlockIndex(dangling), {})
+    assert p.at(p.pc("1")).next == p.pc("2")
+    assert p.at(p.pc("2")).next is None
+    with pytest.raises(KeyError):
+        p.at(p.pc("1")).exit
+
+
+def test_instruction_contains():
+    instruction = Instruction(2, {"ln": "3"}, None, 5)
+    assert instruction.contains(3) is True
+    assert instruction.contains(4) is True
+    assert instruction.contains(2) is False
+    assert instruction.contains(5) is False
+    assert instruction.contains(None) is False
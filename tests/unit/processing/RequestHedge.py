@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from pytest import mark
+
+from storyruntime import Metrics
+from storyruntime.processing.RequestHedge import RequestHedge
+
+
+def counter(metric, hedge):
+    return metric.labels(
+        app_id=hedge.app_id, service=hedge.service
+    )._value.get()
+
+
+def fetcher(*calls):
+    """
+    A fetch which answers its n-th call with calls[n], a (delay, result)
+    pair. Results which are exceptions are raised.
+    """
+    started = []
+    cancelled = []
+
+    async def do_fetch():
+        n = len(started)
+        started.append(n)
+        delay, result = calls[n]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    do_fetch.started = started
+    do_fetch.cancelled = cancelled
+    return do_fetch
+
+
+def test_request_hedge_from_hint():
+    assert RequestHedge.from_hint("app_id", "service", {}) is None
+    hedge = RequestHedge.from_hint(
+        "app_id",
+        "service",
+        {"percentile": 99, "initial_delay": 0.5, "window": 20},
+    )
+    assert hedge.percentile == 99
+    assert hedge.initial_delay == 0.5
+    assert hedge._latencies.maxlen == 20
+    hedge = RequestHedge.from_hint("app_id", "service", {"percentile": 95})
+    assert hedge.initial_delay == 0.1
+    assert hedge._latencies.maxlen == 100
+
+
+@mark.parametrize(
+    "hint",
+    [
+        {"percentile": 0},
+        {"percentile": 101},
+        {"percentile": "95"},
+        {"percentile": 95, "initial_delay": -1},
+        {"percentile": 95, "window": 5},
+    ],
+)
+def test_request_hedge_from_hint_invalid(hint):
+    with pytest.raises(AssertionError):
+        RequestHedge.from_hint("app_id", "service", hint)
+
+
+def test_request_hedge_delay():
+    hedge = RequestHedge("app_id", "delay", 90, initial_delay=0.5)
+    for latency in range(1, 10):
+        hedge._latencies.append(latency / 100)
+    assert hedge.delay() == 0.5
+
+    hedge._latencies.append(0.1)
+    assert hedge.delay() == 0.09
+    hedge.percentile = 100
+    assert hedge.delay() == 0.1
+
+
+@mark.asyncio
+async def test_request_hedge_fetch_fast():
+    hedge = RequestHedge("app_id", "fast", 95, initial_delay=1)
+    fetch = fetcher((0, "original"))
+
+    assert await hedge.fetch(fetch) == "original"
+    assert fetch.started == [0]
+    assert len(hedge._latencies) == 1
+    assert counter(Metrics.service_hedge_calls_total, hedge) == 1
+    assert counter(Metrics.service_hedges_total, hedge) == 0
+
+
+@mark.asyncio
+async def test_request_hedge_fetch_hedged():
+    hedge = RequestHedge("app_id", "hedged", 95, initial_delay=0.01)
+    fetch = fetcher((1, "original"), (0, "hedge"))
+
+    assert await hedge.fetch(fetch) == "hedge"
+    await asyncio.sleep(0)
+    assert fetch.started == [0, 1]
+    assert fetch.cancelled == [0]
+    # The original request lost, and counts with the time it ran for.
+    assert len(hedge._latencies) == 1
+    assert hedge._latencies[0] >= 0.01
+    assert counter(Metrics.service_hedges_total, hedge) == 1
+    assert counter(Metrics.service_hedge_wins_total, hedge) == 1
+
+
+@mark.asyncio
+async def test_request_hedge_fetch_original_wins():
+    hedge = RequestHedge("app_id", "original_wins", 95, initial_delay=0.01)
+    fetch = fetcher((0.02, "original"), (1, "hedge"))
+
+    assert await hedge.fetch(fetch) == "original"
+    await asyncio.sleep(0)
+    assert fetch.cancelled == [1]
+    assert counter(Metrics.service_hedges_total, hedge) == 1
+    assert counter(Metrics.service_hedge_wins_total, hedge) == 0
+
+
+@mark.asyncio
+async def test_request_hedge_fetch_failed_request():
+    hedge = RequestHedge("app_id", "failed", 95, initial_delay=0.01)
+    fetch = fetcher((0.02, ValueError()), (0.05, "hedge"))
+
+    assert await hedge.fetch(fetch) == "hedge"
+    # Failed requests have no latency.
+    assert len(hedge._latencies) == 0
+
+
+@mark.asyncio
+async def test_request_hedge_fetch_both_fail():
+    hedge = RequestHedge("app_id", "both_fail", 95, initial_delay=0.01)
+    original = ValueError()
+    fetch = fetcher((0.02, original), (0, KeyError()))
+
+    with pytest.raises(ValueError) as e:
+        await hedge.fetch(fetch)
+    assert e.value is original
+    assert len(hedge._latencies) == 0
+
+
+@mark.asyncio
+async def test_request_hedge_delay_keeps_slow_requests():
+    hedge = RequestHedge("app_id", "slow", 50, initial_delay=0.01)
+    for _ in range(10):
+        fetch = fetcher((1, "original"), (0.02, "hedge"))
+        assert await hedge.fetch(fetch) == "hedge"
+
+    # Only the hedges were fast, so the delay doesn't drop below the
+    # time the original requests ran for.
+    assert hedge.delay() >= 0.03
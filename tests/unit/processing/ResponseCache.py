@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from pytest import fixture, mark
+
+from storyruntime import Metrics
+from storyruntime.processing.ResponseCache import ResponseCache
+
+
+@fixture
+def now(patch):
+    patch.object(time, "monotonic", return_value=100)
+    return time.monotonic
+
+
+def response(code=200):
+    res = MagicMock()
+    res.code = code
+    return res
+
+
+def counter(metric, cache):
+    return metric.labels(
+        app_id=cache.app_id, service=cache.service
+    )._value.get()
+
+
+def fetcher(*responses):
+    fetch = MagicMock(side_effect=responses)
+
+    async def do_fetch():
+        return fetch()
+
+    do_fetch.mock = fetch
+    return do_fetch
+
+
+def test_response_cache_from_hint():
+    assert ResponseCache.from_hint("app_id", "service", {}) is None
+    cache = ResponseCache.from_hint(
+        "app_id", "service", {"ttl": 1.5, "max_entries": 5}
+    )
+    assert cache.ttl == 1.5
+    assert cache.max_entries == 5
+    cache = ResponseCache.from_hint("app_id", "service", {"ttl": 1})
+    assert cache.max_entries == 1000
+
+
+@mark.parametrize(
+    "hint", [{"ttl": 0}, {"ttl": "1"}, {"ttl": 1, "max_entries": 0}]
+)
+def test_response_cache_from_hint_invalid(hint):
+    with pytest.raises(AssertionError):
+        ResponseCache.from_hint("app_id", "service", hint)
+
+
+@mark.asyncio
+async def test_response_cache_fetch(now):
+    cache = ResponseCache("app_id", "fetch", 10)
+    first = response()
+    fetch = fetcher(first, response())
+
+    assert await cache.fetch("a", fetch) is first
+    assert await cache.fetch("a", fetch) is first
+    assert fetch.mock.call_count == 1
+    assert counter(Metrics.service_cache_hits_total, cache) == 1
+    assert counter(Metrics.service_cache_misses_total, cache) == 1
+
+    # Expired.
+    now.return_value = 110
+    assert await cache.fetch("a", fetch) is not first
+    assert fetch.mock.call_count == 2
+    assert counter(Metrics.service_cache_evictions_total, cache) == 1
+
+
+@mark.asyncio
+async def test_response_cache_fetch_errors_are_not_cached():
+    cache = ResponseCache("app_id", "errors", 10)
+    fetch = fetcher(response(500), response(200))
+    assert (await cache.fetch("a", fetch)).code == 500
+    assert (await cache.fetch("a", fetch)).code == 200
+    assert fetch.mock.call_count == 2
+
+
+@mark.asyncio
+async def test_response_cache_lru():
+    cache = ResponseCache("app_id", "lru", 10, max_entries=2)
+    fetch = fetcher(*[response() for _ in range(4)])
+    a = await cache.fetch("a", fetch)
+    await cache.fetch("b", fetch)
+    assert await cache.fetch("a", fetch) is a
+    await cache.fetch("c", fetch)  # Evicts b.
+    assert counter(Metrics.service_cache_evictions_total, cache) == 1
+
+    assert await cache.fetch("a", fetch) is a
+    await cache.fetch("b", fetch)
+    assert fetch.mock.call_count == 4
+
+
+@mark.asyncio
+async def test_response_cache_coalesces_calls():
+    cache = ResponseCache("app_id", "coalesce", 10)
+    release = asyncio.Event()
+    res = response()
+    fetch = MagicMock()
+
+    async def do_fetch():
+        fetch()
+        await release.wait()
+        return res
+
+    calls = [asyncio.ensure_future(cache.fetch("a", do_fetch)) for _ in "ab"]
+    await asyncio.sleep(0.01)
+    release.set()
+    assert await asyncio.gather(*calls) == [res, res]
+    assert fetch.call_count == 1
+
+
+@mark.asyncio
+async def test_response_cache_coalesced_errors():
+    cache = ResponseCache("app_id", "coalesced_errors", 10)
+    release = asyncio.Event()
+
+    async def do_fetch():
+        await release.wait()
+        raise ValueError()
+
+    calls = [asyncio.ensure_future(cache.fetch("a", do_fetch)) for _ in "ab"]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache._in_flight == {}
+
+
+@mark.asyncio
+async def test_response_cache_cancelled_caller():
+    cache = ResponseCache("app_id", "cancelled_caller", 10)
+    release = asyncio.Event()
+    res = response()
+
+    async def do_fetch():
+        await release.wait()
+        return res
+
+    first = asyncio.ensure_future(cache.fetch("a", do_fetch))
+    second = asyncio.ensure_future(cache.fetch("a", do_fetch))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await second is res
+    assert first.cancelled()
+    assert await cache.fetch("a", do_fetch) is res
+    assert cache._in_flight == {}
+
+
+@mark.asyncio
+async def test_response_cache_cancelled_callers():
+    cache = ResponseCache("app_id", "cancelled_callers", 10)
+    cancelled = asyncio.Event()
+
+    async def do_fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    calls = [asyncio.ensure_future(cache.fetch("a", do_fetch)) for _ in "ab"]
+    await asyncio.sleep(0.01)
+    for call in calls:
+        call.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert cache._in_flight == {}
+    assert cache._entries == {}
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+from pytest import mark
+
+from storyruntime.AppConfig import AppConfig
+from storyruntime.Exceptions import StoryscriptRuntimeError
+from storyruntime.processing.Scheduler import (
+    DEFAULT_MAX_LOOP_ITERATIONS,
+    DEFAULT_TIME_SLICE,
+    Scheduler,
+)
+
+
+def test_scheduler_for_app_config():
+    config = AppConfig(
+        {
+            "runtime": {
+                "time_slice": 0.5,
+                "max_steps": 10,
+                "max_run_time": 2,
+                "max_loop_iterations": 20,
+            }
+        }
+    )
+    scheduler = Scheduler.for_app_config(config)
+    assert scheduler.max_loop_iterations == 20
+    assert scheduler.time_slice == 0.5
+    assert scheduler.max_steps == 10
+    assert scheduler.max_run_time == 2
+    assert scheduler.steps == 0
+
+
+def test_scheduler_for_app_config_defaults(magic):
+    scheduler = Scheduler.for_app_config(magic())
+    assert scheduler.time_slice == DEFAULT_TIME_SLICE
+    assert scheduler.max_steps is None
+    assert scheduler.max_run_time is None
+    assert (
+        scheduler.max_loop_iterations == DEFAULT_MAX_LOOP_ITERATIONS == 100000
+    )
+
+
+@mark.asyncio
+async def test_scheduler_step(patch, story, async_mock):
+    patch.object(asyncio, "sleep", new=async_mock())
+    scheduler = Scheduler(time_slice=60)
+    await scheduler.step(story, {})
+    await scheduler.step(story, {})
+    assert scheduler.steps == 2
+    assert asyncio.sleep.mock.call_count == 0
+
+
+@mark.asyncio
+async def test_scheduler_step_yields(patch, story, async_mock):
+    patch.object(asyncio, "sleep", new=async_mock())
+    scheduler = Scheduler(time_slice=0)
+    await scheduler.step(story, {})
+    asyncio.sleep.mock.assert_called_with(0)
+    assert scheduler._slice_end <= time.monotonic()
+
+
+@mark.asyncio
+async def test_scheduler_max_steps(story):
+    scheduler = Scheduler(time_slice=60, max_steps=2)
+    line = {"ln": "1"}
+    await scheduler.step(story, line)
+    await scheduler.step(story, line)
+    with pytest.raises(StoryscriptRuntimeError) as e:
+        await scheduler.step(story, line)
+    assert e.value.line is line
+    assert e.value.story is story
+
+
+@mark.asyncio
+async def test_scheduler_max_run_time(story):
+    scheduler = Scheduler(time_slice=0, max_run_time=10)
+    await scheduler.step(story, {})
+    scheduler.started -= 11
+    with pytest.raises(StoryscriptRuntimeError):
+        await scheduler.step(story, {})
+
+
+def test_scheduler_iterate(story):
+    scheduler = Scheduler(time_slice=60, max_loop_iterations=2)
+    line = {"ln": "1"}
+    scheduler.iterate(story, line, 0)
+    scheduler.iterate(story, line, 1)
+    with pytest.raises(StoryscriptRuntimeError) as e:
+        scheduler.iterate(story, line, 2)
+    assert e.value.line is line
+    assert "Only 2 iterations allowed" in e.value.message
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import base64
 import json
+import os
 import re
 import uuid
 from collections import deque, namedtuple
@@ -26,18 +28,24 @@ from storyruntime.constants.LineConstants import (
 )
 from storyruntime.constants.ServiceConstants import ServiceConstants
 from storyruntime.entities.Multipart import FileFormField, FormField
+from storyruntime.entities.SpooledBody import SpooledBody
 from storyruntime.omg.ServiceOutputValidator import ServiceOutputValidator
+from storyruntime.processing import Services as ServicesModule
+from storyruntime.processing.Bindings import ArgumentBinding
+from storyruntime.processing.Bulkhead import Bulkhead
 from storyruntime.processing.Services import (
     Command,
     Event,
     HttpDataEncoder,
     Service,
+    ServiceRoute,
     Services,
 )
+from storyruntime.utils.HttpClients import HttpClients
 from storyruntime.utils.HttpUtils import HttpUtils
 
 from tornado.gen import coroutine
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
+from tornado.httpclient import HTTPRequest, HTTPResponse
 
 
 @mark.asyncio
@@ -575,7 +583,7 @@ async def test_services_execute_http(
 
     patch.object(uuid, "uuid4")
 
-    patch.object(ServiceOutputValidator, "raise_if_invalid")
+    patch.object(ServiceOutputValidator, "compile")
 
     command_conf = {
         "http": {"method": method.lower(), "port": 2771, "path": "/invoke"},
@@ -623,6 +631,7 @@ async def test_services_execute_http(
         "headers": {},
         "request_timeout": 60000 * 2,
         "retry_timeout": 1,
+        "circuit_breaker": True,
     }
 
     if location == "header":
@@ -644,8 +653,10 @@ async def test_services_execute_http(
 
     line = {"ln": "1"}
 
-    patch.init(AsyncHTTPClient)
-    client = AsyncHTTPClient()
+    if absolute_url:
+        client = HttpClients.get(HttpClients.INTERNET)
+    else:
+        client = HttpClients.get(HttpClients.SERVICES)
     response = HTTPResponse(
         HTTPRequest(url=expected_url),
         200,
@@ -686,11 +697,12 @@ async def test_services_execute_http(
         )
 
     if service_output is not None:
-        ServiceOutputValidator.raise_if_invalid.assert_called_with(
-            command_conf["output"], ret, chain
+        ServiceOutputValidator.compile.assert_called_with(
+            command_conf["output"]
         )
+        ServiceOutputValidator.compile().assert_called_with(ret, chain)
     else:
-        ServiceOutputValidator.raise_if_invalid.assert_not_called()
+        ServiceOutputValidator.compile.assert_not_called()
 
     # Additionally, test for other scenarios.
     response = HTTPResponse(
@@ -714,6 +726,309 @@ async def test_services_execute_http(
         await Services.execute_http(story, line, chain, command_conf)
 
 
+@mark.asyncio
+async def test_services_execute_http_cached(patch, story, async_mock):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    patch.object(story, "argument_by_name", return_value="bar")
+    command_conf = {
+        "http": {"method": "get", "port": 2771, "path": "/invoke"},
+        "arguments": {"foo": {"in": "query"}},
+        "cache": {"ttl": 60},
+    }
+    story.app.response_caches = {}
+    story.app.app_config.service_cache = {}
+
+    url = "http://container_host:2771/invoke?foo=bar"
+    response = HTTPResponse(
+        HTTPRequest(url=url),
+        200,
+        buffer=StringIO('{"foo": "bar"}'),
+        headers={"Content-Type": "application/json"},
+    )
+    patch.object(
+        HttpUtils, "fetch_with_retry", new=async_mock(return_value=response)
+    )
+
+    line = {"ln": "1"}
+    ret = await Services.execute_http(story, line, chain, command_conf)
+    assert ret == {"foo": "bar"}
+    ret["foo"] = "changed"
+    ret = await Services.execute_http(story, line, chain, command_conf)
+    assert ret == {"foo": "bar"}
+    assert HttpUtils.fetch_with_retry.mock.call_count == 1
+
+    # Only GET commands are cached.
+    command_conf["http"]["method"] = "post"
+    await Services.execute_http(story, line, chain, command_conf)
+    assert HttpUtils.fetch_with_retry.mock.call_count == 2
+
+
+@mark.asyncio
+async def test_services_execute_http_hedged(patch, story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    command_conf = {
+        "http": {"method": "get", "port": 2771, "path": "/invoke"},
+        "hedge": {"percentile": 95, "initial_delay": 0.01},
+    }
+    story.app.request_hedges = {}
+    story.app.app_config.service_hedging = {}
+    story.app.app_config.response_memory_limit = 4
+
+    url = "http://container_host:2771/invoke"
+    responses = [
+        HTTPResponse(
+            HTTPRequest(url=url),
+            200,
+            buffer=StringIO(f'"{name}"'),
+            headers={"Content-Type": "application/json"},
+        )
+        for name in ["original", "hedge"]
+    ]
+    calls = []
+
+    async def fetch(tries, logger, url, client, kwargs):
+        calls.append(dict(kwargs))
+        # fetch_with_retry consumes the retry_timeout.
+        del kwargs["retry_timeout"]
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return responses[len(calls) - 1]
+
+    patch.object(HttpUtils, "fetch_with_retry", side_effect=fetch)
+    ret = await Services.execute_http(story, {"ln": "1"}, chain, command_conf)
+    assert ret == "hedge"
+    assert len(calls) == 2
+    assert calls[0] == calls[1]
+    assert calls[0]["retry_timeout"] == 1
+    # Hedged responses are not streamed.
+    assert "streaming_callback" not in calls[0]
+
+
+@mark.asyncio
+async def test_services_execute_http_hedges_only_get(patch, story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    patch.object(Services, "request_hedge")
+    command_conf = {
+        "http": {"method": "post", "port": 2771, "path": "/invoke"},
+        "hedge": {"percentile": 95},
+    }
+    response = HTTPResponse(
+        HTTPRequest(url="http://container_host:2771/invoke"),
+        200,
+        buffer=StringIO('"posted"'),
+        headers={"Content-Type": "application/json"},
+    )
+
+    async def fetch(tries, logger, url, client, kwargs):
+        return response
+
+    patch.object(HttpUtils, "fetch_with_retry", side_effect=fetch)
+    ret = await Services.execute_http(story, {"ln": "1"}, chain, command_conf)
+    assert ret == "posted"
+    Services.request_hedge.assert_not_called()
+    assert HttpUtils.fetch_with_retry.call_count == 1
+
+
+@mark.parametrize("output_type", [None, "string"])
+@mark.asyncio
+async def test_services_execute_http_spooled(
+    patch, story, tmpdir, output_type
+):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    command_conf = {"http": {"method": "post", "port": 2771, "path": "/"}}
+    if output_type is not None:
+        command_conf["output"] = {"type": output_type}
+    story.app.app_config.response_memory_limit = 4
+    story.app.get_spool_dir.return_value = str(tmpdir)
+    response = HTTPResponse(HTTPRequest(url="http://container_host"), 200)
+
+    async def fetch(tries, logger, url, client, kwargs):
+        kwargs["header_callback"]("HTTP/1.1 200 OK\r\n")
+        kwargs["streaming_callback"](b"hello ")
+        kwargs["streaming_callback"](b"world")
+        return response
+
+    patch.object(HttpUtils, "fetch_with_retry", side_effect=fetch)
+    ret = await Services.execute_http(story, {"ln": "1"}, chain, command_conf)
+    if output_type is None:
+        assert isinstance(ret, SpooledBody)
+        assert ret.read() == b"hello world"
+    else:
+        assert ret == "hello world"
+
+
+@mark.asyncio
+async def test_services_execute_http_spooled_json(patch, story, tmpdir):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    command_conf = {"http": {"method": "post", "port": 2771, "path": "/"}}
+    story.app.app_config.response_memory_limit = 4
+    story.app.get_spool_dir.return_value = str(tmpdir)
+    response = HTTPResponse(
+        HTTPRequest(url="http://container_host"),
+        200,
+        headers={"Content-Type": "application/json"},
+    )
+
+    async def fetch(tries, logger, url, client, kwargs):
+        kwargs["streaming_callback"](b'{"foo": "bar"}')
+        return response
+
+    patch.object(HttpUtils, "fetch_with_retry", side_effect=fetch)
+    ret = await Services.execute_http(story, {"ln": "1"}, chain, command_conf)
+    assert ret == {"foo": "bar"}
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_multipart_producer_spooled_body(tmpdir):
+    path = tmpdir.join("body")
+    path.write_binary(b"hello world")
+    w = Writer()
+    boundary = "boundary"
+    body = {
+        "f1": FileFormField(
+            "f1",
+            SpooledBody(str(path), 11, "text/plain"),
+            "hello.txt",
+            "text/plain",
+        )
+    }
+    list(Services._multipart_producer(body, boundary, w.write))
+    assert "\r\n\r\nhello world\r\n" in w.out
+
+
+def test_multipart_producer_chunks(patch):
+    patch.object(ServicesModule, "MULTIPART_CHUNK_SIZE", 4)
+    writes = []
+
+    @coroutine
+    def write(content_bytes):
+        writes.append(content_bytes)
+
+    body = {"f1": FormField("f1", b"hello world")}
+    list(Services._multipart_producer(body, "boundary", write))
+    assert writes[1:4] == [b"hell", b"o wo", b"rld"]
+    assert all(len(chunk) <= 4 for chunk in writes[1:-2])
+
+
+def test_services_response_cache(story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    story.app.response_caches = {}
+    story.app.app_id = "app_id"
+    story.app.app_config.service_cache = {
+        "service": {"cmd": {"max_entries": 10}}
+    }
+
+    assert Services.response_cache(story, chain, {}) is None
+    assert story.app.response_caches == {("service", "cmd"): None}
+
+    story.app.response_caches = {}
+    cache = Services.response_cache(story, chain, {"cache": {"ttl": 5}})
+    assert cache.ttl == 5
+    assert cache.max_entries == 10
+    assert Services.response_cache(story, chain, {}) is cache
+
+
+def test_services_response_cache_without_app_caches(story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    assert Services.response_cache(story, chain, {"cache": {"ttl": 5}}) is None
+
+
+def test_services_request_hedge(story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    story.app.request_hedges = {}
+    story.app.app_id = "app_id"
+    story.app.app_config.service_hedging = {
+        "service": {"cmd": {"initial_delay": 0.5}}
+    }
+
+    assert Services.request_hedge(story, chain, {}) is None
+    assert story.app.request_hedges == {("service", "cmd"): None}
+
+    story.app.request_hedges = {}
+    hedge = Services.request_hedge(story, chain, {"hedge": {"percentile": 99}})
+    assert hedge.percentile == 99
+    assert hedge.initial_delay == 0.5
+    assert Services.request_hedge(story, chain, {}) is hedge
+
+
+def test_services_request_hedge_without_app_hedges(story):
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    assert (
+        Services.request_hedge(story, chain, {"hedge": {"percentile": 99}})
+        is None
+    )
+
+
+def test_services_output_validator(patch, story):
+    patch.object(ServiceOutputValidator, "compile")
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    command_conf = {"output": {"type": "map"}}
+    story.app.output_validators = {}
+    story.app.app_config.output_sampling = {}
+
+    validator = Services.output_validator(story, chain, command_conf)
+    ServiceOutputValidator.compile.assert_called_once_with({"type": "map"})
+    assert validator is ServiceOutputValidator.compile.return_value
+    assert story.app.output_validators == {("service", "cmd"): validator}
+    assert Services.output_validator(story, chain, command_conf) is validator
+    assert ServiceOutputValidator.compile.call_count == 1
+
+    story.app.output_validators = {}
+    assert Services.output_validator(story, chain, {}) is None
+    assert story.app.output_validators == {("service", "cmd"): None}
+
+
+def test_services_output_validator_sampled(patch, story):
+    patch.object(ServiceOutputValidator, "compile")
+    patch.object(ServiceOutputValidator, "sampled")
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    story.app.output_validators = {}
+    story.app.app_config.output_sampling = {"service": 0.25}
+
+    validator = Services.output_validator(
+        story, chain, {"output": {"type": "map"}}
+    )
+    ServiceOutputValidator.sampled.assert_called_with(
+        ServiceOutputValidator.compile.return_value, 0.25
+    )
+    assert validator is ServiceOutputValidator.sampled.return_value
+
+
+@mark.parametrize("internal", [True, False])
+def test_services_prepare(patch, story, internal):
+    patch.object(Services, "get_command_conf", return_value={"output": {}})
+    patch.object(Services, "output_validator")
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    story.app.services = {"service": {}}
+    route = ServiceRoute(chain, internal)
+
+    Services.prepare(story, route)
+
+    if internal:
+        assert route.command_conf is None
+        Services.output_validator.assert_not_called()
+    else:
+        assert route.command_conf == {"output": {}}
+        Services.output_validator.assert_called_with(
+            story, chain, {"output": {}}
+        )
+
+
+def test_services_prepare_unknown_service(patch, story):
+    patch.object(Services, "output_validator")
+    chain = deque([Service(name="service"), Command(name="cmd")])
+    story.app.services = {}
+
+    Services.prepare(story, ServiceRoute(chain, False))
+
+    Services.output_validator.assert_not_called()
+
+
 @mark.parametrize(
     "output_type", ["string", "any", "int", "float", "boolean", None]
 )
@@ -903,6 +1218,57 @@ async def test_services_execute_external_http(patch, story, async_mock):
     assert ret == await Services.execute_http()
 
 
+@mark.asyncio
+async def test_services_execute_external_bulkhead(patch, story, async_mock):
+    line = {
+        Line.service: "cups",
+        Line.command: "print",
+        Line.method: "execute",
+    }
+
+    story.app.services = {
+        "cups": {ServiceConstants.config: {"actions": {"print": {"http": {}}}}}
+    }
+    bulkhead = Bulkhead("app_id", "cups", 1)
+    patch.object(Services, "bulkhead", return_value=bulkhead)
+
+    async def execute_http(*args):
+        assert bulkhead._slots.locked()
+        return "printed"
+
+    patch.object(Services, "execute_http", side_effect=execute_http)
+
+    assert await Services.execute_external(story, line) == "printed"
+    Services.bulkhead.assert_called_with(story, "cups")
+    assert not bulkhead._slots.locked()
+
+
+def test_services_bulkhead(story):
+    story.app.bulkheads = {}
+    story.app.app_id = "app_id"
+    story.app.services = {
+        "cups": {
+            ServiceConstants.config: {
+                "limits": {"max_concurrency": 2, "max_queue": 5}
+            }
+        },
+        "alpine": {ServiceConstants.config: {}},
+    }
+    story.app.app_config.service_limits = {"cups": {"max_concurrency": 4}}
+
+    bulkhead = Services.bulkhead(story, "cups")
+    assert bulkhead.max_concurrency == 4
+    assert bulkhead.max_queue == 5
+    assert Services.bulkhead(story, "cups") is bulkhead
+
+    assert Services.bulkhead(story, "alpine") is None
+    assert story.app.bulkheads == {"cups": bulkhead, "alpine": None}
+
+
+def test_services_bulkhead_without_app_bulkheads(story):
+    assert Services.bulkhead(story, "cups") is None
+
+
 class Writer:
     out = ""
 
@@ -965,6 +1331,78 @@ async def test_services_execute_external_unknown(patch, story, async_mock):
         await Services.execute_external(story, line)
 
 
+def test_services_route(patch, story):
+    chain = deque([Service("alpine"), Command("echo")])
+    patch.object(Services, "resolve_chain", return_value=chain)
+    story.app.service_routes = {}
+    line = {"ln": "1", Line.service: "alpine", Line.command: "echo"}
+
+    route = Services.route(story, line)
+    assert route.chain == chain
+    assert route.internal is False
+    assert Services.route(story, line) is route
+    assert story.app.service_routes == {(story.name, "1"): route}
+    Services.resolve_chain.assert_called_once()
+
+
+def test_services_route_without_line_number(patch, story):
+    patch.object(Services, "resolve_chain", return_value=deque([Service("a")]))
+    story.app.service_routes = {}
+    line = {Line.service: "a", Line.command: "b"}
+    assert Services.route(story, line) is not Services.route(story, line)
+    assert story.app.service_routes == {}
+
+
+def test_services_url_template(patch, story):
+    patch.object(Containers, "get_hostname", return_value="container_host")
+    story.app.service_routes = {}
+    line = {"ln": "1"}
+    chain = deque([Service("alpine"), Command("echo")])
+    route = ServiceRoute(chain, False)
+    story.app.service_routes[(story.name, "1")] = route
+    command_conf = {"http": {"path": "/echo/{id}", "port": 8080}}
+
+    url = Services.url_template(story, line, chain, command_conf)
+    assert url == "http://container_host:8080/echo/{id}"
+    assert Services.url_template(story, line, chain, command_conf) == url
+    assert route.url == url
+    Containers.get_hostname.assert_called_once_with(story, line, "alpine")
+
+
+def test_services_url_template_external(story):
+    chain = deque([Service("alpine"), Command("echo")])
+    command_conf = {"http": {"url": "https://example.com/{id}"}}
+    url = Services.url_template(story, {"ln": "1"}, chain, command_conf)
+    assert url == "https://example.com/{id}"
+
+
+def test_services_binding_plan(story):
+    story.app.service_routes = {}
+    line = {"ln": "1"}
+    route = ServiceRoute(deque([Service("a"), Command("b")]), False)
+    story.app.service_routes[(story.name, "1")] = route
+    command_conf = {"arguments": {"foo": {"type": "string"}}}
+
+    plan = Services.binding_plan(story, line, command_conf)
+    assert route.bindings is plan
+    assert Services.binding_plan(story, line, command_conf) is plan
+    assert Services.binding_plan(story, line, {}) is not plan
+
+
+@mark.parametrize(
+    "value,expected", [("bar", "bar"), ({"a": 1}, '{"a": 1}'), (1, None)]
+)
+def test_services_bind(story, value, expected):
+    binding = ArgumentBinding("foo", {"type": "string"})
+    m = {}
+    if expected is None:
+        with pytest.raises(ArgumentTypeMismatchError):
+            Services.bind(story, {}, binding, value, m)
+    else:
+        Services.bind(story, {}, binding, value, m)
+        assert m == {"foo": expected}
+
+
 def test_service_get_command_conf_simple(story):
     chain = deque([Service("service"), Command("cmd")])
     story.app.services = {
@@ -1145,7 +1583,6 @@ async def test_when(patch, story, async_mock, service_name):
         "request_timeout": 120,
     }
 
-    patch.init(AsyncHTTPClient)
     patch.object(story, "next_block")
     patch.object(story.app, "add_subscription")
     patch.object(story, "argument_by_name", return_value="bar")
@@ -1156,7 +1593,7 @@ async def test_when(patch, story, async_mock, service_name):
     )
     ret = await Services.when(streaming_service, story, line)
 
-    client = AsyncHTTPClient()
+    client = HttpClients.get(HttpClients.SYNAPSE)
 
     HttpUtils.fetch_with_retry.mock.assert_called_with(
         100, story.logger, expected_url, client, expected_kwargs
@@ -8,6 +8,7 @@ from storyruntime import Metrics
 from storyruntime.Exceptions import StoryscriptError
 from storyruntime.Story import Story
 from storyruntime.processing import Lexicon, Stories
+from storyruntime.processing.Interpreter import Interpreter
 
 
 def test_stories_story(patch, app, logger):
@@ -137,6 +138,36 @@ async def test_stories_run_prepare_block(patch, app, logger, async_mock):
     )
 
 
+@mark.asyncio
+async def test_stories_run_prepare_block_stack(patch, app, logger, async_mock):
+    patch.object(Interpreter, "execute_block", new=async_mock())
+    patch.object(Stories, "story")
+    Stories.story().app.app_config.interpreter = "stack"
+    await Stories.run(app, logger, "story_name", block="1")
+    Interpreter.execute_block.mock.assert_called_with(
+        logger, Stories.story(), Stories.story().line()
+    )
+
+
+@mark.parametrize(
+    "interpreter,expected",
+    [("lexicon", Lexicon), ("stack", Interpreter), (None, Lexicon)],
+)
+def test_stories_interpreter(story, interpreter, expected):
+    story.app.app_config.interpreter = interpreter
+    assert Stories.interpreter(story) is expected
+
+
+@mark.asyncio
+async def test_stories_execute_stack(patch, logger, story, async_mock):
+    patch.object(Interpreter, "execute", new=async_mock())
+    patch.object(Lexicon, "execute_line")
+    story.app.app_config.interpreter = "stack"
+    await Stories.execute(logger, story)
+    Interpreter.execute.mock.assert_called_with(logger, story)
+    Lexicon.execute_line.assert_not_called()
+
+
 @mark.asyncio
 async def test_stories_run_prepare(patch, app, logger, async_mock):
     patch.object(Stories, "execute", new=async_mock())
@@ -7,6 +7,7 @@ import pytest
 from pytest import fixture, mark
 
 from storyruntime.Exceptions import StoryscriptError
+from storyruntime.entities.SpooledBody import SpooledBody
 from storyruntime.processing.Services import Services
 from storyruntime.processing.internal import File
 
@@ -83,6 +84,18 @@ async def test_service_file_write_bytes(patch, story, line, file_io):
     File.open().__enter__().write.assert_called_with(b"my_content")
 
 
+@mark.asyncio
+async def test_service_file_write_spooled_body(
+    patch, magic, story, line, file_io
+):
+    patch.object(story.app, "get_tmp_dir", return_value="/tmp/my.story")
+    content = magic(spec=SpooledBody)
+    resolved_args = {"path": "my_path", "content": content}
+    await File.file_write(story, line, resolved_args)
+    content.copy_to.assert_called_with(f"{story.app.get_tmp_dir()}/my_path")
+    File.open.assert_not_called()
+
+
 @mark.asyncio
 async def test_service_file_write_exc(patch, story, line, service_patch, exc):
     patch.object(story.app, "get_tmp_dir", return_value="/tmp/my.story")
@@ -7,12 +7,12 @@ import pytest
 from pytest import fixture, mark
 
 from storyruntime.Exceptions import StoryscriptError
+from storyruntime.entities.SpooledBody import SpooledBody
 from storyruntime.processing.Services import Services
 from storyruntime.processing.internal import Http
+from storyruntime.utils.HttpClients import HttpClients
 from storyruntime.utils.HttpUtils import HttpUtils
 
-from tornado.httpclient import AsyncHTTPClient
-
 
 @fixture
 def service_patch(patch):
@@ -50,7 +50,6 @@ async def test_service_http_fetch(
     patch.object(
         HttpUtils, "fetch_with_retry", new=async_mock(return_value=fetch_mock)
     )
-    patch.object(AsyncHTTPClient, "__init__", return_value=None)
     patch.object(certifi, "where", return_value="ca_certs.pem")
     resolved_args = {
         "url": "https://asyncy.com",
@@ -103,7 +102,7 @@ async def test_service_http_fetch(
             3,
             story.logger,
             resolved_args["url"],
-            AsyncHTTPClient(),
+            HttpClients.get(HttpClients.INTERNET),
             client_kwargs,
         )
         if charset == "utf-16":
@@ -116,3 +115,29 @@ async def test_service_http_fetch(
 
 def test_service_http_init():
     Http.init()
+
+
+@mark.parametrize("content_type", ["application/json", "text/plain"])
+@mark.asyncio
+async def test_service_http_fetch_spooled(
+    patch, magic, story, line, async_mock, tmpdir, content_type
+):
+    story.app.app_config.response_memory_limit = 4
+    story.app.get_spool_dir.return_value = str(tmpdir)
+    response = magic()
+    response.code = 200
+    response.headers = {"Content-Type": content_type}
+
+    async def fetch(tries, logger, url, client, kwargs):
+        kwargs["header_callback"]("HTTP/1.1 200 OK\r\n")
+        kwargs["streaming_callback"](b'{"foo": ')
+        kwargs["streaming_callback"](b'"bar"}')
+        return response
+
+    patch.object(HttpUtils, "fetch_with_retry", side_effect=fetch)
+    ret = await Http.http_post(story, line, {"url": "https://asyncy.com"})
+    if content_type == "application/json":
+        assert ret == {"foo": "bar"}
+    else:
+        assert isinstance(ret, SpooledBody)
+        assert ret.read() == b'{"foo": "bar"}'
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from storyruntime.utils.ArgumentIndex import ArgumentIndex
+
+
+def argument(name, value):
+    return {"$OBJECT": "argument", "name": name, "argument": value}
+
+
+def test_argument_index_find():
+    first = argument("a", 1)
+    tree = {
+        "1": {"ln": "1", "args": [first, argument("b", 2), argument("a", 3)]},
+        "2": {"ln": "2", "args": [{"$OBJECT": "path", "paths": ["x"]}]},
+        "3": {"ln": "3"},
+    }
+    index = ArgumentIndex(tree)
+    assert index.find(tree["1"]) == {"a": first, "b": argument("b", 2)}
+    assert index.find(tree["1"])["a"] is first
+    assert index.find(tree["2"]) == {}
+    assert index.find(tree["3"]) is None
+
+
+def test_argument_index_find_malformed():
+    tree = {"1": {"ln": "1", "args": [argument("a", 1), "b"]}}
+    assert ArgumentIndex(tree).find(tree["1"]) is None
+
+
+def test_argument_index_find_transient_line():
+    tree = {"1": {"ln": "1", "args": [argument("a", 1)]}}
+    index = ArgumentIndex(tree)
+    assert index.find({"ln": "1", "args": []}) is None
+    assert index.find({"args": []}) is None
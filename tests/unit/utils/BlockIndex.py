@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from storyruntime.utils.BlockIndex import BlockIndex
+
+tree = {
+    "2": {"ln": "2", "enter": "3", "next": "3"},
+    "3": {"ln": "3", "parent": "2", "next": "4"},
+    "4": {"ln": "4", "enter": "5", "parent": "2", "next": "5"},
+    "5": {"ln": "5", "parent": "4", "next": "6"},
+    "6": {"ln": "6", "parent": "4", "next": "7"},
+    "7": {"ln": "7", "parent": "2", "next": "8"},
+    "8": {"ln": "8"},
+}
+
+
+def test_block_index_depth():
+    index = BlockIndex(tree)
+    assert index.depth == {
+        "2": 0,
+        "3": 1,
+        "4": 1,
+        "5": 2,
+        "6": 2,
+        "7": 1,
+        "8": 0,
+    }
+
+
+def test_block_index_order():
+    index = BlockIndex(tree)
+    assert index.order == ["2", "3", "4", "5", "6", "7", "8"]
+    assert index.span("2") == (0, 6)
+    assert index.span("4") == (2, 5)
+    assert index.span("5") == (3, 4)
+    assert index.span("8") == (6, 7)
+
+
+def test_block_index_enclosing():
+    index = BlockIndex(
+        {
+            "1": {"ln": "1", "method": "function"},
+            "2": {"ln": "2", "method": "for", "parent": "1"},
+            "3": {"ln": "3", "method": "while", "parent": "2"},
+            "4": {"ln": "4", "method": "for", "parent": "3"},
+            "5": {"ln": "5", "method": "break", "parent": "4"},
+            "6": {"ln": "6", "method": "return"},
+        }
+    )
+    assert index.enclosing("5", "for") == "4"
+    assert index.enclosing("5", "while") == "3"
+    assert index.enclosing("5", "function") == "1"
+    assert index.enclosing("5", "when") is None
+    assert index.enclosing("4", "for") == "2"
+    assert index.enclosing("1", "function") is None
+    assert index.enclosing("6", "function") is None
+
+
+def test_block_index_is_ancestor():
+    index = BlockIndex(tree)
+    assert index.is_ancestor("2", "3") is True
+    assert index.is_ancestor("2", "5") is True
+    assert index.is_ancestor("4", "6") is True
+    assert index.is_ancestor("4", "7") is False
+    assert index.is_ancestor("2", "8") is False
+    assert index.is_ancestor("5", "4") is False
+    assert index.is_ancestor("2", "2") is False
+    assert index.is_ancestor("2", "unknown") is False
+    assert index.is_ancestor("unknown", "2") is False
+
+
+def test_block_index_next_block():
+    index = BlockIndex(tree)
+    assert index.next_block(tree["2"]) is tree["8"]
+    assert index.next_block(tree["4"]) is tree["7"]
+    assert index.next_block(tree["3"]) is tree["4"]
+    assert index.next_block(tree["8"]) is None
+
+
+def test_block_index_next_block_last_line():
+    index = BlockIndex(
+        {
+            "2": {"ln": "2", "enter": "3", "next": "3"},
+            "3": {"ln": "3", "parent": "2"},
+        }
+    )
+    assert index.next_block(index.tree["2"]) is None
+
+
+def test_block_index_next_block_is_cached(patch):
+    index = BlockIndex(tree)
+    patch.object(index, "_find_next_block", return_value=tree["8"])
+    index.next_block(tree["2"])
+    index.next_block(tree["2"])
+    index._find_next_block.assert_called_once_with(tree["2"])
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+
+from pytest import fixture, mark, raises
+
+from storyruntime import Metrics
+from storyruntime.Exceptions import CircuitOpenError
+from storyruntime.utils.CircuitBreaker import CircuitBreaker, RetryBudget
+
+
+@fixture(autouse=True)
+def breakers(patch):
+    patch.dict(CircuitBreaker._breakers, clear=True)
+
+
+@fixture
+def now(patch):
+    patch.object(time, "monotonic", return_value=100)
+    return time.monotonic
+
+
+def state(breaker):
+    return Metrics.http_circuit_breaker_state.labels(
+        endpoint=breaker.endpoint
+    )._value.get()
+
+
+def test_retry_budget():
+    budget = RetryBudget(0.5, 2)
+    assert budget.withdraw() is True
+    assert budget.withdraw() is True
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is True
+    for _ in range(10):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+@mark.parametrize(
+    "url,endpoint",
+    [
+        ("http://foo:8080/bar?a=b", "http://foo:8080"),
+        ("https://foo.com/", "https://foo.com"),
+        ("asyncy.com", "asyncy.com"),
+    ],
+)
+def test_circuit_breaker_get(url, endpoint):
+    breaker = CircuitBreaker.get(url)
+    assert breaker.endpoint == endpoint
+    assert CircuitBreaker.get(url) is breaker
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_get_shared():
+    breaker = CircuitBreaker.get("http://foo:8080/bar")
+    assert CircuitBreaker.get("http://foo:8080/baz?a=b") is breaker
+    assert CircuitBreaker.get("http://foo:8081/bar") is not breaker
+
+
+def test_circuit_breaker_init(magic, patch):
+    patch.object(CircuitBreaker, "failure_threshold", 5)
+    patch.object(CircuitBreaker, "reset_timeout", 10)
+    config = magic()
+    config.HTTP_CIRCUIT_BREAKER_FAILURES = "3"
+    config.HTTP_CIRCUIT_BREAKER_RESET_SECONDS = "2.5"
+    CircuitBreaker.init(config)
+    assert CircuitBreaker.failure_threshold == 3
+    assert CircuitBreaker.reset_timeout == 2.5
+
+
+def test_circuit_breaker_backoff(patch):
+    patch.object(random, "uniform", side_effect=lambda low, high: high)
+    assert CircuitBreaker.backoff(1, 0.5) == 0.5
+    assert CircuitBreaker.backoff(2, 0.5) == 1
+    assert CircuitBreaker.backoff(3, 0.5) == 2
+    assert CircuitBreaker.backoff(10, 0.5) == CircuitBreaker.max_backoff
+
+
+def test_circuit_breaker_opens(now):
+    breaker = CircuitBreaker.get("http://foo")
+    for _ in range(CircuitBreaker.failure_threshold - 1):
+        breaker.before_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_success()
+    for _ in range(CircuitBreaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert state(breaker) == 2
+
+    with raises(CircuitOpenError) as e:
+        breaker.before_request()
+    assert "http://foo" in e.value.message
+
+
+def test_circuit_breaker_half_open(now):
+    breaker = CircuitBreaker.get("http://foo")
+    for _ in range(CircuitBreaker.failure_threshold):
+        breaker.record_failure()
+
+    now.return_value = 100 + CircuitBreaker.reset_timeout
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert state(breaker) == 1
+
+    # A single probe at a time.
+    with raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert state(breaker) == 0
+    breaker.before_request()
+
+
+def test_circuit_breaker_half_open_failure(now):
+    breaker = CircuitBreaker.get("http://foo")
+    for _ in range(CircuitBreaker.failure_threshold):
+        breaker.record_failure()
+
+    now.return_value = 100 + CircuitBreaker.reset_timeout
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_circuit_breaker_half_open_probe_expires(now):
+    breaker = CircuitBreaker.get("http://foo")
+    for _ in range(CircuitBreaker.failure_threshold):
+        breaker.record_failure()
+
+    now.return_value = 100 + CircuitBreaker.reset_timeout
+    breaker.before_request()
+
+    # The outcome of the probe was never recorded.
+    now.return_value = 100 + 2 * CircuitBreaker.reset_timeout
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+import copy
+import re
+
+import pytest
+from pytest import fixture, mark
+
+from storyruntime.Exceptions import StoryscriptRuntimeError
+from storyruntime.entities.Multipart import FileFormField
+from storyruntime.utils import Resolver
+from storyruntime.utils.ExpressionCompiler import ExpressionCompiler
+
+
+def path(*paths):
+    return {"$OBJECT": "path", "paths": list(paths)}
+
+
+def integer(value):
+    return {"$OBJECT": "int", "int": value}
+
+
+def string(value, values=None):
+    item = {"$OBJECT": "string", "string": value}
+    if values is not None:
+        item["values"] = values
+    return item
+
+
+def expression(operator, *values, key="expression"):
+    return {"$OBJECT": key, key: operator, "values": list(values)}
+
+
+@fixture
+def context():
+    return {
+        "i": 3,
+        "f": 1.5,
+        "s": "foo",
+        "t": True,
+        "n": None,
+        "l": [1, 2, 3, 4],
+        "m": {"a": {"b": [10, 20]}},
+        "k": "a",
+        "file": FileFormField(
+            name="file", body=b"body", filename="f", contentType="c"
+        ),
+    }
+
+
+@fixture
+def compiler():
+    return ExpressionCompiler({})
+
+
+@mark.parametrize(
+    "item",
+    [
+        "raw",
+        10,
+        None,
+        ["a", string("b")],
+        string("hello"),
+        string("{} and {}", [path("s"), integer(1)]),
+        string("{}", []),
+        {"$OBJECT": "dot", "dot": "x"},
+        {"$OBJECT": "time", "ms": 1000},
+        {"$OBJECT": "boolean", "boolean": False},
+        {"$OBJECT": "float", "float": 1.25},
+        {"$OBJECT": "value", "value": [1, [2]]},
+        {"$OBJECT": "list", "items": [integer(1), path("s"), ["a", "b"]]},
+        {
+            "$OBJECT": "dict",
+            "items": [[string("a"), path("l")], [string("b"), integer(2)]],
+        },
+        {"$OBJECT": "type_cast", "type": {"type": "string"}, "value": 1},
+        {"$OBJECT": "unknown", "a": path("i"), "b": [string("c")]},
+        path("i"),
+        path("m", string("a"), string("b"), integer(1)),
+        path("m", path("k"), {"$OBJECT": "dot", "dot": "b"}),
+        path("file", {"$OBJECT": "dot", "dot": "filename"}),
+        path("file", integer(1)),
+        path(
+            "l",
+            {"$OBJECT": "range", "range": {"start": integer(1)}},
+        ),
+        path(
+            "l",
+            {
+                "$OBJECT": "range",
+                "range": {"start": integer(1), "end": integer(3)},
+            },
+        ),
+        path("l", {"$OBJECT": "range", "range": {}}),
+        path("i", string("a")),
+        path("n", string("a")),
+        expression("sum", path("i"), integer(2), path("f")),
+        expression("sum", path("s"), integer(2), path("i")),
+        expression("sum", path("l"), {"$OBJECT": "value", "value": [5]}),
+        expression("subtraction", path("i"), integer(2)),
+        expression("multiplication", path("s"), integer(2)),
+        expression("division", path("i"), integer(2)),
+        expression("modulus", path("i"), integer(2)),
+        expression("exponential", path("i"), integer(2)),
+        expression("equals", path("i"), integer(3), key="assertion"),
+        expression("equal", path("i"), integer(4), key="assertion"),
+        expression("less", path("i"), integer(4), key="assertion"),
+        expression("less_equal", path("i"), integer(3), key="assertion"),
+        expression("not", path("t"), key="assertion"),
+        expression("or", path("n"), integer(1), path("t"), key="assertion"),
+        expression("or", integer(1), integer(2), key="assertion"),
+        expression("and", path("t"), path("i"), key="assertion"),
+        expression("and", path("t"), {"$OBJECT": "boolean", "boolean": False}),
+        {"$OBJECT": "regexp", "regexp": "^a", "flags": "i"},
+    ],
+)
+def test_compiler_matches_resolver(story, compiler, context, item):
+    story.set_context(copy.deepcopy(context))
+    expected = Resolver(story).resolve(copy.deepcopy(item))
+    story.set_context(copy.deepcopy(context))
+    assert compiler.resolve(story, item) == expected
+    story.set_context(copy.deepcopy(context))
+    assert compiler.resolve(story, item) == expected
+
+
+@mark.parametrize(
+    "item,error",
+    [
+        (path("missing"), StoryscriptRuntimeError),
+        (path("m", string("missing")), StoryscriptRuntimeError),
+        (path("l", integer(10)), StoryscriptRuntimeError),
+        (path("m", "a"), AssertionError),
+        (expression("sum", path("t"), integer(1)), AssertionError),
+        (expression("subtraction", path("s"), integer(1)), AssertionError),
+        (expression("unknown", integer(1)), AssertionError),
+        (expression("equals", integer(1)), IndexError),
+        ({"$OBJECT": "string"}, KeyError),
+        ({"$OBJECT": "type", "type": "string"}, KeyError),
+    ],
+)
+def test_compiler_errors_match_resolver(story, compiler, context, item, error):
+    story.set_context(context)
+    with pytest.raises(error):
+        Resolver(story).resolve(copy.deepcopy(item))
+    with pytest.raises(error):
+        compiler.resolve(story, item)
+
+
+def test_compiler_short_circuits(patch, story, compiler):
+    story.set_context({"t": True, "f": False})
+    item = expression("or", path("t"), path("missing"))
+    assert compiler.resolve(story, item) is True
+    item = expression("and", path("f"), path("missing"))
+    assert compiler.resolve(story, item) is False
+
+
+def test_compiler_caches_tree_nodes(patch, story):
+    node = expression("sum", integer(1), integer(2))
+    tree = {"1": {"ln": "1", "args": [node]}}
+    compiler = ExpressionCompiler(tree)
+    patch.object(compiler, "_compile", side_effect=compiler._compile)
+
+    assert compiler.resolve(story, node) == 3
+    assert compiler.resolve(story, node) == 3
+    assert compiler._compile.call_count == 3  # The node and its values.
+
+
+def test_compiler_does_not_cache_transient_nodes(patch, story):
+    compiler = ExpressionCompiler({})
+    patch.object(compiler, "_compile", side_effect=compiler._compile)
+
+    assert compiler.resolve(story, integer(1)) == 1
+    assert compiler.resolve(story, integer(1)) == 1
+    assert compiler._compile.call_count == 2
+
+
+def test_compiler_copies_raw_values(story, compiler):
+    value = [1, 2]
+    item = {"$OBJECT": "value", "value": value}
+    first = compiler.resolve(story, item)
+    assert first == value
+    assert first is not value
+
+
+def test_compiler_regexp(story, compiler):
+    item = {"$OBJECT": "regexp", "regexp": "^a", "flags": "i"}
+    assert compiler.resolve(story, item) == re.compile("^a", re.IGNORECASE)
+
+
+def test_sum_does_not_modify_list_operands(story, compiler):
+    value = [1]
+    story.set_context({"l": value})
+    item = expression(
+        "sum", path("l"), {"$OBJECT": "list", "items": [integer(2)]}
+    )
+    assert compiler.resolve(story, item) == [1, 2]
+    assert Resolver(story).resolve(item) == [1, 2]
+    assert value == [1]
+
+
+@mark.parametrize(
+    "item,expected",
+    [
+        (string("a {} c", values=[integer(1)]), "a 1 c"),
+        (expression("sum", integer(1), integer(2)), 3),
+        (expression("not", {"$OBJECT": "boolean", "boolean": False}), True),
+        ({"$OBJECT": "dict", "items": [[string("a"), integer(1)]]}, {"a": 1}),
+        ({"$OBJECT": "list", "items": [integer(1)]}, [1]),
+    ],
+)
+def test_compiler_folds_constants(story, compiler, item, expected):
+    fn = compiler.compile(item)
+    assert fn.constant == expected
+    assert fn(story) == expected
+
+
+def test_compiler_does_not_fold_variables(story, compiler):
+    story.set_context({"i": 1})
+    fn = compiler.compile(expression("sum", path("i"), integer(2)))
+    assert not hasattr(fn, "constant")
+    assert fn(story) == 3
+
+
+def test_compiler_does_not_fold_errors(story, compiler):
+    fn = compiler.compile(expression("division", integer(1), integer(0)))
+    assert not hasattr(fn, "constant")
+    with pytest.raises(ZeroDivisionError):
+        fn(story)
+
+
+@mark.parametrize(
+    "item",
+    [
+        expression(
+            "exponential",
+            integer(10),
+            expression("exponential", integer(10), integer(9)),
+        ),
+        expression("exponential", integer(2), integer(5000)),
+        expression("multiplication", string("a"), integer(10)),
+    ],
+)
+def test_compiler_does_not_fold_slow_operations(compiler, item):
+    fn = compiler.compile(item)
+    assert not hasattr(fn, "constant")
+
+
+@mark.parametrize(
+    "item,expected",
+    [
+        (expression("exponential", integer(2), integer(10)), 1024),
+        (expression("multiplication", integer(2), integer(10)), 20),
+    ],
+)
+def test_compiler_folds_cheap_operations(story, compiler, item, expected):
+    fn = compiler.compile(item)
+    assert fn.constant == expected
+
+
+def test_compiler_compiles_regexp_once(patch, story, compiler):
+    fn = compiler.compile({"$OBJECT": "regexp", "regexp": "^a"})
+    patch.object(re, "compile")
+    assert fn(story) == fn.constant
+    re.compile.assert_not_called()
+
+
+def test_compiler_copies_folded_values(story, compiler):
+    item = {
+        "$OBJECT": "dict",
+        "items": [[string("a"), {"$OBJECT": "list", "items": [integer(1)]}]],
+    }
+    first = compiler.resolve(story, item)
+    first["a"].append(2)
+    assert compiler.resolve(story, item) == {"a": [1]}
+
+
+def test_compiler_compile_tree(patch):
+    node = integer(1)
+    compiler = ExpressionCompiler({"1": {"ln": "1", "args": [node]}})
+    compiler.compile_tree()
+    assert compiler._compiled[id(node)].constant == 1
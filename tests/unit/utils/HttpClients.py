@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from unittest.mock import MagicMock
+
+from pytest import mark
+
+from storyruntime.utils import HttpClients as HttpClientsModule
+from storyruntime.utils.HttpClients import HttpClients, HttpPool
+
+from tornado.httpclient import AsyncHTTPClient
+
+
+@mark.asyncio
+async def test_http_clients_get():
+    pool = HttpClients.get(HttpClients.SERVICES)
+    assert isinstance(pool, HttpPool)
+    assert pool.name == HttpClients.SERVICES
+    assert pool.max_clients == HttpClients.max_clients[HttpClients.SERVICES]
+    assert HttpClients.get(HttpClients.SERVICES) is pool
+    assert HttpClients.get(HttpClients.SYNAPSE) is not pool
+
+
+def test_http_clients_init(patch, magic):
+    patch.dict(HttpClients.max_clients, {HttpClients.INTERNET: 50})
+    config = magic()
+    config.HTTP_MAX_CLIENTS_SERVICES = None
+    config.HTTP_MAX_CLIENTS_KUBERNETES = None
+    config.HTTP_MAX_CLIENTS_SYNAPSE = None
+    config.HTTP_MAX_CLIENTS_INTERNET = "5"
+    HttpClients.init(config)
+    assert HttpClients.max_clients[HttpClients.INTERNET] == 5
+
+
+def test_http_pool_client(patch):
+    patch.object(HttpClientsModule, "CurlAsyncHTTPClient", new=None)
+    pool = HttpPool("pool", 10)
+    client = pool.client({})
+    assert isinstance(client, AsyncHTTPClient)
+    assert client is not AsyncHTTPClient()
+    assert pool.client({}) is client
+
+
+def test_http_pool_client_keep_alive(patch):
+    curl = MagicMock()
+    patch.object(HttpClientsModule, "CurlAsyncHTTPClient", new=curl)
+    pool = HttpPool("pool", 10)
+    assert pool.client({"method": "GET"}) is curl.return_value
+    curl.assert_called_once_with(force_instance=True, max_clients=10)
+    assert pool.client({"ssl_options": object()}) is not curl.return_value
+    assert pool.client({"body_producer": object()}) is not curl.return_value
+
+
+@mark.asyncio
+async def test_http_pool_fetch_limits_requests(patch, async_mock):
+    pool = HttpPool("pool", 1)
+    started = []
+    release = asyncio.Event()
+
+    async def fetch(url, **kwargs):
+        started.append(url)
+        await release.wait()
+        return url
+
+    client = MagicMock()
+    client.fetch = fetch
+    patch.object(pool, "client", return_value=client)
+
+    first = asyncio.ensure_future(pool.fetch("a", method="GET"))
+    second = asyncio.ensure_future(pool.fetch("b", method="GET"))
+    await asyncio.sleep(0.01)
+    assert started == ["a"]
+
+    release.set()
+    assert await first == "a"
+    assert await second == "b"
+    assert started == ["a", "b"]
+    pool.client.assert_called_with({"method": "GET"})
+
+
+@mark.asyncio
+async def test_http_pool_fetch_cancelled(patch):
+    pool = HttpPool("pool", 1)
+    release = asyncio.Event()
+
+    async def fetch(url, **kwargs):
+        await release.wait()
+        return url
+
+    client = MagicMock()
+    client.fetch = fetch
+    patch.object(pool, "client", return_value=client)
+
+    first = asyncio.ensure_future(pool.fetch("a"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert first.cancelled()
+
+    # The request of the cancelled caller is still in flight.
+    second = asyncio.ensure_future(pool.fetch("b"))
+    await asyncio.sleep(0.01)
+    assert not second.done()
+    assert pool._slots.locked()
+
+    release.set()
+    assert await second == "b"
+    assert not pool._slots.locked()
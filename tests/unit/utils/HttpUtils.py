@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
 import asyncio
+from unittest import mock
 from unittest.mock import MagicMock
 
 import pytest
-from pytest import mark
+from pytest import fixture, mark
 
+from storyruntime.Exceptions import CircuitOpenError
+from storyruntime.utils.CircuitBreaker import CircuitBreaker
 from storyruntime.utils.HttpUtils import HttpUtils
 
 from tornado.httpclient import HTTPError
 
 
+@fixture(autouse=True)
+def breakers(patch):
+    patch.dict(CircuitBreaker._breakers, clear=True)
+
+
 def test_read_response_body_quietly(magic):
     response = magic()
     response.body = b"hello world"
@@ -40,10 +48,8 @@ async def test_fetch_with_retry(patch, logger, async_mock):
     )
 
 
-@mark.asyncio
-async def test_fetch_with_retry_fail(patch, logger, async_mock):
+def failing_client(patch, fetch):
     client = MagicMock()
-    fetch = MagicMock()
 
     async def exc(*args, **kwargs):
         fetch(*args, **kwargs)
@@ -52,12 +58,100 @@ async def test_fetch_with_retry_fail(patch, logger, async_mock):
         return res
 
     patch.object(client, "fetch", side_effect=exc)
+    return client
+
+
+@mark.asyncio
+async def test_fetch_with_retry_fail(patch, logger, async_mock):
+    fetch = MagicMock()
+    client = failing_client(patch, fetch)
+    patch.object(asyncio, "sleep", new=async_mock())
+
+    with pytest.raises(HTTPError):
+        await HttpUtils.fetch_with_retry(3, logger, "asyncy.com", client, {})
+
+    assert len(fetch.mock_calls) == 3
+    assert asyncio.sleep.mock.call_count == 2
+
+
+@mark.asyncio
+async def test_fetch_with_retry_opens_circuit(patch, logger, async_mock):
+    fetch = MagicMock()
+    client = failing_client(patch, fetch)
+    patch.object(asyncio, "sleep", new=async_mock())
+
+    with pytest.raises(CircuitOpenError) as e:
+        await HttpUtils.fetch_with_retry(
+            10, logger, "asyncy.com", client, {"circuit_breaker": True}
+        )
+
+    assert isinstance(e.value.__cause__, HTTPError)
+    assert len(fetch.mock_calls) == CircuitBreaker.failure_threshold
+    assert "circuit_breaker" not in fetch.mock_calls[0][2]
+
+    # Fails fast, without calling the endpoint.
+    with pytest.raises(CircuitOpenError):
+        await HttpUtils.fetch_with_retry(
+            3, logger, "asyncy.com", client, {"circuit_breaker": True}
+        )
+
+    assert len(fetch.mock_calls) == CircuitBreaker.failure_threshold
+
+
+@mark.asyncio
+async def test_fetch_with_retry_without_circuit_breaker(
+    patch, logger, async_mock
+):
+    fetch = MagicMock()
+    client = failing_client(patch, fetch)
     patch.object(asyncio, "sleep", new=async_mock())
 
     with pytest.raises(HTTPError):
         await HttpUtils.fetch_with_retry(10, logger, "asyncy.com", client, {})
 
+    # The circuit breaker is opt-in.
     assert len(fetch.mock_calls) == 10
+    assert CircuitBreaker._breakers == {}
+
+
+@mark.asyncio
+async def test_fetch_with_retry_budget(patch, logger, async_mock):
+    fetch = MagicMock()
+    client = failing_client(patch, fetch)
+    patch.object(asyncio, "sleep", new=async_mock())
+    breaker = CircuitBreaker.get("asyncy.com")
+    breaker.budget.tokens = 1
+
+    with pytest.raises(HTTPError):
+        await HttpUtils.fetch_with_retry(
+            3, logger, "asyncy.com", client, {"circuit_breaker": True}
+        )
+
+    # Only one retry is left in the budget.
+    assert len(fetch.mock_calls) == 2
+
+
+@mark.asyncio
+async def test_fetch_with_retry_backoff(patch, logger, async_mock):
+    fetch = MagicMock()
+    client = failing_client(patch, fetch)
+    patch.object(asyncio, "sleep", new=async_mock())
+    patch.object(CircuitBreaker, "backoff", side_effect=[1, 2])
+
+    with pytest.raises(HTTPError):
+        await HttpUtils.fetch_with_retry(
+            3,
+            logger,
+            "asyncy.com",
+            client,
+            {"retry_timeout": 2, "circuit_breaker": True},
+        )
+
+    assert CircuitBreaker.backoff.mock_calls == [
+        mock.call(1, 2),
+        mock.call(2, 2),
+    ]
+    assert asyncio.sleep.mock.mock_calls == [mock.call(1), mock.call(2)]
 
 
 def test_add_params_to_url():
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+import re
+from collections import namedtuple
+
+import pytest
+
+from requests.structures import CaseInsensitiveDict
+
+from storyruntime.Exceptions import StoryscriptRuntimeError
+from storyruntime.Types import (
+    InternalCommand,
+    InternalService,
+    StreamingService,
+)
+from storyruntime.entities.Multipart import FormField
+from storyruntime.entities.SpooledBody import SpooledBody
+from storyruntime.utils.JsonCodec import JsonCodec
+
+
+def test_json_codec_dumps_primitives():
+    obj = {"a": [1, 2.5, "s", True, None], "b": {"c": "d"}}
+    assert JsonCodec.dumps(obj) == json.dumps(obj)
+
+
+def test_json_codec_dumps_conversions(tmpdir):
+    path = str(tmpdir.join("body"))
+    with open(path, "wb") as f:
+        f.write(b"spooled")
+
+    Point = namedtuple("Point", ["x", "y"])
+    obj = {
+        "bytes": b"v",
+        "spooled": SpooledBody(path, 7),
+        "casedict": CaseInsensitiveDict(data={"Key": "value"}),
+        "regex": re.compile("/foo/i"),
+        "point": Point(x=1, y=b"v"),
+        "tuple": (1, "a"),
+        "list": [Point(x=1, y=2)],
+    }
+
+    assert JsonCodec.loads(JsonCodec.dumps(obj)) == {
+        "bytes": "dg==",
+        "spooled": "c3Bvb2xlZA==",
+        "casedict": {"Key": "value"},
+        "regex": "/foo/i",
+        "point": {"x": 1, "y": "dg=="},
+        "tuple": [1, "a"],
+        "list": [{"x": 1, "y": 2}],
+    }
+
+
+def test_json_codec_does_not_modify():
+    obj = {
+        "nested": {"bytes": b"v", "field": FormField(name="a", body="b")},
+        "list": [b"v", {"k": b"v"}],
+        "plain": {"a": 1},
+    }
+    expected = copy.deepcopy(obj)
+
+    JsonCodec.dumps(obj, safe=True)
+    assert obj == expected
+
+
+def test_json_codec_encodable_copies_only_converted():
+    plain = {"a": [1, 2]}
+    obj = {"plain": plain, "converted": {"bytes": b"v"}}
+
+    encodable = JsonCodec.encodable(obj)
+    assert encodable is not obj
+    assert encodable["plain"] is plain
+    assert JsonCodec.encodable(plain) is plain
+
+
+def test_json_codec_safe():
+    obj = {
+        "streaming": StreamingService(
+            name="hello",
+            command="world",
+            container_name="secret",
+            hostname="h",
+        ),
+        "internal": InternalService(
+            commands={
+                "cmd": InternalCommand(
+                    arguments={}, output_type="any", handler="secret"
+                )
+            }
+        ),
+    }
+
+    assert JsonCodec.loads(JsonCodec.dumps(obj, safe=True)) == {
+        "streaming": {"name": "hello", "command": "world"},
+        "internal": {
+            "commands": {"cmd": {"arguments": {}, "output_type": "any"}}
+        },
+    }
+
+
+@pytest.mark.parametrize("value", [object(), (1, 2)])
+def test_json_codec_safe_incompatible(value):
+    with pytest.raises(StoryscriptRuntimeError):
+        JsonCodec.dumps({"value": value}, safe=True)
+
+
+def test_json_codec_dumps_unknown():
+    with pytest.raises(TypeError):
+        JsonCodec.dumps({"value": object()})
+
+
+@pytest.mark.parametrize("s", ['{"a": [1]}', b'{"a": [1]}'])
+def test_json_codec_loads(s):
+    assert JsonCodec.loads(s) == {"a": [1]}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import pytest
+from pytest import fixture, mark
+
+from storyruntime.entities.SpooledBody import SpooledBody
+from storyruntime.utils import MultipartSpool as module
+from storyruntime.utils.MultipartSpool import MultipartSpool
+
+from tornado.httputil import parse_multipart_form_data
+
+BOUNDARY = b"1234567890"
+
+BODY = (
+    b"preamble\r\n"
+    b"--1234567890\r\n"
+    b'Content-Disposition: form-data; name="field"\r\n'
+    b"\r\n"
+    b"value\r\n"
+    b"--1234567890\r\n"
+    b'Content-Disposition: form-data; name="small"; filename="s.txt"\r\n'
+    b"Content-Type: text/plain\r\n"
+    b"\r\n"
+    b"small\r\n"
+    b"--1234567890\r\n"
+    b'Content-Disposition: form-data; name="large"; filename="l.bin"\r\n'
+    b"\r\n"
+    b"a large file\r\n--12345 with a partial boundary\r\n"
+    b"--1234567890--\r\n"
+)
+
+
+@fixture
+def spool_app(magic, tmpdir):
+    app = magic()
+    app.get_spool_dir.return_value = str(tmpdir.join("spool"))
+    return app
+
+
+def parse(app, body, chunk_size, memory_limit=None, boundary=BOUNDARY):
+    spool = MultipartSpool(boundary, app, memory_limit)
+    for i in range(0, len(body), chunk_size):
+        spool.write(body[i : i + chunk_size])
+    spool.finish()
+    return spool
+
+
+@mark.parametrize("chunk_size", [1, 3, 16, len(BODY)])
+def test_multipart_spool_like_tornado(spool_app, chunk_size):
+    arguments = {}
+    files = {}
+    parse_multipart_form_data(BOUNDARY, BODY, arguments, files)
+
+    spool = parse(spool_app, BODY, chunk_size)
+    assert spool.arguments == arguments
+    assert spool.files == files
+    spool_app.get_spool_dir.assert_not_called()
+
+
+@mark.parametrize("chunk_size", [1, 7, len(BODY)])
+def test_multipart_spool_spools_large_files(spool_app, chunk_size):
+    spool = parse(spool_app, BODY, chunk_size, memory_limit=8)
+    assert spool.arguments == {"field": [b"value"]}
+    assert spool.files["small"][0].body == b"small"
+    large = spool.files["large"][0]
+    assert large.filename == "l.bin"
+    assert large.content_type == "application/unknown"
+    assert isinstance(large.body, SpooledBody)
+    assert large.body.content_type == "application/unknown"
+    assert large.body.read() == (
+        b"a large file\r\n--12345 with a partial boundary"
+    )
+
+
+def test_multipart_spool_holds_only_the_boundary(spool_app):
+    spool = MultipartSpool(BOUNDARY, spool_app, 8)
+    spool.write(BODY[: BODY.index(b"a large file")])
+    spool.write(b"x" * 1000)
+    assert len(spool._buffer) < len(b"\r\n--" + BOUNDARY)
+
+
+def test_multipart_spool_quoted_boundary(spool_app):
+    spool = parse(spool_app, BODY, 5, boundary=b'"1234567890"')
+    assert spool.arguments == {"field": [b"value"]}
+
+
+def test_multipart_spool_no_final_boundary(spool_app, tmpdir):
+    body = BODY[: BODY.index(b"--1234567890--")]
+    spool = parse(spool_app, body, 4, memory_limit=8)
+    assert spool.files == {}
+    assert spool.arguments == {}
+
+
+def test_multipart_spool_invalid_parts(spool_app):
+    body = (
+        b"--1234567890\r\n"
+        b'Content-Disposition: attachment; name="a"\r\n'
+        b"\r\n"
+        b"a\r\n"
+        b"--1234567890\r\n"
+        b"Content-Disposition: form-data\r\n"
+        b"\r\n"
+        b"b\r\n"
+        b"--1234567890--"
+    )
+    spool = parse(spool_app, body, 4)
+    assert spool.files == {}
+    assert spool.arguments == {}
+
+
+def test_multipart_spool_headers_too_large(patch, spool_app):
+    patch.object(module, "MAX_HEADERS_SIZE", 10)
+    spool = MultipartSpool(BOUNDARY, spool_app)
+    with pytest.raises(ValueError):
+        spool.write(b"--1234567890\r\n" + b"a" * 20)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import copy
+import gc
+import os
+
+from pytest import fixture
+
+from storyruntime.entities.SpooledBody import SpooledBody
+from storyruntime.utils.ResponseSpool import ResponseSpool
+
+
+@fixture
+def spool_app(magic, tmpdir):
+    app = magic()
+    app.get_spool_dir.return_value = str(tmpdir.join("spool"))
+    return app
+
+
+def test_response_spool_callbacks(spool_app):
+    spool = ResponseSpool(spool_app, 10)
+    assert spool.callbacks() == {
+        "streaming_callback": spool.write,
+        "header_callback": spool.header,
+    }
+
+
+def test_response_spool_in_memory(spool_app):
+    spool = ResponseSpool(spool_app, 11)
+    spool.write(b"hello ")
+    spool.write(b"world")
+    assert spool.preview() == "hello world"
+    assert spool.body() == b"hello world"
+    spool_app.get_spool_dir.assert_not_called()
+
+
+def test_response_spool_to_file(spool_app):
+    spool = ResponseSpool(spool_app, 8)
+    spool.write(b"hello ")
+    spool.write(b"world")
+    spool.write(b"!")
+    path = spool.path
+    assert os.path.dirname(path) == spool_app.get_spool_dir()
+    assert spool.preview(limit=5) == "hello"
+
+    body = spool.body("text/plain")
+    assert isinstance(body, SpooledBody)
+    assert body.path == path
+    assert body.size == 12
+    assert body.content_type == "text/plain"
+    assert body.read() == b"hello world!"
+    assert list(body.chunks(chunk_size=5)) == [b"hello", b" worl", b"d!"]
+
+
+def test_response_spool_restarts_on_retry(spool_app):
+    spool = ResponseSpool(spool_app, 4)
+    spool.header("HTTP/1.1 599 Unknown\r\n")
+    spool.write(b"partial")
+    path = spool.path
+    spool.header("HTTP/1.1 200 OK\r\n")
+    spool.header("Content-Type: text/plain\r\n")
+    assert not os.path.exists(path)
+    spool.write(b"ok")
+    assert spool.body() == b"ok"
+
+
+def test_response_spool_discard(spool_app):
+    spool = ResponseSpool(spool_app, 1)
+    spool.write(b"hello")
+    path = spool.path
+    spool.discard()
+    assert not os.path.exists(path)
+    assert spool.size == 0
+    assert spool.body() == b""
+
+
+def test_spooled_body_lifetime(spool_app, tmpdir):
+    spool = ResponseSpool(spool_app, 1)
+    spool.write(b"hello")
+    body = spool.body()
+    path = body.path
+    assert copy.copy(body) is body
+    assert copy.deepcopy({"a": body})["a"] is body
+
+    target = str(tmpdir.join("copy"))
+    body.copy_to(target)
+    with open(target, "rb") as f:
+        assert f.read() == b"hello"
+
+    # The spooled file goes away with the last reference to it.
+    del body
+    gc.collect()
+    assert not os.path.exists(path)
@@ -117,3 +117,19 @@ def test_safe_type_caseinsensitivedict():
             "else": CaseInsensitiveDict(expected["else"]),
         }
     )
+
+
+def test_safe_type_checked():
+    checked_list = [object()]  # This would be rejected if it was walked.
+    checked = {id(checked_list): checked_list}
+    value = {"checked": checked_list}
+    assert TypeUtils.safe_type(value, checked) is value
+    assert value["checked"] is checked_list
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(1, True), (0.5, True), (True, False), ("1", False), (None, False)],
+)
+def test_is_number(value, expected):
+    assert TypeUtils.is_number(value) is expected